@@ -1,34 +1,148 @@
-import asyncio
+import json
 import logging
 import os
-from typing import Optional
+from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator, Awaitable, Callable
+from functools import partial
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from gitsummarize.exceptions.exceptions import GitHubAccessError
+from fastapi.responses import JSONResponse, StreamingResponse
+from gitsummarize.exceptions.exceptions import (
+    GitHubAccessError,
+    GitHubArchiveTooLargeError,
+)
 from pydantic import BaseModel
 
 from gitsummarize.auth.auth import verify_token
 from gitsummarize.auth.key_manager import KeyGroup, KeyManager
+from gitsummarize.cache.metadata_cache import RepoMetadataCache
+from gitsummarize.cache.repo_cache import MAX_CACHE_BYTES, RepoCache
+from gitsummarize.cache.summary_cache import SummaryCache
 from gitsummarize.clients.openai import OpenAIClient
-from gitsummarize.clients.supabase import SupabaseClient
+from gitsummarize.clients.supabase import PAGE_SIZE, AsyncSupabaseClient
+from gitsummarize.clients.token_estimator import TokenEstimator
+from gitsummarize.codebase.compaction import MAX_LINE_CHARS, CompactionOptions
+from gitsummarize.codebase.format import Files, files_size
+from gitsummarize.codebase.tree import MAX_DEPTH, MAX_ENTRIES
+from gitsummarize.model.job import Job, JobStage
+from gitsummarize.pipeline.incremental import summarize_incrementally
+from gitsummarize.pipeline.jobs import (
+    CONCURRENCY,
+    TIMEOUT_SECONDS,
+    JobQueue,
+    JobStore,
+)
+from gitsummarize.pipeline.map_reduce import (
+    CONCURRENCY as MAP_REDUCE_CONCURRENCY,
+    FAN_OUT,
+    summarize_codebase,
+)
+from gitsummarize.pipeline.metadata_refresh import refresh_repo_metadata
+from gitsummarize.pipeline.scheduler import StageScheduler
+from gitsummarize.pipeline.single_flight import SingleFlight
 from src.gitsummarize.clients.github import GithubClient
-from src.gitsummarize.clients.google_genai import GoogleGenAI
+from src.gitsummarize.clients.google_genai import (
+    CHARS_PER_TOKEN as GEMINI_CHARS_PER_TOKEN,
+    MAP_MODEL as GEMINI_MAP_MODEL,
+    MAX_PROMPT_TOKENS,
+    MODEL as GEMINI_MODEL,
+    GoogleGenAI,
+)
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-gh = GithubClient(os.getenv("GITHUB_TOKEN"))
-openai = OpenAIClient(os.getenv("OPENAI_API_KEY"))
-supabase = SupabaseClient(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ADMIN_KEY"))
+repo_cache = (
+    RepoCache(
+        os.getenv("REPO_CACHE_DIR"),
+        max_bytes=int(os.getenv("REPO_CACHE_MAX_BYTES", MAX_CACHE_BYTES)),
+    )
+    if os.getenv("REPO_CACHE_DIR")
+    else None
+)
+# Summaries are rebuilt from cached per-directory notes when this is set
+summary_cache = (
+    SummaryCache(os.getenv("SUMMARY_CACHE_PATH"))
+    if os.getenv("SUMMARY_CACHE_PATH")
+    else None
+)
+gh = GithubClient(
+    os.getenv("GITHUB_TOKEN"),
+    limit=int(os.getenv("GITHUB_CONNECTION_LIMIT", 100)),
+    limit_per_host=int(os.getenv("GITHUB_CONNECTION_LIMIT_PER_HOST", 20)),
+    connect_timeout=float(os.getenv("GITHUB_CONNECT_TIMEOUT", 10)),
+    request_timeout=float(os.getenv("GITHUB_REQUEST_TIMEOUT", 600)),
+    max_archive_size=int(os.getenv("GITHUB_MAX_ARCHIVE_SIZE", 0)) or None,
+    extract_workers=int(os.getenv("GITHUB_EXTRACT_WORKERS", 0)) or None,
+    cache=repo_cache,
+    tree_from_archive=os.getenv("GITHUB_TREE_FROM_ARCHIVE", "true").lower() == "true",
+    extra_tokens=[t for t in os.getenv("GITHUB_EXTRA_TOKENS", "").split(",") if t],
+    metadata_cache=RepoMetadataCache(
+        os.getenv("GITHUB_METADATA_CACHE_PATH", "tmp/repo_metadata.sqlite3")
+    ),
+    near_duplicates=os.getenv("DEDUPE_NEAR_DUPLICATES", "true").lower() == "true",
+    compaction=(
+        CompactionOptions(
+            max_line_chars=int(os.getenv("COMPACT_MAX_LINE_CHARS", MAX_LINE_CHARS))
+            or None
+        )
+        if os.getenv("COMPACT_CODEBASE", "true").lower() == "true"
+        else None
+    ),
+    tree_max_depth=int(os.getenv("TREE_MAX_DEPTH", MAX_DEPTH or 0)) or None,
+    tree_max_entries=int(os.getenv("TREE_MAX_ENTRIES", MAX_ENTRIES)) or None,
+)
+token_estimator = TokenEstimator()
+openai = OpenAIClient(os.getenv("OPENAI_API_KEY"), token_estimator)
+supabase = AsyncSupabaseClient(
+    os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ADMIN_KEY")
+)
+
+summarize_flights = SingleFlight()
+gemini_max_prompt_tokens = int(
+    os.getenv("GEMINI_MAX_PROMPT_TOKENS", MAX_PROMPT_TOKENS)
+)
+
+# Archives are only read up to this many tokens of their most useful files,
+# so huge repos are summarized from one prompt instead of map-reduced
+codebase_max_tokens = int(os.getenv("CODEBASE_MAX_TOKENS", 0)) or None
+gemini_tokens_per_minute = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", 0)) or None
+gemini_map_model = os.getenv("GEMINI_MAP_MODEL", GEMINI_MAP_MODEL)
+# Codebases over the prompt limit are summarized by directory, then reduced
+map_reduce_fan_out = int(os.getenv("MAP_REDUCE_FAN_OUT", FAN_OUT))
+map_reduce_concurrency = int(
+    os.getenv("MAP_REDUCE_CONCURRENCY", MAP_REDUCE_CONCURRENCY)
+)
 
 key_manager = KeyManager()
 for i in range(1, int(os.getenv("NUM_GEMINI_KEYS")) + 1):
-    key_manager.add_key(KeyGroup.GEMINI, os.getenv(f"GEMINI_API_KEY_{i}"))
+    key = os.getenv(f"GEMINI_API_KEY_{i}")
+    # One long-lived client per key so its HTTP connections are reused
+    key_manager.add_key(
+        KeyGroup.GEMINI,
+        key,
+        GoogleGenAI(
+            key,
+            gemini_max_prompt_tokens,
+            token_estimator,
+            on_usage=partial(key_manager.record_usage, KeyGroup.GEMINI, key),
+            map_model=gemini_map_model,
+        ),
+        tokens_per_minute=gemini_tokens_per_minute,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await gh.close()
+    await supabase.close()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/health")
 async def health_check():
@@ -36,53 +150,290 @@ async def health_check():
     return {"status": "healthy", "service": "gitsummarize-backend"}
 
 
+@app.get("/stats")
+async def stats(_: str = Depends(verify_token)):
+    """Runtime counters for sizing connection pools and caches"""
+    return {
+        "github_pool": gh.get_pool_stats(),
+        "github_rate_limit": gh.get_rate_limit_stats(),
+        "repo_cache": gh.get_cache_stats(),
+        "repo_metadata_cache": gh.get_metadata_cache_stats(),
+        "compaction": gh.get_compaction_stats(),
+        "dedup": gh.get_dedup_stats(),
+        "summary_cache": summary_cache.get_stats() if summary_cache else None,
+        "summarize_single_flight": summarize_flights.get_stats(),
+        "token_estimator": token_estimator.get_stats(),
+        "summarize_jobs": await job_queue.get_stats(),
+        "api_keys": key_manager.get_stats(),
+        "supabase_queries": supabase.get_stats(),
+    }
+
+
 class SummarizeRequest(BaseModel):
     repo_url: str
-    gemini_key: Optional[str] = None
+    gemini_key: str | None = None
+    force: bool = False
+    priority: int = 0
 
 
-@app.post("/summarize", operation_id="summarize_repo")
+@app.post("/summarize", operation_id="summarize_repo", status_code=202)
 async def summarize(request: SummarizeRequest, _: str = Depends(verify_token)):
+    """Queue a summary and return its job id; poll /summarize/jobs/{job_id}"""
     if not _validate_repo_url(request.repo_url):
         raise HTTPException(status_code=400, detail="Invalid GitHub URL")
-    logger.info(f"Summarizing repository: {request.repo_url}")
+    logger.info(f"Queueing summary for repository: {request.repo_url}")
+
+    job = await job_queue.enqueue(
+        request.repo_url,
+        priority=request.priority,
+        params={"force": request.force},
+        context={"gemini_key": request.gemini_key},
+    )
+    return JSONResponse(
+        status_code=202, content={"job_id": job.id, "status": job.status}
+    )
+
 
-    directory_structure = await gh.get_directory_structure_from_url(request.repo_url)
-    all_content = await gh.get_all_content_from_url(request.repo_url)
+@app.get("/summarize/jobs/{job_id}", operation_id="get_summarize_job")
+async def get_summarize_job(job_id: str, _: str = Depends(verify_token)):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.model_dump(mode="json")
 
-    key_1 = request.gemini_key or key_manager.get_key(KeyGroup.GEMINI)
-    key_2 = request.gemini_key or key_manager.get_key(KeyGroup.GEMINI)
 
+@app.post("/summarize/stream", operation_id="summarize_repo_stream")
+async def summarize_stream(request: SummarizeRequest, _: str = Depends(verify_token)):
+    """Summarize a repository, streaming progress and both documents as SSE"""
+    if not _validate_repo_url(request.repo_url):
+        raise HTTPException(status_code=400, detail="Invalid GitHub URL")
+    logger.info(f"Streaming summary for repository: {request.repo_url}")
+
+    return StreamingResponse(
+        _stream_summary(request),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_summary(request: SummarizeRequest) -> AsyncIterator[str]:
+    """Emit ``stage`` events, document chunks, then ``done`` or ``error``.
+
+    Chunk events are named after their document, "business_summary" or
+    "technical_documentation", and carry ``{"text": ...}``. The full
+    documents are stored once generation finishes.
+    """
+    repo_url = request.repo_url
     try:
-        client_1, client_2 = GoogleGenAI(key_1), GoogleGenAI(key_2)
-        business_summary = await client_1.get_business_summary(
-            directory_structure, all_content
+        commit_sha = await gh.get_latest_commit_sha_from_url(repo_url)
+        if not request.force and await supabase.check_repo_url_exists(
+            repo_url, commit_sha
+        ):
+            yield _sse_event(
+                "done",
+                {
+                    "message": "Repository summary is up to date",
+                    "commit_sha": commit_sha,
+                },
+            )
+            return
+
+        yield _sse_event("stage", {"stage": JobStage.DOWNLOADING})
+        directory_structure, codebase = await gh.get_codebase_from_url(
+            repo_url, commit_sha, max_tokens=codebase_max_tokens
         )
-        technical_documentation = await client_2.get_technical_documentation(
-            directory_structure, all_content
+
+        yield _sse_event("stage", {"stage": JobStage.GENERATING})
+        documents = {"business_summary": [], "technical_documentation": []}
+        if _exceeds_prompt_limit(directory_structure, codebase):
+            # Map-reduce has nothing to stream until the final documents
+            business_summary, technical_documentation, _ = await summarize_codebase(
+                partial(_gemini_client, request.gemini_key),
+                directory_structure,
+                codebase,
+                summary_cache,
+                fan_out=map_reduce_fan_out,
+                concurrency=map_reduce_concurrency,
+            )
+            for document, text in (
+                ("business_summary", business_summary),
+                ("technical_documentation", technical_documentation),
+            ):
+                documents[document].append(text)
+                yield _sse_event(document, {"text": text})
+        else:
+            async with _gemini_client(request.gemini_key) as client:
+                async for document, text in client.stream_documentation(
+                    directory_structure, codebase
+                ):
+                    documents[document].append(text)
+                    yield _sse_event(document, {"text": text})
+
+        yield _sse_event("stage", {"stage": JobStage.STORING})
+        await supabase.insert_repo_summary(
+            repo_url,
+            "".join(documents["business_summary"]),
+            "".join(documents["technical_documentation"]),
+            commit_sha,
         )
+        await _update_repo_metadata(repo_url)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # The response has already started, so errors go down the stream
+        logger.error(f"Streaming summary for {repo_url} failed: {e}")
+        yield _sse_event("error", {"detail": str(e)})
+        return
 
-    supabase.insert_repo_summary(
-        request.repo_url, business_summary, technical_documentation
+    yield _sse_event(
+        "done",
+        {"message": "Repository summarized successfully", "commit_sha": commit_sha},
     )
-    try:
-        await _update_repo_metadata(request.repo_url)
-    except GitHubAccessError as e:
-        logger.error(f"Error updating repo metadata for {request.repo_url}: {e}")
-    return JSONResponse(content={"message": "Repository summarized successfully"})
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _run_summarize_job(
+    job: Job,
+    set_stage: Callable[[JobStage], Awaitable[None]],
+    gemini_key: str | None = None,
+) -> dict:
+    logger.info(f"Summarizing repository: {job.repo_url}")
+    commit_sha = await gh.get_latest_commit_sha_from_url(job.repo_url)
+    if not job.params.get("force") and await supabase.check_repo_url_exists(
+        job.repo_url, commit_sha
+    ):
+        logger.info(f"Summary for {job.repo_url}@{commit_sha} is up to date")
+        return {"message": "Repository summary is up to date", "commit_sha": commit_sha}
+
+    # Identical requests that arrive while a run is in flight share its result
+    timings = await summarize_flights.do(
+        (job.repo_url, commit_sha),
+        lambda: _summarize_repo(job.repo_url, commit_sha, gemini_key, set_stage),
+    )
+    return {
+        "message": "Repository summarized successfully",
+        "commit_sha": commit_sha,
+        "timings": timings,
+    }
+
+
+job_queue = JobQueue(
+    JobStore(os.getenv("JOB_DB_PATH", "tmp/jobs.sqlite3")),
+    _run_summarize_job,
+    concurrency=int(os.getenv("JOB_CONCURRENCY", CONCURRENCY)),
+    timeout=float(os.getenv("JOB_TIMEOUT_SECONDS", TIMEOUT_SECONDS)),
+)
+
+
+async def _summarize_repo(
+    repo_url: str,
+    commit_sha: str,
+    gemini_key: str | None = None,
+    on_stage: Callable[[JobStage], Awaitable[None]] | None = None,
+) -> dict[str, float]:
+    """Run the summarize pipeline and return per-stage timings in seconds."""
+
+    async def report(stage: JobStage):
+        if on_stage is not None:
+            await on_stage(stage)
+
+    async def get_codebase() -> tuple[str, Files]:
+        return await gh.get_codebase_from_url(
+            repo_url, commit_sha, report, max_tokens=codebase_max_tokens
+        )
+
+    async def get_documentation(
+        codebase: tuple[str, Files], reuse_notes: bool = False
+    ) -> tuple[str, str]:
+        # One key for both documents so they can share the cached codebase context
+        await report(JobStage.GENERATING)
+        # A repo documented before goes through chunk notes even when it fits
+        # one prompt, so an update only resends the chunks that changed
+        if reuse_notes or _exceeds_prompt_limit(*codebase):
+            business_summary, technical_documentation, stats = await summarize_codebase(
+                partial(_gemini_client, gemini_key),
+                *codebase,
+                summary_cache,
+                fan_out=map_reduce_fan_out,
+                concurrency=map_reduce_concurrency,
+            )
+            logger.info(f"Map-reduce stats for {repo_url}: {stats}")
+            return business_summary, technical_documentation
+        async with _gemini_client(gemini_key) as client:
+            return await client.get_documentation(*codebase)
+
+    async def get_documentation_incrementally() -> tuple[str, str]:
+        business_summary, technical_documentation, stats = (
+            await summarize_incrementally(
+                gh,
+                summary_cache,
+                repo_url,
+                commit_sha,
+                get_documentation,
+                report,
+                max_tokens=codebase_max_tokens,
+            )
+        )
+        logger.info(f"Incremental summary stats for {repo_url}: {stats}")
+        return business_summary, technical_documentation
+
+    async def store_summary(documentation: tuple[str, str]):
+        business_summary, technical_documentation = documentation
+        await report(JobStage.STORING)
+        await supabase.insert_repo_summary(
+            repo_url, business_summary, technical_documentation, commit_sha
+        )
+
+    async def update_metadata(_):
+        await _update_repo_metadata(repo_url)
+
+    scheduler = StageScheduler()
+    if summary_cache is not None:
+        scheduler.add("documentation", get_documentation_incrementally)
+    else:
+        scheduler.add("codebase", get_codebase)
+        scheduler.add("documentation", get_documentation, ("codebase",))
+    scheduler.add("store_summary", store_summary, ("documentation",))
+    scheduler.add("repo_metadata", update_metadata, ("documentation",))
+    await scheduler.run()
+    return scheduler.timings
+
+
+@asynccontextmanager
+async def _gemini_client(
+    gemini_key: str | None = None,
+) -> AsyncIterator[GoogleGenAI]:
+    """Use the caller's own key if given, otherwise lease one from the pool."""
+    if gemini_key:
+        yield GoogleGenAI(
+            gemini_key,
+            gemini_max_prompt_tokens,
+            token_estimator,
+            map_model=gemini_map_model,
+        )
+        return
+    async with key_manager.lease(KeyGroup.GEMINI) as lease:
+        yield lease.client
+
+
+def _exceeds_prompt_limit(directory_structure: str, codebase: Files) -> bool:
+    chars_per_token = token_estimator.chars_per_token(
+        GEMINI_MODEL, GEMINI_CHARS_PER_TOKEN
+    )
+    chars = len(directory_structure) + files_size(codebase)
+    return chars / chars_per_token > gemini_max_prompt_tokens
 
 
 @app.post("/repo-metadata-cron")
 async def repo_metadata_cron(_: str = Depends(verify_token)):
-    repo_urls = supabase.get_all_repo_urls()
-    for repo_url in repo_urls:
-        try:
-            metadata = await gh.get_repo_metadata_from_url(repo_url)
-            supabase.upsert_repo_metadata(repo_url, metadata)
-        except GitHubAccessError as e:
-            logger.error(f"Error updating repo metadata for {repo_url}: {e}")
+    return await refresh_repo_metadata(
+        gh,
+        supabase,
+        supabase.iter_repo_urls(int(os.getenv("REPO_PAGE_SIZE", PAGE_SIZE))),
+        concurrency=int(os.getenv("METADATA_REFRESH_CONCURRENCY", 4)),
+    )
 
 
 @app.post("/summarize-local", operation_id="summarize_store_local")
@@ -93,12 +444,15 @@ async def summarize_store_local(
         raise HTTPException(status_code=400, detail="Invalid GitHub URL")
     logger.info(f"Summarizing repository: {request.repo_url}")
 
-    directory_structure = await gh.get_directory_structure_from_url(request.repo_url)
-    all_content = await gh.get_all_content_from_url(request.repo_url)
+    try:
+        directory_structure, all_content = await gh.get_codebase_from_url(
+            request.repo_url, max_tokens=codebase_max_tokens
+        )
+    except GitHubArchiveTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
 
-    business_summary, technical_documentation = await asyncio.gather(
-        openai.get_business_summary(directory_structure, all_content),
-        openai.get_technical_documentation(directory_structure, all_content),
+    business_summary, technical_documentation = await openai.get_documentation(
+        directory_structure, all_content
     )
 
     with open("tmp/openai/business_summary.txt", "w") as f:
@@ -114,6 +468,7 @@ def _validate_repo_url(repo_url: str) -> bool:
 async def _update_repo_metadata(repo_url: str):
     try:
         metadata = await gh.get_repo_metadata_from_url(repo_url)
-        supabase.upsert_repo_metadata(repo_url, metadata)
+        await supabase.upsert_repo_metadata(repo_url, metadata)
+        await gh.commit_repo_metadata([repo_url])
     except GitHubAccessError as e:
         logger.error(f"Error updating repo metadata for {repo_url}: {e}")
@@ -1,24 +1,37 @@
 import asyncio
 import logging
+from gitsummarize.cache.metadata_cache import RepoMetadataCache
 from gitsummarize.clients import supabase
 from gitsummarize.clients.github import GithubClient
+from gitsummarize.clients.supabase import PAGE_SIZE
 import os
 
-from gitsummarize.exceptions.exceptions import GitHubAccessError
+from gitsummarize.pipeline.metadata_refresh import refresh_repo_metadata
 
 logger = logging.getLogger(__name__)
 
-gh = GithubClient(os.getenv("GITHUB_TOKEN"))
-supabase = supabase.SupabaseClient(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ADMIN_KEY"))
+gh = GithubClient(
+    os.getenv("GITHUB_TOKEN"),
+    extra_tokens=[t for t in os.getenv("GITHUB_EXTRA_TOKENS", "").split(",") if t],
+    metadata_cache=RepoMetadataCache(
+        os.getenv("GITHUB_METADATA_CACHE_PATH", "tmp/repo_metadata.sqlite3")
+    ),
+)
+supabase = supabase.AsyncSupabaseClient(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ADMIN_KEY"))
 
 async def main():
-    repo_urls = supabase.get_all_repo_urls()
-    for repo_url in repo_urls:
-        try:
-            metadata = await gh.get_repo_metadata_from_url(repo_url)
-            supabase.upsert_repo_metadata(repo_url, metadata)
-        except GitHubAccessError as e:
-            logger.error(f"Error updating repo metadata for {repo_url}: {e}")
+    async with gh:
+        await refresh_repo_metadata(
+            gh,
+            supabase,
+            supabase.iter_repo_urls(int(os.getenv("REPO_PAGE_SIZE", PAGE_SIZE))),
+            concurrency=int(os.getenv("METADATA_REFRESH_CONCURRENCY", 4)),
+        )
+        logger.info(f"GitHub pool stats: {gh.get_pool_stats()}")
+        logger.info(f"GitHub rate limit stats: {gh.get_rate_limit_stats()}")
+        logger.info(f"Metadata cache stats: {gh.get_metadata_cache_stats()}")
+    logger.info(f"Supabase query stats: {supabase.get_stats()}")
+    await supabase.close()
 
 
 if __name__ == "__main__":
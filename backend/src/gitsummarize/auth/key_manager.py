@@ -1,7 +1,19 @@
-from collections import defaultdict
+import asyncio
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from enum import StrEnum
-import itertools
+import logging
 import random
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+USAGE_WINDOW = 60  # seconds, quotas are per minute
+COOLDOWN_SECONDS = 60
+MAX_COOLDOWN_SECONDS = 60 * 15
 
 
 class KeyGroup(StrEnum):
@@ -9,15 +21,160 @@ class KeyGroup(StrEnum):
     GEMINI = "gemini"
 
 
+@dataclass
+class KeyLease:
+    key: str
+    client: Any = None
+
+
+@dataclass
+class _KeyState:
+    key: str
+    client: Any = None
+    tokens_per_minute: int | None = None
+    in_flight: int = 0
+    requests: int = 0
+    rate_limited: int = 0
+    consecutive_rate_limits: int = 0
+    cooldown_until: float = 0.0
+    usage: deque[tuple[float, int]] = field(default_factory=deque)
+
+    def tokens_last_minute(self, now: float) -> int:
+        while self.usage and self.usage[0][0] <= now - USAGE_WINDOW:
+            self.usage.popleft()
+        return sum(tokens for _, tokens in self.usage)
+
+    def ready_in(self, now: float) -> float:
+        """Seconds until this key may be used again, 0 if it is usable now."""
+        wait = max(0.0, self.cooldown_until - now)
+        if self.tokens_per_minute and self.usage:
+            if self.tokens_last_minute(now) >= self.tokens_per_minute:
+                wait = max(wait, self.usage[0][0] + USAGE_WINDOW - now)
+        return wait
+
+
 class KeyManager:
+    """Hand out the least-loaded healthy API key of a group.
+
+    Each key tracks its in-flight calls, the tokens it used in the last
+    minute and a cooldown that starts when the provider answers 429. Keys
+    can carry a long-lived client so their HTTP connections are reused
+    across requests. Callers should prefer ``lease``, which does the
+    bookkeeping; ``get_key`` only picks a key.
+    """
+
     def __init__(self):
-        self.keys = defaultdict(list)
-        self.iterators = {}
+        self.keys: dict[KeyGroup, list[_KeyState]] = defaultdict(list)
 
-    def add_key(self, group: KeyGroup, key: str):
-        self.keys[group].append(key)
-        self.iterators[group] = itertools.cycle(self.keys[group])
-        random.shuffle(self.keys[group])
+    def add_key(
+        self,
+        group: KeyGroup,
+        key: str,
+        client: Any = None,
+        tokens_per_minute: int | None = None,
+    ):
+        self.keys[group].append(_KeyState(key, client, tokens_per_minute))
 
     def get_key(self, group: KeyGroup) -> str:
-        return next(self.iterators[group])
+        return self._pick(group, time.monotonic()).key
+
+    @asynccontextmanager
+    async def lease(self, group: KeyGroup) -> AsyncIterator[KeyLease]:
+        """Hold the best key of ``group`` for the duration of a call.
+
+        Waits while every key is cooling down or over its token quota. A 429
+        raised inside the block puts the key on cooldown before re-raising.
+        """
+        state = await self._acquire(group)
+        state.in_flight += 1
+        state.requests += 1
+        try:
+            yield KeyLease(state.key, state.client)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self._cool_down(group, state)
+            raise
+        else:
+            state.consecutive_rate_limits = 0
+        finally:
+            state.in_flight -= 1
+
+    def record_usage(self, group: KeyGroup, key: str, tokens: int):
+        """Count ``tokens`` against the per-minute quota of ``key``."""
+        for state in self.keys[group]:
+            if state.key == key:
+                state.usage.append((time.monotonic(), tokens))
+                return
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            group: [
+                {
+                    "key": _mask(state.key),
+                    "in_flight": state.in_flight,
+                    "requests": state.requests,
+                    "rate_limited": state.rate_limited,
+                    "cooldown_remaining": max(0.0, state.cooldown_until - now),
+                    "tokens_last_minute": state.tokens_last_minute(now),
+                    "tokens_per_minute": state.tokens_per_minute,
+                    "utilization": (
+                        state.tokens_last_minute(now) / state.tokens_per_minute
+                        if state.tokens_per_minute
+                        else None
+                    ),
+                }
+                for state in states
+            ]
+            for group, states in self.keys.items()
+        }
+
+    async def _acquire(self, group: KeyGroup) -> _KeyState:
+        if not self.keys[group]:
+            raise ValueError(f"No keys configured for {group}")
+        while True:
+            now = time.monotonic()
+            wait = min(state.ready_in(now) for state in self.keys[group])
+            if wait <= 0:
+                return self._pick(group, now)
+            logger.warning(f"All {group} keys are rate limited, waiting {wait:.0f}s")
+            await asyncio.sleep(wait)
+
+    def _pick(self, group: KeyGroup, now: float) -> _KeyState:
+        states = self.keys[group]
+        healthy = [state for state in states if state.ready_in(now) <= 0] or states
+        # Random last so ties don't always land on the first key
+        return min(
+            healthy,
+            key=lambda state: (
+                state.in_flight,
+                state.tokens_last_minute(now),
+                random.random(),
+            ),
+        )
+
+    def _cool_down(self, group: KeyGroup, state: _KeyState):
+        cooldown = min(
+            COOLDOWN_SECONDS * 2**state.consecutive_rate_limits, MAX_COOLDOWN_SECONDS
+        )
+        state.rate_limited += 1
+        state.consecutive_rate_limits += 1
+        state.cooldown_until = time.monotonic() + cooldown
+        logger.warning(
+            f"{group} key {_mask(state.key)} was rate limited, "
+            f"cooling down for {cooldown}s"
+        )
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    # google-genai errors carry the status in ``code``, OpenAI ones in
+    # ``status_code`` and aiohttp ones in ``status``
+    return 429 in (
+        getattr(error, "code", None),
+        getattr(error, "status_code", None),
+        getattr(error, "status", None),
+    )
+
+
+def _mask(key: str) -> str:
+    return f"...{key[-4:]}" if key else ""
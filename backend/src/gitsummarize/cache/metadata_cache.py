@@ -0,0 +1,100 @@
+import threading
+import time
+from pathlib import Path
+
+from gitsummarize.cache.sqlite import open_database
+from gitsummarize.model.repo_metadata import RepoMetadata
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repo_metadata (
+    repo TEXT PRIMARY KEY,
+    etag TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class RepoMetadataCache:
+    """ETags and last-known metadata of GitHub repositories, in SQLite.
+
+    Lets metadata refreshes send conditional requests: GitHub answers an
+    unchanged repository with a 304, which doesn't count against the rate
+    limit. Reads and writes are single statements over the primary key, quick
+    enough to run in a worker thread per refresh batch.
+    """
+
+    def __init__(self, path: str | Path):
+        self._lock = threading.Lock()
+        self._conn = open_database(path, _SCHEMA)
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def get(self, owner: str, repo: str) -> tuple[str, RepoMetadata] | None:
+        """Return the (etag, metadata) last stored for the repository."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, metadata FROM repo_metadata WHERE repo = ?",
+                (_key(owner, repo),),
+            ).fetchone()
+        self._stats["hits" if row else "misses"] += 1
+        if row is None:
+            return None
+        etag, metadata = row
+        return etag, RepoMetadata.model_validate_json(metadata)
+
+    def put(self, owner: str, repo: str, etag: str, metadata: RepoMetadata):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO repo_metadata (repo, etag, metadata, updated_at) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (repo) DO UPDATE SET "
+                "etag = excluded.etag, metadata = excluded.metadata, "
+                "updated_at = excluded.updated_at",
+                (_key(owner, repo), etag, metadata.model_dump_json(), time.time()),
+            )
+
+    def get_many(
+        self, repos: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], tuple[str, RepoMetadata]]:
+        """Like ``get`` for many (owner, repo) pairs, omitting unknown ones."""
+        keys = {_key(owner, repo): (owner, repo) for owner, repo in repos}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT repo, etag, metadata FROM repo_metadata WHERE repo IN "
+                f"({', '.join('?' * len(keys))})",
+                list(keys),
+            ).fetchall()
+        self._stats["hits"] += len(rows)
+        self._stats["misses"] += len(keys) - len(rows)
+        return {
+            keys[key]: (etag, RepoMetadata.model_validate_json(metadata))
+            for key, etag, metadata in rows
+        }
+
+    def put_many(self, metadata: dict[tuple[str, str], RepoMetadata]):
+        """Store metadata fetched without an ETag, keeping any ETag stored."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO repo_metadata (repo, etag, metadata, updated_at) "
+                "VALUES (?, '', ?, ?) ON CONFLICT (repo) DO UPDATE SET "
+                "metadata = excluded.metadata, updated_at = excluded.updated_at",
+                [
+                    (_key(owner, repo), value.model_dump_json(), now)
+                    for (owner, repo), value in metadata.items()
+                ],
+            )
+
+    def record_not_modified(self):
+        self._stats["not_modified"] += 1
+
+    def get_stats(self) -> dict:
+        return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _key(owner: str, repo: str) -> str:
+    # GitHub owner and repository names are case-insensitive
+    return f"{owner}/{repo}".lower()
@@ -0,0 +1,175 @@
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import Counter, OrderedDict
+from enum import StrEnum
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHE_BYTES = 5 * 1000 * 1000 * 1000  # 5gb
+
+
+class CacheTier(StrEnum):
+    ARCHIVE = "archive"
+    DIRECTORY_STRUCTURE = "directory_structure"
+    CONTENT = "content"
+
+
+_SUFFIXES = {
+    CacheTier.ARCHIVE: ".zip",
+    CacheTier.DIRECTORY_STRUCTURE: ".tree.txt",
+    CacheTier.CONTENT: ".content.json",
+}
+
+
+class RepoCache:
+    """Disk cache for repository snapshots keyed by (owner, repo, commit_sha).
+
+    All tiers share one size budget. Entries are evicted least recently used
+    first, and file mtimes record recency so the order survives a restart.
+    Archives fetched with ``pin=True`` are never evicted until every reader
+    has passed them to release_archive. Putting an archive moves a file that
+    can be gigabytes large and evicting deletes others, so call methods from
+    a worker thread.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int = MAX_CACHE_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+        self._size = 0
+        self._pins: Counter[Path] = Counter()
+        self._stats = {tier: {"hits": 0, "misses": 0} for tier in CacheTier}
+        self._load_index()
+
+    def get_archive(
+        self, owner: str, repo: str, commit_sha: str, pin: bool = False
+    ) -> Path | None:
+        path = self._path(owner, repo, commit_sha, CacheTier.ARCHIVE)
+        return path if self._touch(path, CacheTier.ARCHIVE, pin) else None
+
+    def put_archive(
+        self, owner: str, repo: str, commit_sha: str, src: Path, pin: bool = False
+    ) -> Path:
+        """Move a downloaded archive into the cache and return its new path."""
+        path = self._path(owner, repo, commit_sha, CacheTier.ARCHIVE)
+        tmp_path = self._partial_path(path)
+        try:
+            shutil.move(src, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self._add(path, pin)
+        return path
+
+    def release_archive(self, path: Path):
+        """Let an archive pinned by get_archive or put_archive be evicted again."""
+        with self._lock:
+            self._pins[path] -= 1
+            if self._pins[path] <= 0:
+                del self._pins[path]
+            evicted = self._evict()
+        self._unlink(evicted)
+
+    def get_text(
+        self, owner: str, repo: str, commit_sha: str, tier: CacheTier
+    ) -> str | None:
+        path = self._path(owner, repo, commit_sha, tier)
+        if not self._touch(path, tier):
+            return None
+        try:
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            # Evicted between the index lookup and the read
+            return None
+
+    def put_text(
+        self, owner: str, repo: str, commit_sha: str, tier: CacheTier, text: str
+    ):
+        path = self._path(owner, repo, commit_sha, tier)
+        tmp_path = self._partial_path(path)
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+        self._add(path)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "tiers": {tier: dict(stats) for tier, stats in self._stats.items()},
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _path(self, owner: str, repo: str, commit_sha: str, tier: CacheTier) -> Path:
+        name = "__".join(re.sub(r"[^\w.-]", "_", part) for part in (owner, repo))
+        return self.cache_dir / f"{name}__{commit_sha}{_SUFFIXES[tier]}"
+
+    def _partial_path(self, path: Path) -> Path:
+        return path.with_name(f"{path.name}.{threading.get_ident()}.partial")
+
+    def _touch(self, path: Path, tier: CacheTier, pin: bool = False) -> bool:
+        with self._lock:
+            if path not in self._entries:
+                self._stats[tier]["misses"] += 1
+                return False
+            self._stats[tier]["hits"] += 1
+            self._entries.move_to_end(path)
+            if pin:
+                self._pins[path] += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            if pin:
+                self.release_archive(path)
+            return False
+        return True
+
+    def _add(self, path: Path, pin: bool = False):
+        size = path.stat().st_size
+        with self._lock:
+            self._size -= self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._size += size
+            if pin:
+                self._pins[path] += 1
+            evicted = self._evict()
+        self._unlink(evicted)
+
+    def _evict(self) -> list[Path]:
+        evicted = []
+        # Never evict the entry that was just added, even if it alone is too
+        # big, nor an archive a reader still has open
+        for path in list(self._entries)[:-1]:
+            if self._size <= self.max_bytes:
+                break
+            if self._pins[path]:
+                continue
+            self._size -= self._entries.pop(path)
+            evicted.append(path)
+        return evicted
+
+    def _unlink(self, paths: list[Path]):
+        for path in paths:
+            path.unlink(missing_ok=True)
+            logger.info(f"Evicted {path.name} from repo cache")
+
+    def _load_index(self):
+        files = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix == ".partial":
+                path.unlink(missing_ok=True)
+                continue
+            if path.is_file():
+                stat = path.stat()
+                files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._size += size
+        self._unlink(self._evict())
@@ -0,0 +1,17 @@
+import sqlite3
+from pathlib import Path
+
+
+def open_database(path: str | Path, schema: str) -> sqlite3.Connection:
+    """Open the SQLite database at ``path``, creating it with ``schema``.
+
+    The connection may be used from any thread, so callers must serialize
+    access to it, e.g. with a threading.Lock. Write-ahead logging lets other
+    processes read while one writes.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    with conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(schema)
+    return conn
@@ -0,0 +1,99 @@
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from gitsummarize.cache.sqlite import open_database
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_summaries (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repo_documents (
+    repo_url TEXT PRIMARY KEY,
+    commit_sha TEXT NOT NULL,
+    business_summary TEXT NOT NULL,
+    technical_documentation TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class RepoDocuments:
+    commit_sha: str
+    business_summary: str
+    technical_documentation: str
+
+
+class SummaryCache:
+    """Intermediate chunk summaries and the last documents of each repo.
+
+    Chunk summaries are keyed by the hash of the files they were written
+    from, so they can be reused by any later commit that leaves those files
+    alone. summarize_codebase reads the notes of all its chunks in one call
+    and writes the new ones in another, each from a worker thread.
+    """
+
+    def __init__(self, path: str | Path):
+        self._lock = threading.Lock()
+        self._conn = open_database(path, _SCHEMA)
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get_chunk_summaries(self, keys: list[str]) -> dict[str, str]:
+        """Return the cached summaries among ``keys``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, summary FROM chunk_summaries WHERE key IN "
+                f"({', '.join('?' * len(keys))})",
+                keys,
+            ).fetchall()
+        self._stats["hits"] += len(rows)
+        self._stats["misses"] += len(keys) - len(rows)
+        return dict(rows)
+
+    def put_chunk_summaries(self, summaries: dict[str, str]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_summaries (key, summary, updated_at) "
+                "VALUES (?, ?, ?)",
+                [(key, summary, now) for key, summary in summaries.items()],
+            )
+
+    def get_documents(self, repo_url: str) -> RepoDocuments | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT commit_sha, business_summary, technical_documentation "
+                "FROM repo_documents WHERE repo_url = ?",
+                (repo_url,),
+            ).fetchone()
+        return RepoDocuments(*row) if row else None
+
+    def put_documents(self, repo_url: str, documents: RepoDocuments):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO repo_documents (repo_url, commit_sha, "
+                "business_summary, technical_documentation, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    repo_url,
+                    documents.commit_sha,
+                    documents.business_summary,
+                    documents.technical_documentation,
+                    time.time(),
+                ),
+            )
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            (chunks,) = self._conn.execute(
+                "SELECT COUNT(*) FROM chunk_summaries"
+            ).fetchone()
+        return {**self._stats, "chunks": chunks}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
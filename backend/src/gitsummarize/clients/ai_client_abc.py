@@ -1,7 +1,29 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+from gitsummarize.codebase.format import (
+    Files,
+    format_file,
+    join_files,
+    render_prompt,
+)
+from gitsummarize.codebase.packing import pack_codebase
+from gitsummarize.prompts.business_logic import BUSINESS_SUMMARY_INSTRUCTIONS
+from gitsummarize.prompts.chunk_summary import (
+    CHUNK_SUMMARY_PROMPT,
+    CODEBASE_SUMMARIES_CONTEXT_PROMPT,
+    MERGE_SUMMARIES_PROMPT,
+)
+from gitsummarize.prompts.technical_documentation import (
+    TECHNICAL_DOCUMENTATION_INSTRUCTIONS,
+)
 
 
 class AIBaseClient(ABC):
+    # Model for intermediate notes; None uses the client's main model
+    map_model: str | None = None
+
     @abstractmethod
     def get_business_summary(self, prompt: str) -> str:
         pass
@@ -9,6 +31,142 @@ class AIBaseClient(ABC):
     @abstractmethod
     def get_technical_documentation(self, prompt: str) -> str:
         pass
-    
-    def _truncate_text(self, text: str, max_tokens: int, multiplier: float = 3.7) -> str:
-        return text[: int(max_tokens * multiplier)]
\ No newline at end of file
+
+    async def get_documentation(
+        self, directory_structure: str, codebase: Files
+    ) -> tuple[str, str]:
+        """Generate (business_summary, technical_documentation) concurrently.
+
+        Clients that can upload the shared codebase context once override this.
+        """
+        business_summary, technical_documentation = await asyncio.gather(
+            self.get_business_summary(directory_structure, codebase),
+            self.get_technical_documentation(directory_structure, codebase),
+        )
+        return business_summary, technical_documentation
+
+    @abstractmethod
+    async def complete(self, prompt: str, model: str | None = None) -> str:
+        """Send a single prompt and return the model's reply.
+
+        ``model`` defaults to the client's main model.
+        """
+
+    async def summarize_chunk(self, path: str, content: str) -> str:
+        """Write intermediate notes on one chunk of the codebase."""
+        return await self.complete(
+            CHUNK_SUMMARY_PROMPT.format(path=path, content=content),
+            model=self.map_model,
+        )
+
+    async def merge_summaries(self, path: str, summaries: dict[str, str]) -> str:
+        """Condense the notes of several chunks into notes on ``path``."""
+        return await self.complete(
+            MERGE_SUMMARIES_PROMPT.format(
+                path=path,
+                summaries=join_files(
+                    format_file(chunk_path, summary)
+                    for chunk_path, summary in summaries.items()
+                ),
+            ),
+            model=self.map_model,
+        )
+
+    async def get_documentation_from_summaries(
+        self, directory_structure: str, summaries: dict[str, str]
+    ) -> tuple[str, str]:
+        """Generate (business_summary, technical_documentation) from chunk notes.
+
+        ``summaries`` maps chunk paths to their notes from summarize_chunk.
+        """
+        context = CODEBASE_SUMMARIES_CONTEXT_PROMPT.format(
+            directory_structure=directory_structure,
+            summaries=join_files(
+                format_file(path, summary) for path, summary in summaries.items()
+            ),
+        )
+        business_summary, technical_documentation = await asyncio.gather(
+            self.complete(context + BUSINESS_SUMMARY_INSTRUCTIONS),
+            self.complete(context + TECHNICAL_DOCUMENTATION_INSTRUCTIONS),
+        )
+        return business_summary, technical_documentation
+
+    async def stream_documentation(
+        self, directory_structure: str, codebase: Files
+    ) -> AsyncIterator[tuple[str, str]]:
+        """Yield (document, text) chunks of both documents as they are generated.
+
+        ``document`` is "business_summary" or "technical_documentation" and
+        chunks of the two are interleaved. Clients that can't stream yield each
+        document whole once it is ready.
+        """
+        business_summary, technical_documentation = await self.get_documentation(
+            directory_structure, codebase
+        )
+        yield "business_summary", business_summary
+        yield "technical_documentation", technical_documentation
+
+    async def _merge_streams(
+        self, streams: dict[str, AsyncIterator[str]]
+    ) -> AsyncIterator[tuple[str, str]]:
+        """Interleave named text streams, yielding (name, chunk) as chunks arrive."""
+        queue: asyncio.Queue[tuple[str, str | None, Exception | None]] = asyncio.Queue()
+
+        async def pump(name: str, stream: AsyncIterator[str]):
+            try:
+                async for chunk in stream:
+                    await queue.put((name, chunk, None))
+            except Exception as e:
+                await queue.put((name, None, e))
+            else:
+                await queue.put((name, None, None))
+
+        tasks = [
+            asyncio.create_task(pump(name, stream)) for name, stream in streams.items()
+        ]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                name, chunk, error = await queue.get()
+                if error is not None:
+                    raise error
+                if chunk is None:
+                    remaining -= 1
+                    continue
+                yield name, chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _format_prompt(
+        self,
+        template: str,
+        directory_structure: str,
+        codebase: Files,
+        max_tokens: int,
+        multiplier: float = 3.7,
+    ) -> str:
+        """Fill a prompt template, packing whole files into the token budget.
+
+        The budget left for the codebase is whatever the template and the
+        directory structure don't use. The packed files are rendered straight
+        into the prompt by render_prompt, which also cuts the codebase short
+        should the estimate be off, so the prompt needs no truncating.
+        """
+        overhead = int((len(template) + len(directory_structure)) / multiplier)
+        packed = await asyncio.to_thread(
+            pack_codebase, codebase, max(0, max_tokens - overhead), multiplier
+        )
+        return await asyncio.to_thread(
+            render_prompt,
+            template,
+            int(max_tokens * multiplier),
+            packed,
+            directory_structure=directory_structure,
+        )
+
+    def _truncate_text(
+        self, text: str, max_tokens: int, multiplier: float = 3.7
+    ) -> str:
+        return text[: int(max_tokens * multiplier)]
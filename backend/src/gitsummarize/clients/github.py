@@ -1,16 +1,40 @@
 import asyncio
 import base64
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+import json
 from itertools import batched
 import logging
+import os
 from pathlib import Path
-from textwrap import dedent
+import tempfile
 import zipfile
 import aiohttp
-from typing import Dict, List
 
-from gitsummarize.constants.constants import VALID_FILE_EXTENSIONS
+from gitsummarize.cache.metadata_cache import RepoMetadataCache
+from gitsummarize.cache.repo_cache import CacheTier, RepoCache
+from gitsummarize.clients.github_rate_limiter import GithubRateLimiter, GithubResource
+from gitsummarize.codebase.compaction import (
+    CompactionOptions,
+    CompactionStats,
+    compact_codebase,
+)
+from gitsummarize.codebase.dedup import DedupStats, dedupe_codebase
+from gitsummarize.codebase.file_filter import (
+    RULE_FILES,
+    SNIFF_BYTES,
+    VALID_FILES,
+    RepoRules,
+    is_binary,
+)
+from gitsummarize.codebase.format import Files, file_size
+from gitsummarize.codebase.packing import CHARS_PER_TOKEN, score_file
+from gitsummarize.codebase.tree import MAX_DEPTH, MAX_ENTRIES, render_tree
 from gitsummarize.exceptions.exceptions import (
     GitHubAccessError,
+    GitHubArchiveTooLargeError,
     GitHubNotFoundError,
     GitHubRateLimitError,
     GitHubTreeError,
@@ -20,94 +44,739 @@ from gitsummarize.model.repo_metadata import RepoMetadata
 logger = logging.getLogger(__name__)
 
 FILE_LIMIT = 100 * 1000  # 100kb
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1mb
+
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 20
+DNS_CACHE_TTL = 300  # 5 minutes
+KEEPALIVE_TIMEOUT = 60  # 1 minute
+CONNECT_TIMEOUT = 10  # 10 seconds
+REQUEST_TIMEOUT = 60 * 10  # 10 minutes, zipballs of large repos are slow
+MAX_RATE_LIMIT_RETRIES = 3
+GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_BATCH_SIZE = 100  # repositories per query
+COMPARE_FILE_LIMIT = 300  # the compare API lists at most this many files
+
+
+def is_valid_file(path: str) -> bool:
+    """Whether a file with this path is included in the codebase text.
+
+    ``path`` is relative to the repository root. Files can still be dropped
+    by the repository's own rules or for being binary or too large.
+    """
+    return VALID_FILES.matches(path)
 
 
 class GithubClient:
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        limit: int = CONNECTION_LIMIT,
+        limit_per_host: int = CONNECTION_LIMIT_PER_HOST,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        request_timeout: float = REQUEST_TIMEOUT,
+        max_archive_size: int | None = None,
+        extract_workers: int | None = None,
+        cache: RepoCache | None = None,
+        tree_from_archive: bool = True,
+        extra_tokens: list[str] | None = None,
+        metadata_cache: RepoMetadataCache | None = None,
+        near_duplicates: bool = True,
+        compaction: CompactionOptions | None = None,
+        tree_max_depth: int | None = MAX_DEPTH,
+        tree_max_entries: int | None = MAX_ENTRIES,
+    ):
         self.token = token
-        self.headers = {"Authorization": f"Bearer {self.token}"}
+        # Requests are spread over every token within their rate limits
+        self.rate_limiter = GithubRateLimiter(
+            [t for t in [token, *(extra_tokens or [])] if t]
+        )
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(
+            total=request_timeout, sock_connect=connect_timeout
+        )
+        self.max_archive_size = max_archive_size
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.cache = cache
+        self.tree_from_archive = tree_from_archive
+        self.metadata_cache = metadata_cache
+        # (etag, metadata) fetched but not cached until the caller stored it,
+        # GraphQL fetches have no ETag and keep the cached one
+        self._uncommitted_metadata: dict[
+            tuple[str, str], tuple[str | None, RepoMetadata]
+        ] = {}
+        self.near_duplicates = near_duplicates
+        self.compaction = compaction
+        self.tree_max_depth = tree_max_depth
+        self.tree_max_entries = tree_max_entries
+        self._session: aiohttp.ClientSession | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._pool_stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+        self._dedup_stats = Counter()
+        self._compaction_stats = Counter()
+
+    async def __aenter__(self) -> "GithubClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the pooled session and extraction pool.
+
+        A later request opens fresh ones.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def get_pool_stats(self) -> dict:
+        """Connection pool counters since the client was created.
+
+        Every reused connection is a TCP+TLS handshake that was saved.
+        """
+        stats = dict(self._pool_stats)
+        stats["handshakes_saved"] = stats["connections_reused"]
+        stats["limit"] = self.limit
+        stats["limit_per_host"] = self.limit_per_host
+        stats["open"] = self._session is not None and not self._session.closed
+        return stats
+
+    def get_rate_limit_stats(self) -> dict:
+        return self.rate_limiter.get_stats()
+
+    def get_cache_stats(self) -> dict | None:
+        return self.cache.get_stats() if self.cache is not None else None
+
+    def get_dedup_stats(self) -> dict:
+        """Totals of the deduplication of every archive extracted so far."""
+        return dict(self._dedup_stats)
+
+    def get_compaction_stats(self) -> dict | None:
+        """Totals of the compaction of every archive extracted so far."""
+        if self.compaction is None:
+            return None
+        stats = dict(self._compaction_stats)
+        stats["ratio"] = (
+            stats["chars_after"] / stats["chars_before"]
+            if stats.get("chars_before")
+            else 1.0
+        )
+        return stats
+
+    def get_metadata_cache_stats(self) -> dict | None:
+        if self.metadata_cache is None:
+            return None
+        return self.metadata_cache.get_stats()
+
+    async def commit_repo_metadata(self, gh_urls: Iterable[str]):
+        """Cache the metadata last fetched for ``gh_urls``, once it is stored.
+
+        Fetches leave the metadata cache alone until then: had they cached
+        metadata the caller then failed to store, the next refresh would
+        find it unchanged and never store it.
+        """
+        without_etag = {}
+        for gh_url in gh_urls:
+            owner, repo = self._parse_gh_url(gh_url)
+            entry = self._uncommitted_metadata.pop((owner, repo), None)
+            if entry is None or self.metadata_cache is None:
+                continue
+            etag, metadata = entry
+            if etag is None:
+                without_etag[owner, repo] = metadata
+            else:
+                await asyncio.to_thread(
+                    self.metadata_cache.put, owner, repo, etag, metadata
+                )
+        if without_etag:
+            await asyncio.to_thread(self.metadata_cache.put_many, without_etag)
 
     async def get_repo_metadata_from_url(self, gh_url: str) -> RepoMetadata:
         owner, repo = self._parse_gh_url(gh_url)
         return await self.get_repo_metadata(owner, repo)
 
+    async def get_changed_repo_metadata_from_url(
+        self, gh_url: str
+    ) -> RepoMetadata | None:
+        """Return the repository's metadata, or None if it hasn't changed.
+
+        "Changed" is relative to the metadata cache, so without one every
+        call returns the metadata.
+        """
+        owner, repo = self._parse_gh_url(gh_url)
+        metadata, changed = await self._fetch_repo_metadata(owner, repo)
+        return metadata if changed else None
+
     async def get_repo_metadata(self, owner: str, repo: str) -> RepoMetadata:
+        metadata, _ = await self._fetch_repo_metadata(owner, repo)
+        return metadata
+
+    async def get_changed_repo_metadata_batch_from_urls(
+        self, gh_urls: list[str]
+    ) -> dict[str, RepoMetadata | None]:
+        """Batched get_changed_repo_metadata_from_url.
+
+        Maps every readable repository to its metadata, or to None if it
+        hasn't changed since it was cached. Unreadable ones are left out.
+        Changes are cached by commit_repo_metadata.
+        """
+        repos = {self._parse_gh_url(gh_url): gh_url for gh_url in gh_urls}
+        metadata = await self.get_repo_metadata_batch(list(repos))
+        if self.metadata_cache is None:
+            return {repos[key]: value for key, value in metadata.items()}
+
+        cached = await asyncio.to_thread(self.metadata_cache.get_many, list(metadata))
+        changed = {
+            key: value
+            for key, value in metadata.items()
+            if key not in cached or cached[key][1] != value
+        }
+        for key, value in changed.items():
+            self._uncommitted_metadata[key] = (None, value)
+        return {repos[key]: changed.get(key) for key in metadata}
+
+    async def get_repo_metadata_batch(
+        self, repos: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], RepoMetadata]:
+        """Fetch the metadata of many repositories in one GraphQL query.
+
+        ``repos`` holds (owner, repo) pairs, at most GRAPHQL_BATCH_SIZE of
+        them. Repositories that don't exist or can't be read are left out of
+        the result. Needs a token, GraphQL doesn't allow anonymous access.
+        Raises GitHubRateLimitError once the query is still rate limited
+        after the retries of _request.
+        """
+        variables = {}
+        parameters = []
+        selections = []
+        for i, (owner, repo) in enumerate(repos):
+            variables[f"owner{i}"] = owner
+            variables[f"name{i}"] = repo
+            parameters.append(f"$owner{i}: String!, $name{i}: String!")
+            selections.append(
+                f"r{i}: repository(owner: $owner{i}, name: $name{i}) {{"
+                " stargazerCount forkCount description primaryLanguage { name } }"
+            )
+        query = f"query({', '.join(parameters)}) {{ {' '.join(selections)} }}"
+
+        async with self._request(
+            "POST",
+            GRAPHQL_URL,
+            resource=GithubResource.GRAPHQL,
+            json={"query": query, "variables": variables},
+        ) as response:
+            await self._raise_for_status("graphql", "batch", response)
+            body = await response.json()
+        # Missing repositories come back as null with a NOT_FOUND error, the
+        # rest of the batch still resolves
+        data = body.get("data")
+        if data is None:
+            errors = body.get("errors") or []
+            logger.error(f"GraphQL metadata batch failed: {errors}")
+            # The GraphQL rate limit is reported with a 200 status
+            if any(error.get("type") == "RATE_LIMITED" for error in errors):
+                raise GitHubRateLimitError("graphql", "batch")
+            raise GitHubAccessError("graphql", "batch")
+
+        metadata = {}
+        for i, key in enumerate(repos):
+            node = data.get(f"r{i}")
+            if node is None:
+                continue
+            metadata[key] = RepoMetadata(
+                num_stars=node["stargazerCount"],
+                num_forks=node["forkCount"],
+                language=(node["primaryLanguage"] or {}).get("name"),
+                description=node["description"],
+            )
+        return metadata
+
+    async def _fetch_repo_metadata(
+        self, owner: str, repo: str
+    ) -> tuple[RepoMetadata, bool]:
+        """Fetch metadata with a conditional request when an ETag is cached.
+
+        Returns the metadata and whether it differs from the cached copy. The
+        new ETag is cached by commit_repo_metadata.
+        """
+        cached = None
+        if self.metadata_cache is not None:
+            cached = await asyncio.to_thread(self.metadata_cache.get, owner, repo)
+        # Metadata from batch refreshes is cached without an ETag
+        headers = {"If-None-Match": cached[0]} if cached and cached[0] else None
+
         url = f"https://api.github.com/repos/{owner}/{repo}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                data = await response.json()
-                if response.status != 200:
-                    raise GitHubAccessError(owner, repo)
-                return RepoMetadata(
-                    num_stars=data["stargazers_count"],
-                    num_forks=data["forks_count"],
-                    language=data["language"],
-                    description=data["description"],
-                )
+        async with self._get(url, headers) as response:
+            if response.status == 304 and cached:
+                self.metadata_cache.record_not_modified()
+                return cached[1], False
+            data = await response.json()
+            if response.status != 200:
+                raise GitHubAccessError(owner, repo)
+            etag = response.headers.get("ETag")
+        metadata = RepoMetadata(
+            num_stars=data["stargazers_count"],
+            num_forks=data["forks_count"],
+            language=data["language"],
+            description=data["description"],
+        )
+
+        if self.metadata_cache is not None and etag:
+            self._uncommitted_metadata[owner, repo] = (etag, metadata)
+        # The ETag also changes on pushes, which leave these fields alone
+        return metadata, cached is None or cached[1] != metadata
+
+    async def get_latest_commit_sha_from_url(self, gh_url: str) -> str:
+        owner, repo = self._parse_gh_url(gh_url)
+        return await self.get_latest_commit_sha(owner, repo)
+
+    async def get_latest_commit_sha(
+        self, owner: str, repo: str, ref: str = "HEAD"
+    ) -> str:
+        """Resolve a ref to a commit SHA without fetching the commit payload."""
+        url = f"https://api.github.com/repos/{owner}/{repo}/commits/{ref}"
+        headers = {"Accept": "application/vnd.github.sha"}
+        async with self._get(url, headers) as response:
+            await self._raise_for_status(owner, repo, response)
+            return (await response.text()).strip()
+
+    async def get_changed_paths_from_url(
+        self, gh_url: str, base_sha: str, head_sha: str
+    ) -> list[str] | None:
+        owner, repo = self._parse_gh_url(gh_url)
+        return await self.get_changed_paths(owner, repo, base_sha, head_sha)
+
+    async def get_changed_paths(
+        self, owner: str, repo: str, base_sha: str, head_sha: str
+    ) -> list[str] | None:
+        """Paths touched between two commits, relative to the repository root.
+
+        Renamed files are listed under both names. Returns None when the
+        comparison can't be trusted to be complete: the file list was cut
+        off, or ``head_sha`` doesn't descend from ``base_sha``, e.g. after a
+        force push.
+        """
+        url = (
+            f"https://api.github.com/repos/{owner}/{repo}/compare/"
+            f"{base_sha}...{head_sha}"
+        )
+        async with self._get(url) as response:
+            if response.status == 404:
+                return None
+            await self._raise_for_status(owner, repo, response)
+            data = await response.json()
+
+        # Three-dot comparisons diff against the merge base, which misses
+        # changes dropped from ``base_sha`` unless head is ahead of it
+        if data.get("status") not in ("ahead", "identical"):
+            return None
+        files = data.get("files", [])
+        if len(files) >= COMPARE_FILE_LIMIT:
+            return None
+        paths = []
+        for file in files:
+            paths.append(file["filename"])
+            if file.get("previous_filename"):
+                paths.append(file["previous_filename"])
+        return paths
+
+    async def get_repo_rules_from_url(
+        self, gh_url: str, commit_sha: str
+    ) -> RepoRules | None:
+        owner, repo = self._parse_gh_url(gh_url)
+        return await self.get_repo_rules(owner, repo, commit_sha)
+
+    async def get_repo_rules(
+        self, owner: str, repo: str, commit_sha: str
+    ) -> RepoRules | None:
+        """The repository's own exclusion rules at ``commit_sha``, see RepoRules.
 
-    async def get_all_content_from_url(self, gh_url: str) -> str:
+        Reads the same rule files as archive extraction, through the trees
+        and blobs APIs, so changed paths can be checked without downloading
+        the archive. Returns None when the tree listing was cut off.
+        """
+        tree_sha = await self._get_tree_sha(owner, repo, commit_sha)
+        url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_sha}?recursive=1"
+        async with self._get(url) as response:
+            await self._raise_for_status(owner, repo, response)
+            data = await response.json()
+        if data.get("truncated"):
+            return None
+
+        async def read_blob(sha: str) -> str:
+            url = f"https://api.github.com/repos/{owner}/{repo}/git/blobs/{sha}"
+            async with self._get(url) as response:
+                await self._raise_for_status(owner, repo, response)
+                blob = await response.json()
+            return base64.b64decode(blob["content"]).decode("utf-8", "replace")
+
+        rule_files = [
+            item
+            for item in data["tree"]
+            if item["type"] == "blob"
+            and item["path"].rpartition("/")[2] in RULE_FILES
+            and item.get("size", 0) <= FILE_LIMIT
+        ]
+        texts = await asyncio.gather(*(read_blob(item["sha"]) for item in rule_files))
+        return RepoRules.from_files(
+            {item["path"]: text for item, text in zip(rule_files, texts, strict=True)}
+        )
+
+    async def get_all_content_from_url(
+        self, gh_url: str, commit_sha: str | None = None
+    ) -> Files:
+        owner, repo = self._parse_gh_url(gh_url)
+        if self.cache is not None:
+            commit_sha = commit_sha or await self.get_latest_commit_sha(owner, repo)
+
+        content = await self._get_cached_files(owner, repo, commit_sha)
+        if content is None:
+            async with self._open_archive(owner, repo, commit_sha) as zip_path:
+                content = await self.get_all_content_from_zip(zip_path)
+            await self._put_cached_files(owner, repo, commit_sha, content)
+        return content
+
+    async def get_directory_structure_from_url(
+        self, gh_url: str, commit_sha: str | None = None
+    ) -> str:
         owner, repo = self._parse_gh_url(gh_url)
-        zip_path = await self.download_repository_zip(owner, repo)
-        return await self.get_all_content_from_zip(zip_path)
+        if self.cache is not None:
+            commit_sha = commit_sha or await self.get_latest_commit_sha(owner, repo)
+
+        tier = CacheTier.DIRECTORY_STRUCTURE
+        structure = await self._get_cached_text(owner, repo, commit_sha, tier)
+        if structure is None:
+            structure = await self.get_directory_structure(owner, repo, commit_sha)
+            await self._put_cached_text(owner, repo, commit_sha, tier, structure)
+        return structure
 
-    async def get_directory_structure_from_url(self, gh_url: str) -> str:
+    async def get_codebase_from_url(
+        self,
+        gh_url: str,
+        commit_sha: str | None = None,
+        on_stage: Callable[[str], Awaitable[None]] | None = None,
+        max_tokens: int | None = None,
+    ) -> tuple[str, Files]:
+        """Return (directory_structure, all_content) from a single download.
+
+        The tree is read from the archive's central directory, which saves the
+        four sequential API calls of get_directory_structure. The API path is
+        still used when tree_from_archive is off or the archive lists nothing.
+        ``on_stage`` is awaited with "downloading" and "extracting" as the
+        archive is fetched and unpacked. With ``max_tokens``, extraction stops
+        once that many tokens of files are read, see get_all_content_from_zip;
+        such partial content is not cached.
+        """
         owner, repo = self._parse_gh_url(gh_url)
-        return await self.get_directory_structure(owner, repo)
+        if self.cache is not None:
+            commit_sha = commit_sha or await self.get_latest_commit_sha(owner, repo)
+
+        tree_tier = CacheTier.DIRECTORY_STRUCTURE
+        structure = await self._get_cached_text(owner, repo, commit_sha, tree_tier)
+        content = await self._get_cached_files(owner, repo, commit_sha)
+        cached_structure = structure is not None
+
+        async def from_archive() -> tuple[str | None, Files]:
+            archive_structure, archive_content = None, content
+            if on_stage is not None:
+                await on_stage("downloading")
+            async with self._open_archive(owner, repo, commit_sha) as zip_path:
+                if on_stage is not None:
+                    await on_stage("extracting")
+                if structure is None and self.tree_from_archive:
+                    archive_structure = await self.get_directory_structure_from_zip(
+                        zip_path
+                    )
+                if archive_content is None:
+                    archive_content = await self.get_all_content_from_zip(
+                        zip_path, max_tokens
+                    )
+                    if max_tokens is None:
+                        await self._put_cached_files(
+                            owner, repo, commit_sha, archive_content
+                        )
+            return archive_structure, archive_content
+
+        if structure is None and not self.tree_from_archive:
+            # Walk the trees API while the archive downloads
+            structure, (_, content) = await asyncio.gather(
+                self.get_directory_structure(owner, repo, commit_sha), from_archive()
+            )
+        elif structure is None or content is None:
+            archive_structure, content = await from_archive()
+            structure = structure or archive_structure
 
-    async def get_all_content_from_zip(self, path: Path) -> str:
+        if not structure:
+            structure = await self.get_directory_structure(owner, repo, commit_sha)
+        if not cached_structure:
+            await self._put_cached_text(owner, repo, commit_sha, tree_tier, structure)
+        return structure, content
+
+    async def get_all_content_from_zip(
+        self, path: Path, max_tokens: int | None = None
+    ) -> Files:
+        """Extract (path, content) of every valid file in the archive.
+
+        Members are inflated and decoded in parallel on the extraction pool so
+        the event loop stays free; files are returned in archive order. With
+        ``max_tokens``, only the most useful files that fit are read, see
+        _read_zip_members_within_budget, so huge archives are never fully
+        inflated. The files are then shrunk by compact_codebase when
+        ``compaction`` is set, and copies of a file, and near-duplicates if
+        enabled, are collapsed by dedupe_codebase.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        valid_files = await loop.run_in_executor(
+            executor, self._list_valid_zip_members, path
+        )
+        if not valid_files:
+            return []
+
+        if max_tokens is not None:
+            files = await loop.run_in_executor(
+                executor,
+                self._read_zip_members_within_budget,
+                path,
+                valid_files,
+                max_tokens,
+            )
+        else:
+            # A few batches per worker keeps the pool busy when sizes are uneven
+            batch_size = -(-len(valid_files) // (self.extract_workers * 4))
+            batches = await asyncio.gather(
+                *(
+                    loop.run_in_executor(executor, self._read_zip_members, path, batch)
+                    for batch in batched(valid_files, batch_size, strict=False)
+                )
+            )
+            files = [file for batch in batches for file in batch]
+        codebase, compaction, stats = await loop.run_in_executor(
+            executor, self._compact_and_dedupe, files
+        )
+        label = valid_files[0].partition("/")[0]
+        if compaction is not None:
+            totals = compaction.as_dict()
+            del totals["ratio"]
+            self._compaction_stats.update(totals)
+            logger.info(
+                f"Compacted {label} to {compaction.ratio:.0%} of its size: "
+                f"{compaction.license_headers} license headers, "
+                f"{compaction.digested_files} data files digested, "
+                f"{compaction.capped_lines} long lines capped"
+            )
+        self._dedup_stats.update(stats.as_dict())
+        logger.info(
+            f"Deduplicated {label}: "
+            f"{stats.duplicate_files} copies and {stats.near_duplicate_files} "
+            f"near-duplicates of {stats.files} files, saving {stats.bytes_saved} "
+            f"bytes, ~{stats.tokens_saved} tokens"
+        )
+        return codebase
+
+    def _compact_and_dedupe(
+        self, files: Files
+    ) -> tuple[Files, CompactionStats | None, DedupStats]:
+        compaction = None
+        if self.compaction is not None:
+            files, compaction = compact_codebase(files, self.compaction)
+        files, stats = dedupe_codebase(files, self.near_duplicates)
+        return files, compaction, stats
+
+    async def get_directory_structure_from_zip(self, path: Path) -> str:
+        """Get the directory structure of an archive in a tree-like format."""
+        return await self._run_blocking(self._format_zip_directory_structure, path)
+
+    def _format_zip_directory_structure(self, path: Path) -> str:
         with zipfile.ZipFile(path, "r") as zip_ref:
-            valid_files = [
-                file
-                for file in zip_ref.namelist()
-                if file.endswith(VALID_FILE_EXTENSIONS)
-            ]
-
-            formatted_content = []
-            for file in valid_files:
-                try:
-                    if zip_ref.getinfo(file).file_size > FILE_LIMIT:
-                        logger.warning(f"Skipping file: {file} because it is too large")
-                        continue
-                    decoded_content = zip_ref.read(file).decode("utf-8")
-                except UnicodeDecodeError:
-                    logger.warning(f"Failed to decode content for file: {file}")
+            names = zip_ref.namelist()
+        # Drop the "{owner}-{repo}-{sha}/" root directory of the zipball
+        return self._render_tree(
+            (self._get_repo_path_from_zip_name(name), name.endswith("/"))
+            for name in names
+        )
+
+    def _list_valid_zip_members(self, path: Path) -> list[str]:
+        with zipfile.ZipFile(path, "r") as zip_ref:
+            files = [info for info in zip_ref.infolist() if not info.is_dir()]
+            rules = RepoRules.from_files(
+                {
+                    self._get_repo_path_from_zip_name(info.filename): zip_ref.read(
+                        info
+                    ).decode("utf-8", "replace")
+                    for info in files
+                    if info.filename.rpartition("/")[2] in RULE_FILES
+                    and info.file_size <= FILE_LIMIT
+                }
+            )
+            valid_files = []
+            excluded = 0
+            for info in files:
+                repo_path = self._get_repo_path_from_zip_name(info.filename)
+                if not is_valid_file(repo_path):
+                    continue
+                if rules.is_excluded(repo_path):
+                    excluded += 1
                     continue
-                formatted_content.append(
-                    self._get_formatted_content(
-                        self._get_file_name_from_zip_name(file),
-                        decoded_content,
+                if info.file_size > FILE_LIMIT:
+                    logger.warning(
+                        f"Skipping file: {info.filename} because it is too large"
                     )
+                    continue
+                valid_files.append(info.filename)
+            if excluded:
+                logger.info(
+                    f"Skipped {excluded} files ignored, vendored or generated "
+                    "according to the repository"
                 )
+            return valid_files
+
+    def _read_zip_members(self, path: Path, files: tuple[str, ...]) -> Files:
+        # Each batch opens its own handle, ZipFile reads share one file offset
+        with zipfile.ZipFile(path, "r") as zip_ref:
+            return list(self._iter_text_members(zip_ref, files))
+
+    def _read_zip_members_within_budget(
+        self, path: Path, files: list[str], max_tokens: int
+    ) -> Files:
+        """Read the most useful members that fit in ``max_tokens``.
 
-            return "\n\n".join(formatted_content)
+        Members are ranked by score_file from their uncompressed size, which
+        bounds their decoded length, and pulled lazily from
+        _iter_text_members: one that can no longer fit is never inflated, and
+        the scan stops once not even an empty file would. The kept files are
+        returned in archive order.
+        """
+        remaining = int(max_tokens * CHARS_PER_TOKEN)
+        with zipfile.ZipFile(path, "r") as zip_ref:
+            sizes = {file: zip_ref.getinfo(file).file_size for file in files}
+            names = {file: self._get_file_name_from_zip_name(file) for file in files}
+            ranked = sorted(
+                files,
+                key=lambda file: (
+                    -score_file(names[file], int(sizes[file] / CHARS_PER_TOKEN))
+                ),
+            )
+
+            def fitting() -> Iterator[str]:
+                # Reads ``remaining`` as the loop below spends it
+                for file in ranked:
+                    if remaining < file_size("", ""):
+                        return
+                    if file_size(names[file], "") + sizes[file] <= remaining:
+                        yield file
+
+            selected = {}
+            for name, content in self._iter_text_members(zip_ref, fitting()):
+                selected[name] = content
+                remaining -= file_size(name, content)
+
+        order = {names[file]: i for i, file in enumerate(files)}
+        logger.info(
+            f"Read {len(selected)} of {len(files)} files within a budget of "
+            f"{max_tokens} tokens"
+        )
+        return [
+            (name, selected[name]) for name in sorted(selected, key=order.__getitem__)
+        ]
 
-    async def download_repository_zip(self, owner: str, repo: str) -> Path:
+    def _iter_text_members(
+        self, zip_ref: zipfile.ZipFile, files: Iterable[str]
+    ) -> Iterator[tuple[str, str]]:
+        """Yield (file_name, text) of the text members, inflating each on demand."""
+        for file in files:
+            with zip_ref.open(file) as member:
+                # Stop inflating binaries after the first few kilobytes
+                data = member.read(SNIFF_BYTES)
+                if is_binary(data):
+                    logger.debug(f"Skipping binary file: {file}")
+                    continue
+                data += member.read()
+            try:
+                decoded_content = data.decode("utf-8")
+            except UnicodeDecodeError:
+                logger.warning(f"Failed to decode content for file: {file}")
+                continue
+            yield self._get_file_name_from_zip_name(file), decoded_content
+
+    async def download_repository_zip(
+        self,
+        owner: str,
+        repo: str,
+        ref: str | None = None,
+        max_archive_size: int | None = None,
+    ) -> Path:
+        """Stream the repository zipball at ``ref`` to a unique temp file.
+
+        The caller owns the returned file and is responsible for deleting it.
+        Raises GitHubArchiveTooLargeError as soon as the archive is known to
+        exceed ``max_archive_size`` bytes.
+        """
+        max_archive_size = max_archive_size or self.max_archive_size
         url = f"https://api.github.com/repos/{owner}/{repo}/zipball"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                with open(f"/tmp/{repo}.zip", "wb") as f:
-                    f.write(await response.content.read())
-        return Path(f"/tmp/{repo}.zip")
+        if ref:
+            url = f"{url}/{ref}"
+        fd, name = tempfile.mkstemp(prefix=f"{owner}-{repo}-", suffix=".zip")
+        path = Path(name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with self._get(url) as response:
+                    await self._raise_for_status(owner, repo, response)
+                    if max_archive_size and (
+                        (response.content_length or 0) > max_archive_size
+                    ):
+                        raise GitHubArchiveTooLargeError(owner, repo, max_archive_size)
+
+                    size = 0
+                    async for chunk in response.content.iter_chunked(
+                        DOWNLOAD_CHUNK_SIZE
+                    ):
+                        size += len(chunk)
+                        if max_archive_size and size > max_archive_size:
+                            raise GitHubArchiveTooLargeError(
+                                owner, repo, max_archive_size
+                            )
+                        f.write(chunk)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return path
 
-    async def get_directory_structure(self, owner: str, repo: str) -> str:
+    async def get_directory_structure(
+        self, owner: str, repo: str, commit_sha: str | None = None
+    ) -> str:
         """Get the directory structure of a repository in a tree-like format."""
-        default_branch = await self._get_default_branch(owner, repo)
-        latest_commit = await self._get_latest_commit(owner, repo, default_branch)
-        tree_sha = await self._get_tree_sha(owner, repo, latest_commit)
+        if commit_sha is None:
+            default_branch = await self._get_default_branch(owner, repo)
+            commit_sha = await self._get_latest_commit(owner, repo, default_branch)
+        tree_sha = await self._get_tree_sha(owner, repo, commit_sha)
 
         url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_sha}?recursive=1"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                await self._raise_for_status(owner, repo, response)
-                try:
-                    data = await response.json()
-                except Exception as e:
-                    logger.error(f"Error parsing JSON response: {e}")
-                    raise GitHubTreeError(owner, repo)
+        async with self._get(url) as response:
+            await self._raise_for_status(owner, repo, response)
+            try:
+                data = await response.json()
+            except Exception as e:
+                logger.error(f"Error parsing JSON response: {e}")
+                raise GitHubTreeError(owner, repo)
 
-        # Build directory structure
-        structure = self._build_directory_structure(data["tree"])
-        return self._format_directory_structure(structure)
+        # Submodules are listed as "commit" entries, which aren't rendered
+        return self._render_tree(
+            (item["path"], item["type"] == "tree")
+            for item in data["tree"]
+            if item["type"] in ("tree", "blob")
+        )
 
     async def get_popular_repos(self, num_repos: int = 1000) -> list[dict]:
         items = []
@@ -119,28 +788,205 @@ class GithubClient:
             current_per_page = min(per_page, remaining)
             url = f"https://api.github.com/search/repositories?q=stars:>1000&sort=stars&order=desc&page={page}&per_page={current_per_page}"
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers) as response:
-                    await self._raise_for_status("search", "repositories", response)
-                    data = await response.json()
+            async with self._get(url, resource=GithubResource.SEARCH) as response:
+                await self._raise_for_status("search", "repositories", response)
+                data = await response.json()
 
-                    if not data.get("items"):
-                        break
+            if not data.get("items"):
+                break
 
-                    items.extend(data["items"])
-                    if len(data["items"]) < current_per_page:
-                        break
+            items.extend(data["items"])
+            if len(data["items"]) < current_per_page:
+                break
 
-                    remaining -= len(data["items"])
-                    page += 1
+            remaining -= len(data["items"])
+            page += 1
 
-                    if len(items) >= num_repos:
-                        break
-                    print(f"Fetched {len(items)} repos so far")
-                    await asyncio.sleep(1)
+            if len(items) >= num_repos:
+                break
+            logger.debug(f"Fetched {len(items)} repos so far")
 
         return items[:num_repos]  # Ensure we don't return more than requested
 
+    def _get(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        resource: GithubResource = GithubResource.CORE,
+    ) -> AbstractAsyncContextManager[aiohttp.ClientResponse]:
+        return self._request("GET", url, headers, resource)
+
+    @asynccontextmanager
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        resource: GithubResource = GithubResource.CORE,
+        json: dict | None = None,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Send a request with a token from the pool, retrying rate limits.
+
+        The response of the last attempt is yielded even if it is still rate
+        limited, so ``_raise_for_status`` reports it as usual.
+        """
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            token = await self.rate_limiter.acquire(resource)
+            request_headers = {**self._auth_headers(token), **(headers or {})}
+            async with self._get_session().request(
+                method, url, headers=request_headers, json=json
+            ) as response:
+                self.rate_limiter.record(token, resource, response.headers)
+                if response.status == 304:
+                    # Conditional requests answered from cache are free
+                    self.rate_limiter.refund(token, resource)
+                if attempt < MAX_RATE_LIMIT_RETRIES and await self._is_rate_limited(
+                    response
+                ):
+                    delay = self.rate_limiter.back_off(
+                        token, resource, response.headers, attempt
+                    )
+                    logger.warning(
+                        f"GitHub rate limited {url}, token resting {delay:.1f}s"
+                    )
+                    continue
+                yield response
+                return
+
+    def _auth_headers(self, token: str | None) -> dict[str, str]:
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    async def _is_rate_limited(self, response: aiohttp.ClientResponse) -> bool:
+        if response.status == 429:
+            return True
+        if response.status != 403:
+            return False
+        # 403 is also used for permission errors, which must not be retried
+        if (
+            response.headers.get("X-RateLimit-Remaining") == "0"
+            or "Retry-After" in response.headers
+        ):
+            return True
+        return "rate limit" in (await response.text()).lower()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use.
+
+        The session has to be created from inside a running event loop, so it
+        is built lazily rather than in ``__init__``.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                trace_configs=[self._build_trace_config()],
+            )
+        return self._session
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.extract_workers, thread_name_prefix="zip-extract"
+            )
+        return self._executor
+
+    async def _get_cached_text(
+        self, owner: str, repo: str, commit_sha: str | None, tier: CacheTier
+    ) -> str | None:
+        if self.cache is None or commit_sha is None:
+            return None
+        return await self._run_blocking(
+            self.cache.get_text, owner, repo, commit_sha, tier
+        )
+
+    async def _get_cached_files(
+        self, owner: str, repo: str, commit_sha: str | None
+    ) -> Files | None:
+        text = await self._get_cached_text(owner, repo, commit_sha, CacheTier.CONTENT)
+        if text is None:
+            return None
+        return [(path, content) for path, content in json.loads(text)]
+
+    async def _put_cached_files(
+        self, owner: str, repo: str, commit_sha: str | None, files: Files
+    ):
+        await self._put_cached_text(
+            owner, repo, commit_sha, CacheTier.CONTENT, json.dumps(files)
+        )
+
+    async def _put_cached_text(
+        self,
+        owner: str,
+        repo: str,
+        commit_sha: str | None,
+        tier: CacheTier,
+        text: str,
+    ):
+        if self.cache is None or commit_sha is None:
+            return
+        await self._run_blocking(
+            self.cache.put_text, owner, repo, commit_sha, tier, text
+        )
+
+    @asynccontextmanager
+    async def _open_archive(
+        self, owner: str, repo: str, commit_sha: str | None
+    ) -> AsyncIterator[Path]:
+        """Yield a local zipball, from the cache when possible.
+
+        Uncached downloads are deleted on exit; cached ones stay for reuse,
+        pinned so that eviction can't delete them while they are read.
+        """
+        if self.cache is None or commit_sha is None:
+            zip_path = await self.download_repository_zip(owner, repo, commit_sha)
+            try:
+                yield zip_path
+            finally:
+                zip_path.unlink(missing_ok=True)
+            return
+
+        zip_path = await self._run_blocking(
+            self.cache.get_archive, owner, repo, commit_sha, True
+        )
+        if zip_path is None:
+            downloaded = await self.download_repository_zip(owner, repo, commit_sha)
+            try:
+                zip_path = await self._run_blocking(
+                    self.cache.put_archive, owner, repo, commit_sha, downloaded, True
+                )
+            finally:
+                # Already moved into the cache unless put_archive failed
+                downloaded.unlink(missing_ok=True)
+        try:
+            yield zip_path
+        finally:
+            await self._run_blocking(self.cache.release_archive, zip_path)
+
+    async def _run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        def count(stat: str):
+            async def on_event(session, context, params):
+                self._pool_stats[stat] += 1
+
+            return on_event
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(count("requests"))
+        trace_config.on_connection_create_end.append(count("connections_created"))
+        trace_config.on_connection_reuseconn.append(count("connections_reused"))
+        trace_config.on_dns_cache_hit.append(count("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(count("dns_cache_misses"))
+        return trace_config
+
     def _parse_gh_url(self, gh_url: str) -> tuple[str, str]:
         """Parse a GitHub URL into owner, repo, and path."""
         # Remove the protocol part if present
@@ -154,6 +1000,10 @@ class GithubClient:
         repo = parts[-1]
         return owner, repo
 
+    def _get_repo_path_from_zip_name(self, zip_name: str) -> str:
+        # Drop the "{owner}-{repo}-{sha}/" root directory of the zipball
+        return zip_name.partition("/")[2]
+
     def _get_file_name_from_zip_name(self, zip_name: str) -> str:
         zip_name = zip_name.split("/")
         root_dir = zip_name[0]
@@ -171,70 +1021,21 @@ class GithubClient:
 
     async def _get_default_branch(self, owner: str, repo: str) -> str:
         url = f"https://api.github.com/repos/{owner}/{repo}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                data = await response.json()
-                return data["default_branch"]
+        async with self._get(url) as response:
+            data = await response.json()
+            return data["default_branch"]
 
     async def _get_latest_commit(self, owner: str, repo: str, branch: str) -> str:
         url = f"https://api.github.com/repos/{owner}/{repo}/commits/{branch}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                data = await response.json()
-                return data["sha"]
+        async with self._get(url) as response:
+            data = await response.json()
+            return data["sha"]
 
     async def _get_tree_sha(self, owner: str, repo: str, commit_sha: str) -> str:
         url = f"https://api.github.com/repos/{owner}/{repo}/commits/{commit_sha}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                data = await response.json()
-                return data["commit"]["tree"]["sha"]
-
-    def _build_directory_structure(self, tree: List[Dict]) -> Dict:
-        """Build a nested dictionary representing the directory structure."""
-        structure = {}
-        for item in tree:
-
-            path_parts = item["path"].split("/")
-            current = structure
-            for i, part in enumerate(path_parts[:-1]):
-                if part not in current:
-                    current[part] = {}
-                current = current[part]
-            if path_parts[-1]:  # Don't add empty string for root
-                current[path_parts[-1]] = item
-        return structure
-
-    def _format_directory_structure(
-        self, structure: Dict, prefix: str = "", is_last: bool = True
-    ) -> str:
-        """Format the directory structure into a tree-like string."""
-        if not isinstance(structure, dict):
-            return ""
-
-        lines = []
-        items = sorted(structure.items())
-        for i, (name, value) in enumerate(items):
-            is_last_item = i == len(items) - 1
-            connector = "└── " if is_last_item else "├── "
-            if isinstance(value, dict) and value["type"] == "tree":
-                # Directory
-                lines.append(f"{prefix}{connector}{name}/")
-                new_prefix = prefix + ("    " if is_last_item else "│   ")
-                lines.append(
-                    self._format_directory_structure(value, new_prefix, is_last_item)
-                )
-            elif isinstance(value, dict) and value["type"] == "blob":
-                lines.append(f"{prefix}{connector}{name}")
+        async with self._get(url) as response:
+            data = await response.json()
+            return data["commit"]["tree"]["sha"]
 
-        return "\n".join(lines)
-
-    def _get_formatted_content(self, path: str, content: str) -> str:
-        return dedent(
-            f"""
-=============================================================================
-File: {path}
-=============================================================================
-{content}
-"""
-        )
+    def _render_tree(self, entries: Iterable[tuple[str, bool]]) -> str:
+        return render_tree(entries, self.tree_max_depth, self.tree_max_entries)
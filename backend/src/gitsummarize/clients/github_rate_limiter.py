@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from enum import StrEnum
+
+logger = logging.getLogger(__name__)
+
+SECONDARY_BACKOFF = 60  # seconds, GitHub asks for at least a minute
+MAX_SECONDARY_BACKOFF = 60 * 15
+
+
+class GithubResource(StrEnum):
+    """Rate limit buckets, as named by the ``X-RateLimit-Resource`` header."""
+
+    CORE = "core"
+    SEARCH = "search"
+    GRAPHQL = "graphql"
+
+
+# Start spacing requests out once this fraction of a bucket is left. Search
+# only allows 30 requests a minute, so it is paced from the first request.
+PACE_BELOW = {
+    GithubResource.CORE: 0.1,
+    GithubResource.SEARCH: 1.0,
+    GithubResource.GRAPHQL: 0.1,
+}
+
+
+@dataclass
+class _Bucket:
+    limit: int | None = None
+    remaining: int | None = None
+    reset_at: float = 0.0  # epoch seconds
+    next_at: float = 0.0  # epoch seconds, when pacing allows the next request
+
+    def refresh(self, now: float):
+        if self.reset_at and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = 0.0
+
+
+class GithubRateLimiter:
+    """Spread GitHub API calls over a pool of tokens within their rate limits.
+
+    Every token has one bucket per resource, kept current from the
+    ``X-RateLimit-*`` headers of its responses. ``acquire`` hands out the
+    token that can go soonest, paces requests evenly over the rest of the
+    window once a bucket runs low and waits for the reset when every token
+    is exhausted. Secondary rate limits put a token on cooldown for the
+    ``Retry-After`` period, or an exponential backoff if none is given.
+    """
+
+    def __init__(self, tokens: list[str | None]):
+        # A single None token means unauthenticated requests
+        self.tokens = list(dict.fromkeys(tokens)) or [None]
+        self._buckets: dict[tuple[str | None, GithubResource], _Bucket] = {}
+        self._cooldown_until: dict[str | None, float] = {}
+        self._stats = {
+            "requests": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "primary_limits": 0,
+            "secondary_limits": 0,
+        }
+
+    async def acquire(
+        self, resource: GithubResource = GithubResource.CORE
+    ) -> str | None:
+        """Wait until some token may make a ``resource`` request and return it."""
+        while True:
+            now = time.time()
+            token = min(
+                self.tokens,
+                key=lambda token: (
+                    self._ready_at(token, resource, now),
+                    -(self._bucket(token, resource).remaining or math.inf),
+                ),
+            )
+            wait = self._ready_at(token, resource, now) - now
+            if wait <= 0:
+                break
+            self._stats["waits"] += 1
+            self._stats["wait_seconds"] += wait
+            if wait > 1:
+                logger.info(f"GitHub {resource} rate limit: waiting {wait:.0f}s")
+            await asyncio.sleep(wait)
+
+        bucket = self._bucket(token, resource)
+        if bucket.remaining is not None:
+            # Count the request now so concurrent callers see it before
+            # its response headers arrive
+            bucket.remaining -= 1
+        bucket.next_at = now + self._interval(bucket, resource, now)
+        self._stats["requests"] += 1
+        return token
+
+    def record(
+        self,
+        token: str | None,
+        resource: GithubResource,
+        headers: Mapping[str, str],
+    ):
+        """Update the token's bucket from a response's rate limit headers."""
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_at = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        if headers.get("X-RateLimit-Resource") in GithubResource:
+            resource = GithubResource(headers["X-RateLimit-Resource"])
+        bucket = self._bucket(token, resource)
+        if reset_at == bucket.reset_at and bucket.remaining is not None:
+            # Same window: responses can arrive out of order, keep the lowest
+            remaining = min(remaining, bucket.remaining)
+        bucket.limit = limit
+        bucket.remaining = remaining
+        bucket.reset_at = reset_at
+
+    def refund(self, token: str | None, resource: GithubResource):
+        """Give back a request that didn't count against the limit."""
+        bucket = self._bucket(token, resource)
+        if bucket.remaining is not None and bucket.remaining < (bucket.limit or 0):
+            bucket.remaining += 1
+
+    def back_off(
+        self,
+        token: str | None,
+        resource: GithubResource,
+        headers: Mapping[str, str],
+        attempt: int = 0,
+    ) -> float:
+        """Handle a rate limited response and return how long ``token`` rests.
+
+        Exhausted primary limits are already known from the headers, so the
+        token just waits for its reset. Anything else is a secondary limit.
+        """
+        now = time.time()
+        if headers.get("X-RateLimit-Remaining") == "0":
+            self._stats["primary_limits"] += 1
+            self.record(token, resource, headers)
+            return max(0.0, self._bucket(token, resource).reset_at - now)
+
+        self._stats["secondary_limits"] += 1
+        try:
+            delay = float(headers["Retry-After"])
+        except (KeyError, ValueError):
+            delay = min(SECONDARY_BACKOFF * 2**attempt, MAX_SECONDARY_BACKOFF)
+        self._cooldown_until[token] = max(
+            self._cooldown_until.get(token, 0.0), now + delay
+        )
+        return delay
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        return {
+            **self._stats,
+            "tokens": [
+                {
+                    "token": _mask(token),
+                    "cooldown_remaining": max(
+                        0.0, self._cooldown_until.get(token, 0.0) - now
+                    ),
+                    "resources": {
+                        resource: {
+                            "limit": bucket.limit,
+                            "remaining": bucket.remaining,
+                            "reset_in": max(0.0, bucket.reset_at - now),
+                        }
+                        for (bucket_token, resource), bucket in self._buckets.items()
+                        if bucket_token == token
+                    },
+                }
+                for token in self.tokens
+            ],
+        }
+
+    def _bucket(self, token: str | None, resource: GithubResource) -> _Bucket:
+        return self._buckets.setdefault((token, resource), _Bucket())
+
+    def _ready_at(
+        self, token: str | None, resource: GithubResource, now: float
+    ) -> float:
+        bucket = self._bucket(token, resource)
+        bucket.refresh(now)
+        ready_at = max(bucket.next_at, self._cooldown_until.get(token, 0.0))
+        if bucket.remaining is not None and bucket.remaining <= 0:
+            ready_at = max(ready_at, bucket.reset_at)
+        return ready_at
+
+    def _interval(self, bucket: _Bucket, resource: GithubResource, now: float) -> float:
+        """Spacing that makes the rest of the bucket last until it resets."""
+        if not bucket.limit or bucket.remaining is None or not bucket.reset_at:
+            return 0.0
+        if bucket.remaining >= bucket.limit * PACE_BELOW[resource]:
+            return 0.0
+        return max(0.0, bucket.reset_at - now) / max(bucket.remaining, 1)
+
+
+def _mask(token: str | None) -> str | None:
+    return f"...{token[-4:]}" if token else None
@@ -1,92 +1,310 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+import logging
 import re
 from aiohttp import ClientError
 from google import genai
 from google.genai import types
 
 from gitsummarize.clients.ai_client_abc import AIBaseClient
-from gitsummarize.prompts.business_logic import BUSINESS_SUMMARY_PROMPT
-from gitsummarize.prompts.technical_documentation import TECHNICAL_DOCUMENTATION_PROMPT
+from gitsummarize.clients.token_estimator import TokenEstimator
+from gitsummarize.codebase.format import Files, format_file
+from gitsummarize.prompts.business_logic import BUSINESS_SUMMARY_INSTRUCTIONS
+from gitsummarize.prompts.codebase_context import CODEBASE_CONTEXT_PROMPT
+from gitsummarize.prompts.technical_documentation import (
+    TECHNICAL_DOCUMENTATION_INSTRUCTIONS,
+)
 
+logger = logging.getLogger(__name__)
+
+MODEL = "gemini-2.5-pro-exp-03-25"
+MAP_MODEL = "gemini-2.0-flash"  # cheaper tier for per-chunk notes
 ALLOWED_INPUT_TOKENS_COUNT = 1_048_576
+MAX_PROMPT_TOKENS = 800_000
+CHARS_PER_TOKEN = 3.7
+CALIBRATION_SAMPLE_CHARS = 200_000
+MIN_CACHED_CONTEXT_TOKENS = 4_096
+CONTEXT_CACHE_TTL = 60 * 30  # 30 minutes, generations can take up to TIMEOUT
 TIMEOUT = 1000 * 60 * 20  # 20 minutes
 
 
 class GoogleGenAI(AIBaseClient):
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        max_prompt_tokens: int = MAX_PROMPT_TOKENS,
+        token_estimator: TokenEstimator | None = None,
+        on_usage: Callable[[int], None] | None = None,
+        map_model: str | None = MAP_MODEL,
+    ):
         self.client = genai.Client(api_key=api_key)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.map_model = map_model
+        self.token_estimator = token_estimator or TokenEstimator()
+        # Told the total tokens of every response, e.g. to track key quotas
+        self.on_usage = on_usage
 
     async def get_business_summary(
-        self, directory_structure: str, codebase: str
+        self, directory_structure: str, codebase: Files
+    ) -> str:
+        (business_summary,) = await self._generate(
+            directory_structure, codebase, [BUSINESS_SUMMARY_INSTRUCTIONS]
+        )
+        return business_summary
+
+    async def get_technical_documentation(
+        self, directory_structure: str, codebase: Files
     ) -> str:
-        prompt = BUSINESS_SUMMARY_PROMPT.format(
-            directory_structure=directory_structure, codebase=codebase
+        (technical_documentation,) = await self._generate(
+            directory_structure, codebase, [TECHNICAL_DOCUMENTATION_INSTRUCTIONS]
+        )
+        return technical_documentation
+
+    async def get_documentation(
+        self, directory_structure: str, codebase: Files
+    ) -> tuple[str, str]:
+        """Upload the codebase once as cached context and ask for both documents."""
+        business_summary, technical_documentation = await self._generate(
+            directory_structure,
+            codebase,
+            [BUSINESS_SUMMARY_INSTRUCTIONS, TECHNICAL_DOCUMENTATION_INSTRUCTIONS],
+        )
+        return business_summary, technical_documentation
+
+    async def complete(self, prompt: str, model: str | None = None) -> str:
+        model = model or MODEL
+        multiplier = self.token_estimator.chars_per_token(model, CHARS_PER_TOKEN)
+        prompt = self._truncate_text(prompt, self.max_prompt_tokens, multiplier)
+        config = types.GenerateContentConfig(
+            http_options=types.HttpOptions(timeout=TIMEOUT)
         )
-        truncated_prompt = self._truncate_text(prompt, 800_000)
         try:
             response = await self.client.aio.models.generate_content(
-                model="gemini-2.5-pro-exp-03-25",
-                contents=truncated_prompt,
-                config=types.GenerateContentConfig(
-                    http_options=types.HttpOptions(
-                        timeout=TIMEOUT,
-                    ),
-                ),
+                model=model, contents=prompt, config=config
             )
+            self.token_estimator.record_request(model)
         except Exception as e:
-            if e.code == 400 and e.status == "INVALID_ARGUMENT":
-                truncated_prompt = self._truncate_text_from_error(truncated_prompt, e)
+            if self._is_prompt_too_long(e):
+                prompt = self._shrink_context(prompt, "", e, model)
                 response = await self.client.aio.models.generate_content(
-                    model="gemini-2.5-pro-exp-03-25",
-                    contents=truncated_prompt,
-                    config=types.GenerateContentConfig(
-                        http_options=types.HttpOptions(
-                            timeout=TIMEOUT,
-                        ),
-                    ),
+                    model=model, contents=prompt, config=config
                 )
             else:
                 raise e
+
+        self._record_usage(prompt, "", response.usage_metadata, model)
         return response.text
 
-    async def get_technical_documentation(
-        self, directory_structure: str, codebase: str
-    ) -> str:
-        prompt = TECHNICAL_DOCUMENTATION_PROMPT.format(
-            directory_structure=directory_structure, codebase=codebase
+    async def stream_documentation(
+        self, directory_structure: str, codebase: Files
+    ) -> AsyncIterator[tuple[str, str]]:
+        """Stream both documents off a single cached copy of the codebase."""
+        instructions = {
+            "business_summary": BUSINESS_SUMMARY_INSTRUCTIONS,
+            "technical_documentation": TECHNICAL_DOCUMENTATION_INSTRUCTIONS,
+        }
+        context = await self._build_context(
+            directory_structure, codebase, list(instructions.values())
         )
-        truncated_prompt = self._truncate_text(prompt, 800_000)
+        cache_name = await self._create_context_cache(context)
         try:
-            response = await self.client.aio.models.generate_content(
-                model="gemini-2.5-pro-exp-03-25",
-                contents=truncated_prompt,
-                config=types.GenerateContentConfig(
-                    http_options=types.HttpOptions(
-                        timeout=TIMEOUT,
-                    ),
-                ),
+            async for chunk in self._merge_streams(
+                {
+                    name: self._stream_from_context(context, text, cache_name)
+                    for name, text in instructions.items()
+                }
+            ):
+                yield chunk
+        finally:
+            if cache_name is not None:
+                await self._delete_context_cache(cache_name)
+
+    async def _generate(
+        self, directory_structure: str, codebase: Files, instructions: list[str]
+    ) -> list[str]:
+        context = await self._build_context(directory_structure, codebase, instructions)
+        cache_name = None
+        if len(instructions) > 1:
+            cache_name = await self._create_context_cache(context)
+        try:
+            return await asyncio.gather(
+                *(
+                    self._generate_from_context(context, text, cache_name)
+                    for text in instructions
+                )
             )
+        finally:
+            if cache_name is not None:
+                await self._delete_context_cache(cache_name)
+
+    async def _build_context(
+        self, directory_structure: str, codebase: Files, instructions: list[str]
+    ) -> str:
+        """Pack the shared codebase context, leaving room for ``instructions``."""
+        if not self.token_estimator.is_calibrated(MODEL):
+            await self._calibrate(_calibration_sample(directory_structure, codebase))
+        multiplier = self.token_estimator.chars_per_token(MODEL, CHARS_PER_TOKEN)
+        # Leave room for the longest instructions after the shared context
+        max_context_tokens = self.max_prompt_tokens - int(
+            max(len(text) for text in instructions) / multiplier
+        )
+        return await self._format_prompt(
+            CODEBASE_CONTEXT_PROMPT,
+            directory_structure,
+            codebase,
+            max_context_tokens,
+            multiplier,
+        )
+
+    async def _generate_from_context(
+        self, context: str, instructions: str, cache_name: str | None = None
+    ) -> str:
+        try:
+            response = await self._generate_content(context, instructions, cache_name)
+            self.token_estimator.record_request(MODEL)
         except Exception as e:
-            if e.code == 400 and e.status == "INVALID_ARGUMENT":
-                truncated_prompt = self._truncate_text_from_error(truncated_prompt, e)
-                response = await self.client.aio.models.generate_content(
-                    model="gemini-2.5-pro-exp-03-25",
-                    contents=truncated_prompt,
-                    config=types.GenerateContentConfig(
-                        http_options=types.HttpOptions(
-                            timeout=TIMEOUT,
-                        ),
-                    ),
-                )
+            if cache_name is None and self._is_prompt_too_long(e):
+                context = self._shrink_context(context, instructions, e)
+                response = await self._generate_content(context, instructions)
             else:
                 raise e
 
+        self._record_usage(context, instructions, response.usage_metadata)
         return response.text
 
+    async def _stream_from_context(
+        self, context: str, instructions: str, cache_name: str | None = None
+    ) -> AsyncIterator[str]:
+        try:
+            stream = await self._generate_content_stream(
+                context, instructions, cache_name
+            )
+            self.token_estimator.record_request(MODEL)
+        except Exception as e:
+            if cache_name is None and self._is_prompt_too_long(e):
+                context = self._shrink_context(context, instructions, e)
+                stream = await self._generate_content_stream(context, instructions)
+            else:
+                raise e
+
+        usage = None
+        async for chunk in stream:
+            # Only the final chunk carries the full usage counts
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+        self._record_usage(context, instructions, usage)
+
+    def _is_prompt_too_long(self, error: Exception) -> bool:
+        return (
+            getattr(error, "code", None) == 400
+            and getattr(error, "status", None) == "INVALID_ARGUMENT"
+        )
+
+    def _shrink_context(
+        self, context: str, instructions: str, error: Exception, model: str = MODEL
+    ) -> str:
+        """Learn from a too-long prompt error and cut the context to fit."""
+        logger.warning(f"Prompt for {model} was too long, retrying: {error}")
+        self.token_estimator.record_request(model, fallback=True)
+        self.token_estimator.record(
+            model,
+            len(context) + len(instructions),
+            self._extract_input_tokens_count_from_error(error),
+        )
+        return self._truncate_text_from_error(context, error)
+
+    def _record_usage(
+        self,
+        context: str,
+        instructions: str,
+        usage: types.GenerateContentResponseUsageMetadata | None,
+        model: str = MODEL,
+    ):
+        if usage and usage.prompt_token_count:
+            self.token_estimator.record(
+                model, len(context) + len(instructions), usage.prompt_token_count
+            )
+        if usage and usage.total_token_count and self.on_usage is not None:
+            self.on_usage(usage.total_token_count)
+
+    async def _generate_content(
+        self, context: str, instructions: str, cache_name: str | None = None
+    ) -> types.GenerateContentResponse:
+        return await self.client.aio.models.generate_content(
+            model=MODEL,
+            contents=instructions if cache_name else [context, instructions],
+            config=types.GenerateContentConfig(
+                cached_content=cache_name,
+                http_options=types.HttpOptions(
+                    timeout=TIMEOUT,
+                ),
+            ),
+        )
+
+    async def _generate_content_stream(
+        self, context: str, instructions: str, cache_name: str | None = None
+    ) -> AsyncIterator[types.GenerateContentResponse]:
+        return await self.client.aio.models.generate_content_stream(
+            model=MODEL,
+            contents=instructions if cache_name else [context, instructions],
+            config=types.GenerateContentConfig(
+                cached_content=cache_name,
+                http_options=types.HttpOptions(
+                    timeout=TIMEOUT,
+                ),
+            ),
+        )
+
+    async def _create_context_cache(self, context: str) -> str | None:
+        """Register the codebase context as cached content, if worthwhile.
+
+        Returns None when the context is too small to cache or the cache can't
+        be created, in which case callers send the context inline.
+        """
+        tokens = self.token_estimator.estimate(MODEL, context, CHARS_PER_TOKEN)
+        if tokens < MIN_CACHED_CONTEXT_TOKENS:
+            return None
+        try:
+            cache = await self.client.aio.caches.create(
+                model=MODEL,
+                config=types.CreateCachedContentConfig(
+                    contents=[context],
+                    ttl=f"{CONTEXT_CACHE_TTL}s",
+                    http_options=types.HttpOptions(timeout=TIMEOUT),
+                ),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache codebase context, sending inline: {e}")
+            return None
+        return cache.name
+
+    async def _delete_context_cache(self, cache_name: str):
+        try:
+            await self.client.aio.caches.delete(name=cache_name)
+        except Exception as e:
+            # The TTL cleans it up eventually
+            logger.warning(f"Failed to delete cached context {cache_name}: {e}")
+
+    async def _calibrate(self, sample: str):
+        """Seed the token ratio from a free count_tokens call on a sample."""
+        if not sample:
+            return
+        try:
+            response = await self.client.aio.models.count_tokens(
+                model=MODEL, contents=sample
+            )
+        except Exception as e:
+            logger.warning(f"Failed to calibrate token estimate for {MODEL}: {e}")
+            return
+        self.token_estimator.record(MODEL, len(sample), response.total_tokens or 0)
+
     def _truncate_text_from_error(self, prompt: str, error: ClientError) -> str:
         input_tokens_count = self._extract_input_tokens_count_from_error(error)
         difference = input_tokens_count - ALLOWED_INPUT_TOKENS_COUNT
         if difference > 0:
-            prompt = prompt[: -(difference * 4)]
+            multiplier = self.token_estimator.chars_per_token(MODEL, CHARS_PER_TOKEN)
+            prompt = prompt[: -int(difference * multiplier * 1.1)]
         return prompt
 
     def _extract_input_tokens_count_from_error(self, error: ClientError) -> int:
@@ -95,3 +313,14 @@ class GoogleGenAI(AIBaseClient):
         if match:
             return int(match.group(1))
         return 0
+
+
+def _calibration_sample(directory_structure: str, codebase: Files) -> str:
+    """The first CALIBRATION_SAMPLE_CHARS of the rendered context."""
+    parts, size = [directory_structure], len(directory_structure)
+    for path, content in codebase:
+        if size >= CALIBRATION_SAMPLE_CHARS:
+            break
+        parts.append(format_file(path, content))
+        size += len(parts[-1])
+    return "".join(parts)[:CALIBRATION_SAMPLE_CHARS]
@@ -1,11 +1,20 @@
+from collections.abc import AsyncIterator
+
 from openai import AsyncOpenAI
 from pydantic import BaseModel
 
 from gitsummarize.clients.ai_client_abc import AIBaseClient
+from gitsummarize.clients.token_estimator import TokenEstimator
+from gitsummarize.codebase.format import Files
 from gitsummarize.prompts.business_logic import BUSINESS_SUMMARY_PROMPT
 from gitsummarize.prompts.resource_repo import RESOURCE_REPO_PROMPT
 from gitsummarize.prompts.technical_documentation import TECHNICAL_DOCUMENTATION_PROMPT
 
+MODEL = "o3-mini"
+MAP_MODEL = "gpt-4o-mini"  # cheaper tier for per-chunk notes
+MAX_PROMPT_TOKENS = 200_000
+CHARS_PER_TOKEN = 4.1
+
 
 class IsResourceRepo(BaseModel):
     is_resource_repo: bool
@@ -13,37 +22,98 @@ class IsResourceRepo(BaseModel):
 
 
 class OpenAIClient(AIBaseClient):
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        token_estimator: TokenEstimator | None = None,
+        map_model: str | None = MAP_MODEL,
+    ):
         self.client = AsyncOpenAI(api_key=api_key)
+        self.token_estimator = token_estimator or TokenEstimator()
+        self.map_model = map_model
 
     async def get_business_summary(
-        self, directory_structure: str, codebase: str
+        self, directory_structure: str, codebase: Files
     ) -> str:
-        prompt = BUSINESS_SUMMARY_PROMPT.format(
-            directory_structure=directory_structure, codebase=codebase
-        )
-        response = await self.client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "user", "content": self._truncate_text(prompt, 200_000, 4.1)}
-            ],
+        return await self._generate(
+            BUSINESS_SUMMARY_PROMPT, directory_structure, codebase
         )
-        return response.choices[0].message.content
 
     async def get_technical_documentation(
-        self, directory_structure: str, codebase: str
+        self, directory_structure: str, codebase: Files
     ) -> str:
-        prompt = TECHNICAL_DOCUMENTATION_PROMPT.format(
-            directory_structure=directory_structure, codebase=codebase
+        return await self._generate(
+            TECHNICAL_DOCUMENTATION_PROMPT, directory_structure, codebase
         )
+
+    async def complete(self, prompt: str, model: str | None = None) -> str:
+        model = model or MODEL
+        multiplier = self.token_estimator.chars_per_token(model, CHARS_PER_TOKEN)
+        prompt = self._truncate_text(prompt, MAX_PROMPT_TOKENS, multiplier)
         response = await self.client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "user", "content": self._truncate_text(prompt, 200_000, 4.1)}
-            ],
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
         )
+        self.token_estimator.record_request(model)
+        if response.usage:
+            self.token_estimator.record(
+                model, len(prompt), response.usage.prompt_tokens
+            )
         return response.choices[0].message.content
 
+    async def stream_documentation(
+        self, directory_structure: str, codebase: Files
+    ) -> AsyncIterator[tuple[str, str]]:
+        async for chunk in self._merge_streams(
+            {
+                "business_summary": self._stream(
+                    BUSINESS_SUMMARY_PROMPT, directory_structure, codebase
+                ),
+                "technical_documentation": self._stream(
+                    TECHNICAL_DOCUMENTATION_PROMPT, directory_structure, codebase
+                ),
+            }
+        ):
+            yield chunk
+
+    async def _generate(
+        self, template: str, directory_structure: str, codebase: Files
+    ) -> str:
+        prompt = await self._build_prompt(template, directory_structure, codebase)
+        return await self.complete(prompt)
+
+    async def _stream(
+        self, template: str, directory_structure: str, codebase: Files
+    ) -> AsyncIterator[str]:
+        prompt = await self._build_prompt(template, directory_structure, codebase)
+        stream = await self.client.chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        self.token_estimator.record_request(MODEL)
+        async for chunk in stream:
+            # The usage-only chunk at the end has no choices
+            if chunk.usage:
+                self.token_estimator.record(
+                    MODEL, len(prompt), chunk.usage.prompt_tokens
+                )
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _build_prompt(
+        self, template: str, directory_structure: str, codebase: Files
+    ) -> str:
+        multiplier = self.token_estimator.chars_per_token(MODEL, CHARS_PER_TOKEN)
+        return await self._format_prompt(
+            template,
+            directory_structure,
+            codebase,
+            MAX_PROMPT_TOKENS,
+            multiplier,
+        )
+
     async def get_is_resource_repo(self, repo_info: str) -> IsResourceRepo:
         prompt = RESOURCE_REPO_PROMPT.format(repo_info=repo_info)
         response = await self.client.beta.chat.completions.parse(
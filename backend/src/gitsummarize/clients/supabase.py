@@ -1,33 +1,217 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+
+from supabase import AsyncClient, acreate_client, create_client
+
 from gitsummarize.model.repo_metadata import RepoMetadata
-from supabase import create_client, Client
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_SECONDS = 1.0
+PAGE_SIZE = 1000
 
 
 class SupabaseClient:
     def __init__(self, url: str, key: str):
         self.client = create_client(supabase_url=url, supabase_key=key)
 
-    def insert_repo_summary(self, repo_url: str, business_summary: str, technical_documentation: str):
-        self.client.table("repo_summaries").insert({
-            "repo_url": repo_url,
-            "business_summary": business_summary,
-            "technical_documentation": technical_documentation
-        }).execute()
+    def insert_repo_summary(
+        self,
+        repo_url: str,
+        business_summary: str,
+        technical_documentation: str,
+        commit_sha: str | None = None,
+    ):
+        self.client.table("repo_summaries").insert(
+            _summary_row(
+                repo_url, business_summary, technical_documentation, commit_sha
+            )
+        ).execute()
 
-    def check_repo_url_exists(self, repo_url: str) -> str | None:
-        response = self.client.table("repo_summaries").select("repo_url").eq("repo_url", repo_url).execute()
+    def check_repo_url_exists(
+        self, repo_url: str, commit_sha: str | None = None
+    ) -> str | None:
+        query = (
+            self.client.table("repo_summaries")
+            .select("repo_url")
+            .eq("repo_url", repo_url)
+        )
+        if commit_sha is not None:
+            query = query.eq("commit_sha", commit_sha)
+        response = query.limit(1).execute()
         if len(response.data) == 0:
             return None
         return response.data[0]
 
-    def get_all_repo_urls(self) -> list[str]:
-        response = self.client.table("repo_summaries").select("repo_url").execute()
-        return [row["repo_url"] for row in response.data]
-
     def upsert_repo_metadata(self, repo_url: str, metadata: RepoMetadata):
-        self.client.table("repo_metadata").upsert({
-            "repo_url": repo_url,
-            "num_stars": metadata.num_stars,
-            "num_forks": metadata.num_forks,
-            "language": metadata.language,
-            "description": metadata.description
-        }, on_conflict="repo_url").execute()
+        self.client.table("repo_metadata").upsert(
+            _metadata_row(repo_url, metadata), on_conflict="repo_url"
+        ).execute()
+
+    def upsert_repo_metadata_batch(self, metadata: dict[str, RepoMetadata]):
+        """Upsert the metadata of many repos in one request."""
+        if not metadata:
+            return
+        self.client.table("repo_metadata").upsert(
+            [_metadata_row(repo_url, value) for repo_url, value in metadata.items()],
+            on_conflict="repo_url",
+        ).execute()
+
+
+class AsyncSupabaseClient:
+    """Non-blocking SupabaseClient for use on the event loop.
+
+    A single native async client is created on first use and kept for the
+    life of the process, so its HTTP connection pool is reused by every
+    query. Each query is timed under its method name; see ``get_stats``.
+    """
+
+    def __init__(self, url: str, key: str):
+        self.url = url
+        self.key = key
+        self._client: AsyncClient | None = None
+        self._client_lock = asyncio.Lock()
+        self._stats: dict[str, dict] = {}
+
+    async def insert_repo_summary(
+        self,
+        repo_url: str,
+        business_summary: str,
+        technical_documentation: str,
+        commit_sha: str | None = None,
+    ):
+        client = await self._get_client()
+        await self._execute(
+            "insert_repo_summary",
+            client.table("repo_summaries").insert(
+                _summary_row(
+                    repo_url, business_summary, technical_documentation, commit_sha
+                )
+            ),
+        )
+
+    async def check_repo_url_exists(
+        self, repo_url: str, commit_sha: str | None = None
+    ) -> str | None:
+        client = await self._get_client()
+        query = (
+            client.table("repo_summaries").select("repo_url").eq("repo_url", repo_url)
+        )
+        if commit_sha is not None:
+            query = query.eq("commit_sha", commit_sha)
+        response = await self._execute("check_repo_url_exists", query.limit(1))
+        if len(response.data) == 0:
+            return None
+        return response.data[0]
+
+    async def iter_repo_urls(self, page_size: int = PAGE_SIZE) -> AsyncIterator[str]:
+        """Yield every distinct summarized repo URL, in order, a page at a time.
+
+        Pages are keyed on the last URL seen rather than an offset, so each
+        one is an index range scan however deep into the table it is. The
+        walk only ends on an empty page: PostgREST silently caps pages at its
+        max-rows setting, so a short page doesn't mean the table is done.
+        """
+        client = await self._get_client()
+        last_repo_url = None
+        while True:
+            query = (
+                client.table("repo_summaries")
+                .select("repo_url")
+                .order("repo_url")
+                .limit(page_size)
+            )
+            if last_repo_url is not None:
+                query = query.gt("repo_url", last_repo_url)
+            response = await self._execute("iter_repo_urls", query)
+            if not response.data:
+                return
+            for row in response.data:
+                # A repo has one row per summary, and they sort together
+                if row["repo_url"] != last_repo_url:
+                    last_repo_url = row["repo_url"]
+                    yield last_repo_url
+
+    async def upsert_repo_metadata(self, repo_url: str, metadata: RepoMetadata):
+        client = await self._get_client()
+        await self._execute(
+            "upsert_repo_metadata",
+            client.table("repo_metadata").upsert(
+                _metadata_row(repo_url, metadata), on_conflict="repo_url"
+            ),
+        )
+
+    async def upsert_repo_metadata_batch(self, metadata: dict[str, RepoMetadata]):
+        """Upsert the metadata of many repos in one request."""
+        if not metadata:
+            return
+        client = await self._get_client()
+        await self._execute(
+            "upsert_repo_metadata_batch",
+            client.table("repo_metadata").upsert(
+                [
+                    _metadata_row(repo_url, value)
+                    for repo_url, value in metadata.items()
+                ],
+                on_conflict="repo_url",
+            ),
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            name: {**stats, "mean_seconds": stats["total_seconds"] / stats["count"]}
+            for name, stats in self._stats.items()
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.postgrest.aclose()
+        self._client = None
+
+    async def _get_client(self) -> AsyncClient:
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    self._client = await acreate_client(self.url, self.key)
+        return self._client
+
+    async def _execute(self, name: str, query):
+        started = time.perf_counter()
+        try:
+            return await query.execute()
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = self._stats.setdefault(
+                name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["count"] += 1
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            if elapsed > SLOW_QUERY_SECONDS:
+                logger.warning(f"Slow Supabase query {name}: {elapsed:.2f}s")
+
+
+def _summary_row(
+    repo_url: str,
+    business_summary: str,
+    technical_documentation: str,
+    commit_sha: str | None,
+) -> dict:
+    return {
+        "repo_url": repo_url,
+        "business_summary": business_summary,
+        "technical_documentation": technical_documentation,
+        "commit_sha": commit_sha,
+    }
+
+
+def _metadata_row(repo_url: str, metadata: RepoMetadata) -> dict:
+    return {
+        "repo_url": repo_url,
+        "num_stars": metadata.num_stars,
+        "num_forks": metadata.num_forks,
+        "language": metadata.language,
+        "description": metadata.description,
+    }
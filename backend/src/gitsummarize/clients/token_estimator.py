@@ -0,0 +1,69 @@
+import math
+
+SMOOTHING = 0.3
+SAFETY_MARGIN = 0.05
+
+
+class TokenEstimator:
+    """Per-model characters-per-token ratios, calibrated from real counts.
+
+    Every response reports how many tokens its prompt actually used; feeding
+    those back through ``record`` keeps the ratio close to the model's real
+    tokenizer for the kind of text we send. Estimates are padded by
+    ``safety_margin`` so prompts land under the limit on the first attempt.
+    """
+
+    def __init__(
+        self, smoothing: float = SMOOTHING, safety_margin: float = SAFETY_MARGIN
+    ):
+        self.smoothing = smoothing
+        self.safety_margin = safety_margin
+        self._ratios: dict[str, float] = {}
+        self._stats: dict[str, dict] = {}
+
+    def is_calibrated(self, model: str) -> bool:
+        return model in self._ratios
+
+    def chars_per_token(self, model: str, default: float) -> float:
+        """Conservative ratio for packing and truncating prompts for ``model``."""
+        return self._ratios.get(model, default) / (1 + self.safety_margin)
+
+    def estimate(self, model: str, text: str, default: float) -> int:
+        return math.ceil(len(text) / self.chars_per_token(model, default))
+
+    def record(self, model: str, chars: int, tokens: int):
+        """Fold an observed (characters, tokens) pair into the model's ratio."""
+        if chars <= 0 or tokens <= 0:
+            return
+        ratio = chars / tokens
+        previous = self._ratios.get(model)
+        self._ratios[model] = (
+            ratio
+            if previous is None
+            else previous + self.smoothing * (ratio - previous)
+        )
+        self._model_stats(model)["samples"] += 1
+
+    def record_request(self, model: str, fallback: bool = False):
+        """Count a generation request and whether it needed the retry path."""
+        stats = self._model_stats(model)
+        stats["requests"] += 1
+        if fallback:
+            stats["fallbacks"] += 1
+
+    def get_stats(self) -> dict:
+        return {
+            model: {
+                **stats,
+                "chars_per_token": self._ratios.get(model),
+                "fallback_rate": (
+                    stats["fallbacks"] / stats["requests"] if stats["requests"] else 0.0
+                ),
+            }
+            for model, stats in self._stats.items()
+        }
+
+    def _model_stats(self, model: str) -> dict:
+        return self._stats.setdefault(
+            model, {"requests": 0, "fallbacks": 0, "samples": 0}
+        )
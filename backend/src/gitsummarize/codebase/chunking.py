@@ -0,0 +1,92 @@
+import hashlib
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import PurePosixPath
+
+from gitsummarize.codebase.format import Files, file_size, render_files
+from gitsummarize.codebase.packing import CHARS_PER_TOKEN
+
+CHUNK_TOKENS = 50_000
+MIN_CHUNK_TOKENS = 5_000
+
+
+@dataclass
+class Chunk:
+    """Files of one directory, summarized together."""
+
+    path: str
+    files: Files
+
+    @property
+    def content(self) -> str:
+        return render_files(self.files)
+
+    @cached_property
+    def key(self) -> str:
+        """Hash of the chunk's files and their contents.
+
+        Files are hashed like git blobs, so the key changes exactly when a
+        file of the chunk is added, removed, renamed or edited.
+        """
+        digest = hashlib.sha256(self.path.encode())
+        for path, content in self.files:
+            digest.update(f"\0{path}\0{content_sha(content)}".encode())
+        return digest.hexdigest()
+
+
+def content_sha(text: str) -> str:
+    """Git blob SHA of ``text``."""
+    data = text.encode()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def chunk_codebase(
+    codebase: Files,
+    max_tokens: int = CHUNK_TOKENS,
+    min_tokens: int = MIN_CHUNK_TOKENS,
+    chars_per_token: float = CHARS_PER_TOKEN,
+) -> list[Chunk]:
+    """Split a codebase into directory-aligned chunks.
+
+    Directories smaller than ``min_tokens`` are folded into their parent, so
+    chunk boundaries follow the tree and a change only moves the boundaries
+    of its own directory. Directories larger than ``max_tokens`` are split
+    into several chunks. Chunks come out sorted by path.
+    """
+    directories: dict[PurePosixPath, Files] = defaultdict(list)
+    for path, content in codebase:
+        directories[PurePosixPath(path).parent].append((path, content))
+
+    # Level by level from the deepest, so a directory that grew by folding
+    # in small children can itself still fold into its parent
+    for depth in range(max((len(d.parts) for d in directories), default=0), 1, -1):
+        for directory in [d for d in directories if len(d.parts) == depth]:
+            files = directories[directory]
+            tokens = sum(_tokens(*file, chars_per_token) for file in files)
+            if tokens < min_tokens:
+                directories[directory.parent].extend(directories.pop(directory))
+
+    chunks = []
+    for directory in sorted(directories, key=str):
+        parts, part, tokens = [], [], 0
+        for path, content in sorted(directories[directory]):
+            cost = _tokens(path, content, chars_per_token)
+            if part and tokens + cost > max_tokens:
+                parts.append(part)
+                part, tokens = [], 0
+            part.append((path, content))
+            tokens += cost
+        parts.append(part)
+        for i, files in enumerate(parts):
+            # Later parts of a split directory are named after their first file
+            name = str(directory)
+            if i:
+                name = f"{name} (from {PurePosixPath(files[0][0]).name})"
+            chunks.append(Chunk(name, files))
+    return chunks
+
+
+def _tokens(path: str, content: str, chars_per_token: float) -> int:
+    return math.ceil(file_size(path, content) / chars_per_token)
@@ -0,0 +1,453 @@
+import csv
+import io
+import json
+import math
+import re
+import tomllib
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import PurePosixPath
+
+from gitsummarize.codebase.format import Files, files_size
+
+MAX_LINE_CHARS = 1_000
+DATA_FILE_CHARS = 20_000  # larger data files are replaced by a digest
+MAX_DIGEST_ITEMS = 200
+MAX_DIGEST_DEPTH = 3
+DATA_SAMPLE_ROWS = 5
+
+LOCKFILE_NAMES = {
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lock",
+    "Cargo.lock",
+    "poetry.lock",
+    "uv.lock",
+    "pdm.lock",
+    "Pipfile.lock",
+    "composer.lock",
+    "Gemfile.lock",
+    "Podfile.lock",
+    "pubspec.lock",
+    "mix.lock",
+    "go.sum",
+    "flake.lock",
+    "packages.lock.json",
+}
+DATA_EXTENSIONS = {
+    ".json",
+    ".jsonl",
+    ".csv",
+    ".tsv",
+    ".xml",
+    ".svg",
+    ".yaml",
+    ".yml",
+    ".lock",
+    ".map",
+}
+# Languages where indentation carries no meaning, so it can be narrowed. Not
+# HTML, whose <pre> blocks keep it, nor data files
+INDENT_INSENSITIVE_EXTENSIONS = {
+    ".c",
+    ".h",
+    ".cc",
+    ".hh",
+    ".cpp",
+    ".hpp",
+    ".cxx",
+    ".hxx",
+    ".inl",
+    ".cs",
+    ".java",
+    ".kt",
+    ".kts",
+    ".scala",
+    ".groovy",
+    ".js",
+    ".jsx",
+    ".mjs",
+    ".cjs",
+    ".ts",
+    ".tsx",
+    ".vue",
+    ".go",
+    ".rs",
+    ".swift",
+    ".dart",
+    ".php",
+    ".css",
+    ".scss",
+    ".less",
+    ".xml",
+    ".sql",
+    ".lua",
+    ".sol",
+    ".proto",
+    ".graphql",
+    ".zig",
+}
+_C_COMMENTS = ("//", "/*", "*", "*/")
+_HASH_COMMENTS = ("#",)
+# What a line of a leading comment block starts with, by extension. Files of
+# other types aren't searched for license headers: in Markdown "*" starts a
+# bullet, in most languages "--" doesn't start a comment.
+COMMENT_PREFIXES = {
+    **dict.fromkeys(
+        (
+            ".c",
+            ".h",
+            ".cc",
+            ".hh",
+            ".cpp",
+            ".hpp",
+            ".cxx",
+            ".hxx",
+            ".inl",
+            ".cs",
+            ".java",
+            ".kt",
+            ".kts",
+            ".scala",
+            ".groovy",
+            ".js",
+            ".jsx",
+            ".mjs",
+            ".cjs",
+            ".ts",
+            ".tsx",
+            ".go",
+            ".rs",
+            ".swift",
+            ".dart",
+            ".css",
+            ".scss",
+            ".less",
+            ".sol",
+            ".proto",
+            ".zig",
+        ),
+        _C_COMMENTS,
+    ),
+    ".php": (*_C_COMMENTS, "#"),
+    **dict.fromkeys(
+        (
+            ".py",
+            ".pyi",
+            ".rb",
+            ".pl",
+            ".pm",
+            ".sh",
+            ".bash",
+            ".zsh",
+            ".r",
+            ".jl",
+            ".ps1",
+            ".cmake",
+            ".toml",
+            ".yaml",
+            ".yml",
+            ".graphql",
+            ".nim",
+            ".ex",
+            ".exs",
+        ),
+        _HASH_COMMENTS,
+    ),
+    **dict.fromkeys((".sql", ".lua", ".hs", ".elm", ".ada"), ("--",)),
+    **dict.fromkeys((".clj", ".el", ".lisp", ".scm", ".asm", ".ini"), (";",)),
+    **dict.fromkeys((".ml", ".mli", ".pas"), ("(*", "*", "*)")),
+    **dict.fromkeys((".html", ".htm", ".xml", ".vue", ".svelte"), ("<!--", "-->")),
+}
+LICENSE_MARKERS = re.compile(
+    r"licen[sc]e|copyright|spdx-license-identifier|permission is hereby granted",
+    re.I,
+)
+
+_DIGITS = re.compile(r"\d+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+@dataclass
+class CompactionOptions:
+    strip_license_headers: bool = True
+    collapse_whitespace: bool = True
+    digest_data_files: bool = True
+    max_line_chars: int | None = MAX_LINE_CHARS
+    data_file_chars: int = DATA_FILE_CHARS
+
+
+@dataclass
+class CompactionStats:
+    files: int = 0
+    license_headers: int = 0
+    digested_files: int = 0
+    capped_lines: int = 0
+    chars_before: int = 0
+    chars_after: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Compacted size as a fraction of the original."""
+        return self.chars_after / self.chars_before if self.chars_before else 1.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "ratio": self.ratio}
+
+
+def compact_codebase(
+    codebase: Files, options: CompactionOptions | None = None
+) -> tuple[Files, CompactionStats]:
+    """Shrink a codebase without losing what the documents are written from.
+
+    License headers repeated across files are kept only in the first one,
+    whitespace is collapsed where the language allows it, lockfiles and
+    large data files are replaced by structural digests, and very long lines
+    are cut. Files keep their paths and order.
+    """
+    options = options or CompactionOptions()
+    stats = CompactionStats(files=len(codebase), chars_before=files_size(codebase))
+
+    headers = [
+        _license_header(
+            content, COMMENT_PREFIXES.get(PurePosixPath(path).suffix.lower())
+        )
+        for path, content in codebase
+    ]
+    repeated = Counter(_DIGITS.sub("0", header) for header in headers if header)
+    seen_headers = set()
+
+    compacted = []
+    for (path, content), header in zip(codebase, headers, strict=True):
+        name = PurePosixPath(path).name
+        extension = PurePosixPath(path).suffix.lower()
+        if options.strip_license_headers and header:
+            key = _DIGITS.sub("0", header)
+            if repeated[key] > 1 and key in seen_headers:
+                content = content.replace(header, "", 1).lstrip("\n")
+                stats.license_headers += 1
+            seen_headers.add(key)
+
+        if options.digest_data_files and (
+            name in LOCKFILE_NAMES
+            or (extension in DATA_EXTENSIONS and len(content) > options.data_file_chars)
+        ):
+            digest = _digest(name, extension, content)
+            if digest is not None and len(digest) < len(content):
+                content = digest
+                stats.digested_files += 1
+
+        if options.collapse_whitespace:
+            content = _collapse_whitespace(
+                content, extension in INDENT_INSENSITIVE_EXTENSIONS
+            )
+        if options.max_line_chars:
+            content, capped = _cap_lines(content, options.max_line_chars)
+            stats.capped_lines += capped
+        compacted.append((path, content))
+
+    stats.chars_after = files_size(compacted)
+    return compacted, stats
+
+
+def _license_header(content: str, prefixes: tuple[str, ...] | None) -> str | None:
+    """The leading comment block of a file, if it reads like a license.
+
+    ``prefixes`` are what the language's comment lines start with; None
+    finds no header.
+    """
+    if prefixes is None:
+        return None
+    lines = content.splitlines(keepends=True)
+    start = 0
+    # A shebang or encoding line stays above the header
+    while start < len(lines) and lines[start].startswith(("#!", "# -*-")):
+        start += 1
+    end = start
+    while end < len(lines) and (
+        lines[end].lstrip().startswith(prefixes)
+        or (end > start and not lines[end].strip())
+    ):
+        end += 1
+    # Don't take the blank lines that ended the block
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    header = "".join(lines[start:end])
+    return header if LICENSE_MARKERS.search(header) else None
+
+
+def _collapse_whitespace(content: str, narrow_indent: bool) -> str:
+    lines = [line.rstrip() for line in content.split("\n")]
+    if narrow_indent:
+        lines = _narrow_indent(lines)
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines))
+
+
+def _narrow_indent(lines: list[str]) -> list[str]:
+    """Re-indent with one space per level instead of a tab or several spaces."""
+    widths = (len(line) - len(line.lstrip(" ")) for line in lines)
+    # Odd widths are usually alignment, e.g. " * " in block comments
+    unit = math.gcd(*(width for width in widths if width and width % 2 == 0))
+    narrowed = []
+    for line in lines:
+        stripped = line.lstrip(" \t")
+        indent = line[: len(line) - len(stripped)]
+        tabs, spaces = indent.count("\t"), indent.count(" ")
+        if unit > 1:
+            spaces = spaces // unit + spaces % unit
+        narrowed.append(" " * (tabs + spaces) + stripped)
+    return narrowed
+
+
+def _cap_lines(content: str, max_chars: int) -> tuple[str, int]:
+    lines = content.split("\n")
+    capped = 0
+    for i, line in enumerate(lines):
+        if len(line) > max_chars:
+            lines[i] = f"{line[:max_chars]}… [{len(line) - max_chars} more chars]"
+            capped += 1
+    return "\n".join(lines), capped
+
+
+def _digest(name: str, extension: str, content: str) -> str | None:
+    """A short structural summary of a lockfile or data file, or None."""
+    try:
+        if name in LOCKFILE_NAMES:
+            packages = _locked_packages(name, content)
+            if not packages:
+                return None
+            return _format_digest(
+                f"Lockfile digest: {len(packages)} locked packages", sorted(packages)
+            )
+        if extension in (".json", ".map"):
+            data = json.loads(content)
+            return _format_digest(
+                f"JSON digest: {_json_type(data)}, structure", _json_outline(data)
+            )
+        if extension == ".jsonl":
+            records = content.splitlines()
+            return _format_digest(
+                f"JSON Lines digest: {len(records)} records, structure of the first",
+                _json_outline(json.loads(records[0])),
+            )
+        if extension in (".csv", ".tsv"):
+            rows = list(
+                csv.reader(
+                    io.StringIO(content), delimiter="\t" if extension == ".tsv" else ","
+                )
+            )
+            return _format_digest(
+                f"Table digest: {len(rows) - 1} rows, header and first rows",
+                [",".join(row) for row in rows[: DATA_SAMPLE_ROWS + 1]],
+            )
+        if extension in (".xml", ".svg"):
+            tags = Counter(re.findall(r"<([A-Za-z][\w:.-]*)", content))
+            return _format_digest(
+                "XML digest: element counts",
+                [f"{tag}: {count}" for tag, count in tags.most_common()],
+            )
+        if extension in (".yaml", ".yml"):
+            # Top two levels of keys, by indentation
+            outline = [
+                line.rstrip()
+                for line in content.splitlines()
+                if re.match(r"( {0,2}|- )?[\w\"'.-]+:", line)
+            ]
+            return _format_digest("YAML digest: top-level structure", outline)
+    except Exception:
+        # Malformed files fail in too many ways to list (a package without a
+        # name, a list where an object was expected, nesting too deep), and
+        # none of them should stop the extraction; they're kept as they are
+        return None
+    return None
+
+
+def _format_digest(title: str, items: list[str]) -> str:
+    lines = items[:MAX_DIGEST_ITEMS]
+    if len(items) > MAX_DIGEST_ITEMS:
+        lines.append(f"… {len(items) - MAX_DIGEST_ITEMS} more")
+    return f"[{title}; full file omitted]\n" + "\n".join(lines)
+
+
+def _locked_packages(name: str, content: str) -> set[str]:
+    """ "name version" of every package pinned by a lockfile."""
+    if name in ("Cargo.lock", "poetry.lock", "uv.lock", "pdm.lock"):
+        return {
+            f"{package['name']} {package.get('version', '')}".strip()
+            for package in tomllib.loads(content).get("package", [])
+        }
+    if name in ("package-lock.json", "npm-shrinkwrap.json"):
+        data = json.loads(content)
+        packages = data.get("packages") or data.get("dependencies") or {}
+        return {
+            f"{path.rpartition('node_modules/')[2]} {info.get('version', '')}".strip()
+            for path, info in packages.items()
+            if path
+        }
+    if name == "composer.lock":
+        data = json.loads(content)
+        return {
+            f"{package['name']} {package.get('version', '')}".strip()
+            for package in data.get("packages", []) + data.get("packages-dev", [])
+        }
+    if name == "Pipfile.lock":
+        data = json.loads(content)
+        return {
+            f"{package} {info.get('version', '')}".strip()
+            for section in ("default", "develop")
+            for package, info in data.get(section, {}).items()
+        }
+    if name == "go.sum":
+        return {
+            " ".join(line.split()[:2]).removesuffix("/go.mod")
+            for line in content.splitlines()
+            if line.strip()
+        }
+    if name == "Gemfile.lock":
+        return set(re.findall(r"(?m)^ {4}(\S+ \([^)]+\))$", content))
+    if name == "yarn.lock":
+        # An entry's specifiers, then its "version" on one of the next lines
+        return {
+            f"{package} {version}"
+            for package, version in re.findall(
+                r'(?m)^"?(@?[^@\s"]+)@.*:\n(?:  .*\n)*?  version:? "?([^"\n]+)', content
+            )
+        }
+    # pnpm-lock.yaml, Podfile.lock, pubspec.lock, mix.lock, ...: names of the
+    # entries one level under the top
+    return {
+        match.strip("'\"/")
+        for match in re.findall(
+            r"(?m)^ {2,4}(?:- )?['\"]?(/?@?[\w./-]+@?[\w.-]*)['\"]?:", content
+        )
+    }
+
+
+def _json_outline(value, depth: int = 0, prefix: str = "") -> list[str]:
+    """Key paths and value types of a JSON document, arrays by first item."""
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            lines.append(f"{prefix}{key}: {_json_type(item)}")
+            if depth + 1 < MAX_DIGEST_DEPTH:
+                lines.extend(_json_outline(item, depth + 1, f"{prefix}{key}."))
+        return lines
+    if isinstance(value, list) and value and depth + 1 < MAX_DIGEST_DEPTH:
+        return _json_outline(value[0], depth + 1, f"{prefix}[]." if prefix else "[].")
+    return []
+
+
+def _json_type(value) -> str:
+    if isinstance(value, dict):
+        return f"object ({len(value)} keys)"
+    if isinstance(value, list):
+        return f"array ({len(value)} items)"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, bool):
+        return "boolean"
+    if value is None:
+        return "null"
+    return "number"
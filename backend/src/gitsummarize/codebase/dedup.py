@@ -0,0 +1,181 @@
+import difflib
+import hashlib
+import math
+import zlib
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+from gitsummarize.codebase.format import (
+    Files,
+    file_size,
+    files_size,
+    near_duplicate_note,
+)
+from gitsummarize.codebase.packing import CHARS_PER_TOKEN
+
+NEAR_DUPLICATE_SIMILARITY = 0.85  # Jaccard similarity of line shingles
+MIN_NEAR_DUPLICATE_CHARS = 1_000  # smaller files aren't worth diffing
+SHINGLE_LINES = 3
+SKETCH_BINS = 32
+BAND_BINS = 4  # bins per LSH band, fewer finds less similar candidates
+MAX_DIFF_RATIO = 0.5  # keep files whose diff is over half their size
+
+
+@dataclass
+class DedupStats:
+    files: int = 0
+    duplicate_files: int = 0
+    near_duplicate_files: int = 0
+    bytes_saved: int = 0
+    tokens_saved: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def dedupe_codebase(
+    codebase: Files,
+    near_duplicates: bool = True,
+    similarity: float = NEAR_DUPLICATE_SIMILARITY,
+    chars_per_token: float = CHARS_PER_TOKEN,
+) -> tuple[Files, DedupStats]:
+    """Collapse repeated files of a codebase and report what it saved.
+
+    Files with identical content are kept once, at their first path, with a
+    note listing the paths of the copies. With ``near_duplicates``, files
+    whose line shingles are at least ``similarity`` alike are found through
+    locality-sensitive hashing and replaced by a diff against the first of
+    them, when the diff is small enough to be worth it. Files keep their
+    archive order.
+    """
+    stats = DedupStats(files=len(codebase))
+    paths = [path for path, _ in codebase]
+    contents = [content for _, content in codebase]
+
+    copies: dict[bytes, list[int]] = defaultdict(list)
+    for i, content in enumerate(contents):
+        copies[hashlib.sha1(content.encode()).digest()].append(i)
+
+    kept: dict[int, str] = {}
+    for indexes in copies.values():
+        first, *rest = indexes
+        if not rest:
+            kept[first] = contents[first]
+            continue
+        copy_paths = ", ".join(paths[i] for i in rest)
+        kept[first] = f"[Identical copies: {copy_paths}]\n{contents[first]}"
+        stats.duplicate_files += len(rest)
+
+    if near_duplicates:
+        for i, original in _find_near_duplicates(
+            [(i, contents[i]) for i in sorted(kept)], similarity
+        ):
+            diff = _diff(contents[original], contents[i])
+            if len(diff) > len(contents[i]) * MAX_DIFF_RATIO:
+                continue
+            kept[i] = near_duplicate_note(paths[original]) + diff
+            stats.near_duplicate_files += 1
+
+    deduped = [(paths[i], kept[i]) for i in sorted(kept)]
+    stats.bytes_saved = _encoded_size(codebase) - _encoded_size(deduped)
+    stats.tokens_saved = math.ceil(files_size(codebase) / chars_per_token) - math.ceil(
+        files_size(deduped) / chars_per_token
+    )
+    return deduped, stats
+
+
+def _find_near_duplicates(
+    files: list[tuple[int, str]], similarity: float
+) -> list[tuple[int, int]]:
+    """Return (index, index of the earlier file it nearly duplicates) pairs.
+
+    Each file gets a one-permutation MinHash sketch of its line shingles.
+    Files sharing any band of the sketch are candidates, which are then
+    checked against the exact Jaccard similarity of their shingles.
+    """
+    shingles = {}
+    buckets: dict[tuple, list[int]] = defaultdict(list)
+    pairs = []
+    for i, content in files:
+        if len(content) < MIN_NEAR_DUPLICATE_CHARS:
+            continue
+        shingles[i] = _shingles(content)
+        sketch = _sketch(shingles[i])
+        bands = [
+            (band, *sketch[band : band + BAND_BINS])
+            for band in range(0, SKETCH_BINS, BAND_BINS)
+        ]
+        candidates = {j for band in bands for j in buckets.get(band, ())}
+        match = next(
+            (
+                j
+                for j in sorted(candidates)
+                if _jaccard(shingles[i], shingles[j]) >= similarity
+            ),
+            None,
+        )
+        if match is not None:
+            pairs.append((i, match))
+            continue
+        # Only files kept in full can be diffed against
+        for band in bands:
+            buckets[band].append(i)
+    return pairs
+
+
+def _shingles(content: str) -> set[int]:
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+    return {
+        zlib.crc32("\n".join(lines[i : i + SHINGLE_LINES]).encode())
+        for i in range(max(1, len(lines) - SHINGLE_LINES + 1))
+    }
+
+
+def _sketch(shingles: set[int]) -> list[int]:
+    """Lowest shingle hash in each of SKETCH_BINS bins.
+
+    Empty bins borrow the value of the next non-empty one, offset by the
+    distance, so small files still get comparable sketches.
+    """
+    sketch: list[int | None] = [None] * SKETCH_BINS
+    for shingle in shingles:
+        # The low bits pick the bin, the rest are compared
+        bin_, value = shingle % SKETCH_BINS, shingle // SKETCH_BINS
+        if sketch[bin_] is None or value < sketch[bin_]:
+            sketch[bin_] = value
+    filled = [bin_ for bin_, value in enumerate(sketch) if value is not None]
+    if not filled:
+        return [0] * SKETCH_BINS
+    for bin_ in range(SKETCH_BINS):
+        if sketch[bin_] is None:
+            distance = min((other - bin_) % SKETCH_BINS for other in filled)
+            sketch[bin_] = sketch[(bin_ + distance) % SKETCH_BINS] + distance * 2**32
+    return sketch
+
+
+def _jaccard(a: set[int], b: set[int]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _encoded_size(files: Files) -> int:
+    """Bytes the files take up in rendered codebase text, about."""
+    return sum(file_size(path, "") + len(content.encode()) for path, content in files)
+
+
+def _diff(original: str, content: str) -> str:
+    lines = difflib.unified_diff(_diff_lines(original), _diff_lines(content), n=0)
+    # Skip the ---/+++ file header lines
+    return "".join(line for i, line in enumerate(lines) if i >= 2)
+
+
+def _diff_lines(text: str) -> list[str]:
+    """Lines of ``text`` for unified_diff, each ending in a newline.
+
+    A missing newline at the end is marked the way diff does, instead of
+    running the last line into the next line of the diff.
+    """
+    *lines, last = text.split("\n")
+    lines = [f"{line}\n" for line in lines]
+    if last:
+        lines.append(f"{last}\n\\ No newline at end of file\n")
+    return lines
@@ -0,0 +1,327 @@
+import re
+from collections.abc import Iterable, Mapping
+
+from gitsummarize.constants.constants import VALID_FILE_EXTENSIONS
+
+SNIFF_BYTES = 8000  # git reads this much to decide whether a file is binary
+RULE_FILES = (".gitignore", ".gitattributes")
+EXCLUDING_ATTRIBUTES = ("linguist-vendored", "linguist-generated")
+
+
+def is_binary(data: bytes) -> bool:
+    """Whether file content looks binary, by git's rule: a NUL byte early on."""
+    return b"\0" in data[:SNIFF_BYTES]
+
+
+class FileMatcher:
+    """Compiled form of a VALID_FILE_EXTENSIONS-style pattern list.
+
+    Entries are sorted by kind so that no path is checked against the whole
+    list: suffixes (".py", ".lock.json", "*.md") are found by a set lookup of
+    the file name's extension, case-insensitively, and bare names
+    ("Dockerfile") and paths (".circleci/config.yml") by a set lookup of the
+    name or path. Other globs (".env.*", "docs/*") are compiled into one
+    regex per kind, only run on paths that start with one of their literal
+    prefixes. Globs and paths with a slash match from the repository root,
+    like in .gitignore, everything else the file name.
+
+    Globs with a slash select directories, not types: they only add files
+    without an extension, so "docs/*" can't bring in docs/logo.png. Files
+    with one are selected by their extension or not at all.
+
+    Unlike a str.endswith scan of the list, suffixes match case-insensitively
+    and on a dot, so "README.md" doesn't select "NOT_README.md", and globs
+    match at all; the cost stays flat as the list grows.
+    """
+
+    def __init__(self, patterns: Iterable[str] = VALID_FILE_EXTENSIONS):
+        self.suffixes: set[str] = set()
+        self.names: set[str] = set()
+        self.paths: set[str] = set()
+        name_globs, path_globs = [], []
+        for pattern in patterns:
+            if pattern.startswith("*.") and not _has_magic(pattern[1:]):
+                pattern = pattern[1:]
+            if "/" in pattern and not _has_magic(pattern) and not pattern.endswith("/"):
+                self.paths.add(pattern.lstrip("/"))
+            elif "/" in pattern:
+                path_globs.append(pattern)
+            elif _has_magic(pattern):
+                name_globs.append(pattern)
+            elif pattern.startswith("."):
+                self.suffixes.add(pattern.lower())
+            else:
+                self.names.add(pattern)
+        # Multi-dot suffixes like ".lock.json", by their last extension
+        self._longer_suffixes: dict[str, tuple[str, ...]] = {}
+        for suffix in self.suffixes:
+            extension = suffix[suffix.rfind(".") :]
+            if extension != suffix:
+                self._longer_suffixes[extension] = (
+                    *self._longer_suffixes.get(extension, ()),
+                    suffix,
+                )
+        self._name_glob = _GlobSet(
+            (_glob_to_regex(glob), *_literal_affixes(glob)) for glob in name_globs
+        )
+        # Path globs also match everything below a matching directory
+        self._path_glob = _GlobSet(
+            (
+                _glob_to_regex(glob.strip("/"))
+                + ("/.*" if glob.endswith("/") else "(?:/.*)?"),
+                _literal_affixes(glob.lstrip("/"))[0],
+                "",
+            )
+            for glob in path_globs
+        )
+
+    def matches(self, path: str) -> bool:
+        """Whether ``path``, relative to the repository root, is selected."""
+        # Most paths are settled by their extension, so it's looked up before
+        # anything else is split off the path. An "extension" that runs over
+        # a slash, from a dot in a directory name, is in no set.
+        dot = path.rfind(".")
+        extension = path[dot:].lower() if dot != -1 else ""
+        if extension in self.suffixes:
+            return True
+        name = path[path.rfind("/") + 1 :]
+        if name in self.names or path in self.paths:
+            return True
+        longer = self._longer_suffixes.get(extension)
+        if longer and name.lower().endswith(longer):
+            return True
+        if self._name_glob.matches(name):
+            return True
+        # A leading dot doesn't start an extension
+        return "." not in name[1:] and self._path_glob.matches(path)
+
+
+class RepoRules:
+    """Files a repository itself marks as not worth reading.
+
+    Covers paths matched by its .gitignore files, which committed files
+    still can be, e.g. force-added build output, and paths given the
+    linguist-vendored or linguist-generated attribute in its .gitattributes
+    files. Rule files apply to their own directory and below, deeper ones
+    taking precedence, and the last matching line wins. As in git, a file
+    in an ignored directory can't be re-included, which lets the decision
+    for each directory be made once and cached.
+    """
+
+    def __init__(self):
+        self._ignored = _RuleSet()
+        self._attributes = {name: _RuleSet() for name in EXCLUDING_ATTRIBUTES}
+        self._ignored_directories: dict[str, bool] = {}
+        # Every file rule of every set, to rule most paths out in one go
+        self._any_file_rule: tuple[_GlobSet, _GlobSet] | None = None
+
+    @classmethod
+    def from_files(cls, files: Mapping[str, str]) -> "RepoRules":
+        """Build the rules from {path: text} of .gitignore/.gitattributes files."""
+        rules = cls()
+        for path in sorted(files, key=lambda path: (path.count("/"), path)):
+            directory, _, name = path.rpartition("/")
+            if name == ".gitignore":
+                rules.add_gitignore(files[path], directory)
+            elif name == ".gitattributes":
+                rules.add_gitattributes(files[path], directory)
+        return rules
+
+    def add_gitignore(self, text: str, directory: str = ""):
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            ignored = not line.startswith("!")
+            if not ignored or line.startswith("\\"):
+                line = line[1:]
+            self._ignored.add(line, directory, ignored)
+        self._ignored_directories.clear()
+        self._any_file_rule = None
+
+    def add_gitattributes(self, text: str, directory: str = ""):
+        for line in text.splitlines():
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            # Attributes only apply to files, so "dir/" patterns match nothing
+            if fields[0].endswith("/"):
+                continue
+            for field in fields[1:]:
+                name, _, value = field.lstrip("-!").partition("=")
+                if name in self._attributes:
+                    is_set = not field.startswith(("-", "!")) and value != "false"
+                    self._attributes[name].add(fields[0], directory, is_set)
+        self._any_file_rule = None
+
+    def is_excluded(self, path: str) -> bool:
+        """Whether ``path``, relative to the repository root, is excluded."""
+        directory, _, name = path.rpartition("/")
+        if directory and self._is_ignored_directory(directory):
+            return True
+        if self._any_file_rule is None:
+            rules = [
+                rule
+                for rule_set in (self._ignored, *self._attributes.values())
+                for rule in rule_set.file_rules()
+            ]
+            self._any_file_rule = (
+                _GlobSet(glob for glob, on_name in rules if on_name),
+                _GlobSet(glob for glob, on_name in rules if not on_name),
+            )
+        names, paths = self._any_file_rule
+        if not (names.matches(name) or paths.matches(path)):
+            return False
+        return self._ignored.match(path) or any(
+            rules.match(path) for rules in self._attributes.values()
+        )
+
+    def _is_ignored_directory(self, directory: str) -> bool:
+        ignored = self._ignored_directories.get(directory)
+        if ignored is None:
+            parent = directory.rpartition("/")[0]
+            ignored = bool(parent) and self._is_ignored_directory(parent)
+            ignored = ignored or self._ignored.match(directory, is_dir=True)
+            self._ignored_directories[directory] = ignored
+        return ignored
+
+
+class _GlobSet:
+    """Globs combined into one regex, only run on plausible strings.
+
+    Takes (regex, literal prefix, literal suffix) of each glob. A string
+    that starts with none of the prefixes, or ends with none of the
+    suffixes, is rejected without touching the regex.
+    """
+
+    def __init__(self, globs: Iterable[tuple[str, str, str]]):
+        globs = list(globs)
+        self._regex = _compile_any(regex for regex, _, _ in globs)
+        # An empty affix would let every string through anyway
+        prefixes = tuple(prefix for _, prefix, _ in globs)
+        self._prefixes = prefixes if all(prefixes) else None
+        suffixes = tuple(suffix for _, _, suffix in globs)
+        self._suffixes = suffixes if all(suffixes) else None
+
+    def matches(self, text: str) -> bool:
+        if self._regex is None:
+            return False
+        if self._prefixes is not None and not text.startswith(self._prefixes):
+            return False
+        if self._suffixes is not None and not text.endswith(self._suffixes):
+            return False
+        return bool(self._regex.fullmatch(text))
+
+
+class _RuleSet:
+    """Ordered gitignore-style rules where the last match decides.
+
+    Patterns without a slash from a root rule file are matched against the
+    name alone, everything else against the whole path.
+    """
+
+    def __init__(self):
+        # ((regex, prefix, suffix), on_name, dir_only, value)
+        self._rules: list[tuple[tuple[str, str, str], bool, bool, bool]] = []
+        self._compiled: dict[bool, tuple] = {}
+
+    def add(self, pattern: str, directory: str, value: bool):
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        glob = pattern.lstrip("/")
+        regex = _glob_to_regex(glob)
+        prefix, suffix = _literal_affixes(glob)
+        # A slash anywhere but at the end anchors the pattern to ``directory``
+        if "/" not in pattern and not directory:
+            self._rules.append(((regex, prefix, suffix), True, dir_only, value))
+        else:
+            base = f"{directory}/" if directory else ""
+            if "/" in pattern:
+                rule = (re.escape(base) + regex, base + prefix, suffix)
+            else:
+                rule = (re.escape(base) + "(?:.*/)?" + regex, base, suffix)
+            self._rules.append((rule, False, dir_only, value))
+        self._compiled.clear()
+
+    def file_rules(self) -> list[tuple[tuple[str, str, str], bool]]:
+        """(glob, on_name) of the rules that can match files."""
+        return [
+            (glob, on_name)
+            for glob, on_name, dir_only, _ in self._rules
+            if not dir_only
+        ]
+
+    def match(self, path: str, is_dir: bool = False) -> bool:
+        if not self._rules:
+            return False
+        if is_dir not in self._compiled:
+            rules = [rule for rule in self._rules if is_dir or not rule[2]]
+            self._compiled[is_dir] = (
+                _GlobSet(glob for glob, on_name, *_ in rules if on_name),
+                _GlobSet(glob for glob, on_name, *_ in rules if not on_name),
+                [
+                    (re.compile(regex), on_name, value)
+                    for (regex, _, _), on_name, _, value in reversed(rules)
+                ],
+            )
+        names, paths, rules = self._compiled[is_dir]
+        name = path.rpartition("/")[2]
+        # Most paths match no rule at all, which the combined globs settle
+        if not (names.matches(name) or paths.matches(path)):
+            return False
+        for regex, on_name, value in rules:
+            if regex.fullmatch(name if on_name else path):
+                return value
+        return False
+
+
+def _compile_any(regexes: Iterable[str]) -> re.Pattern | None:
+    regexes = list(regexes)
+    if not regexes:
+        return None
+    return re.compile("|".join(f"(?:{regex})" for regex in regexes))
+
+
+def _has_magic(glob: str) -> bool:
+    return any(c in glob for c in "*?[")
+
+
+def _literal_affixes(glob: str) -> tuple[str, str]:
+    """The plain text every match of ``glob`` starts and ends with."""
+    magic = [i for i, c in enumerate(glob) if c in "*?[]"]
+    if not magic:
+        return glob, glob
+    # The slash of a leading "**/" is optional, so it can't be required
+    return glob[: magic[0]], glob[magic[-1] + 1 :].lstrip("/")
+
+
+def _glob_to_regex(glob: str) -> str:
+    """Translate a glob where "*" and "?" stop at slashes and "**" doesn't."""
+    parts = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif glob[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif glob[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif glob[i] == "[" and (end := glob.find("]", i + 2)) != -1:
+            body = glob[i + 1 : end].replace("\\", "\\\\")
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            parts.append(f"[{body}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(glob[i]))
+            i += 1
+    return "".join(parts)
+
+
+VALID_FILES = FileMatcher()
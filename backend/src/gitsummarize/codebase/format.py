@@ -0,0 +1,97 @@
+import io
+from collections.abc import Iterable
+from string import Formatter
+from textwrap import dedent
+
+FILE_SEPARATOR = "=" * 77
+FILE_JOINER = "\n\n"
+
+# (path, content) of a codebase's files. Codebases stay in this form until
+# the prompt is built, rendering them is the last step
+Files = list[tuple[str, str]]
+
+
+def format_file(path: str, content: str) -> str:
+    """Render one file as a block of the codebase text sent to the LLMs."""
+    return dedent(
+        f"""
+{FILE_SEPARATOR}
+File: {path}
+{FILE_SEPARATOR}
+{content}
+"""
+    )
+
+
+def join_files(blocks: Iterable[str]) -> str:
+    return FILE_JOINER.join(blocks)
+
+
+def render_files(files: Iterable[tuple[str, str]]) -> str:
+    """Render (path, content) pairs as the codebase text sent to the LLMs."""
+    return join_files(format_file(path, content) for path, content in files)
+
+
+def render_prompt(template: str, max_chars: int, files: Files, **fields: str) -> str:
+    """Fill a str.format ``template`` with ``files`` as its {codebase} field.
+
+    The prompt is written into one buffer, file block by file block, so the
+    rendered codebase, the filled template and a truncated copy of it never
+    exist side by side. Everything but the codebase is written in full, the
+    codebase is cut off where the prompt would exceed ``max_chars``.
+    """
+    parsed = list(Formatter().parse(template))
+    remaining = max_chars - sum(
+        len(literal) + (len(fields[name]) if name and name != "codebase" else 0)
+        for literal, name, _, _ in parsed
+    )
+    prompt = io.StringIO()
+    for literal, name, _, _ in parsed:
+        prompt.write(literal)
+        if name is None:
+            continue
+        if name != "codebase":
+            prompt.write(fields[name])
+            continue
+        for i, (path, content) in enumerate(files):
+            for text in (FILE_JOINER if i else "", format_file(path, content)):
+                if len(text) > remaining:
+                    prompt.write(text[: max(0, remaining)])
+                    remaining = -1
+                    break
+                prompt.write(text)
+                remaining -= len(text)
+            if remaining < 0:
+                break
+    return prompt.getvalue()
+
+
+def near_duplicate_note(original: str) -> str:
+    """First line of a file replaced by its differences from ``original``."""
+    return f"{_NEAR_DUPLICATE_PREFIX}{original}{_NEAR_DUPLICATE_SUFFIX}"
+
+
+def near_duplicate_original(content: str) -> str | None:
+    """Path of the file ``content`` is a diff against, if it is one."""
+    if not content.startswith(_NEAR_DUPLICATE_PREFIX):
+        return None
+    line = content.partition("\n")[0] + "\n"
+    if not line.endswith(_NEAR_DUPLICATE_SUFFIX):
+        return None
+    return line[len(_NEAR_DUPLICATE_PREFIX) : -len(_NEAR_DUPLICATE_SUFFIX)]
+
+
+def file_size(path: str, content: str) -> int:
+    """Upper bound of the characters a file adds to rendered codebase text."""
+    return _BLOCK_OVERHEAD + len(path) + len(content)
+
+
+def files_size(files: Iterable[tuple[str, str]]) -> int:
+    """Upper bound of the length of ``render_files(files)``."""
+    return sum(file_size(path, content) for path, content in files)
+
+
+# Characters format_file and the joiner add around a file's path and content
+_BLOCK_OVERHEAD = len(format_file("", "")) + len(FILE_JOINER)
+_NEAR_DUPLICATE_PREFIX = "[Near-duplicate of "
+_NEAR_DUPLICATE_SUFFIX = ", differences:]\n"
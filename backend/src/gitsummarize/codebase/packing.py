@@ -0,0 +1,245 @@
+import math
+import re
+from collections import Counter
+from pathlib import PurePosixPath
+
+from gitsummarize.codebase.format import (
+    Files,
+    file_size,
+    files_size,
+    near_duplicate_original,
+)
+
+CHARS_PER_TOKEN = 3.7
+
+ENTRY_POINT_NAMES = {
+    "__main__.py",
+    "main.py",
+    "app.py",
+    "server.py",
+    "manage.py",
+    "cli.py",
+    "wsgi.py",
+    "asgi.py",
+    "index.js",
+    "index.ts",
+    "index.tsx",
+    "index.jsx",
+    "main.js",
+    "main.ts",
+    "server.js",
+    "server.ts",
+    "app.js",
+    "app.ts",
+    "main.go",
+    "main.rs",
+    "lib.rs",
+    "mod.rs",
+    "main.c",
+    "main.cpp",
+    "main.java",
+    "application.java",
+    "program.cs",
+    "main.swift",
+    "main.kt",
+}
+MANIFEST_NAMES = {
+    "package.json",
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "requirements.txt",
+    "cargo.toml",
+    "go.mod",
+    "pom.xml",
+    "build.gradle",
+    "build.gradle.kts",
+    "gemfile",
+    "composer.json",
+    "dockerfile",
+    "docker-compose.yml",
+    "docker-compose.yaml",
+    "makefile",
+    "cmakelists.txt",
+}
+SOURCE_EXTENSIONS = {
+    ".py",
+    ".pyi",
+    ".pyx",
+    ".js",
+    ".jsx",
+    ".mjs",
+    ".cjs",
+    ".ts",
+    ".tsx",
+    ".vue",
+    ".svelte",
+    ".go",
+    ".rs",
+    ".java",
+    ".kt",
+    ".kts",
+    ".scala",
+    ".groovy",
+    ".clj",
+    ".c",
+    ".h",
+    ".cpp",
+    ".hpp",
+    ".cc",
+    ".hh",
+    ".cxx",
+    ".cs",
+    ".fs",
+    ".rb",
+    ".php",
+    ".swift",
+    ".m",
+    ".mm",
+    ".dart",
+    ".ex",
+    ".exs",
+    ".erl",
+    ".hs",
+    ".ml",
+    ".lua",
+    ".r",
+    ".jl",
+    ".sql",
+    ".sh",
+    ".bash",
+    ".zig",
+    ".nim",
+    ".sol",
+    ".proto",
+    ".graphql",
+}
+DOC_EXTENSIONS = {".md", ".rst", ".txt", ".adoc", ".asciidoc"}
+CONFIG_EXTENSIONS = {".toml", ".ini", ".cfg", ".conf", ".yaml", ".yml", ".env"}
+DATA_EXTENSIONS = {".json", ".csv", ".tsv", ".xml", ".lock", ".svg", ".map"}
+LOW_VALUE_DIRS = {
+    "node_modules",
+    "vendor",
+    "vendors",
+    "third_party",
+    "thirdparty",
+    "external",
+    "dist",
+    "build",
+    "out",
+    "target",
+    "generated",
+    "__generated__",
+    "fixtures",
+    "testdata",
+    "__snapshots__",
+    "locale",
+    "locales",
+    "i18n",
+    "migrations",
+}
+TEST_DIRS = {"test", "tests", "__tests__", "spec", "specs", "e2e"}
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_TEST_FILE = re.compile(r"(^test_|^tests?\.|_test\.|\.test\.|\.spec\.)", re.I)
+
+
+def estimate_tokens(text: str, chars_per_token: float = CHARS_PER_TOKEN) -> int:
+    return math.ceil(len(text) / chars_per_token)
+
+
+def pack_codebase(
+    codebase: Files, max_tokens: int, chars_per_token: float = CHARS_PER_TOKEN
+) -> Files:
+    """Keep the most useful whole files of ``codebase`` within ``max_tokens``.
+
+    Files are ranked by score_file and added greedily, skipping any that no
+    longer fit, then returned in their original order. A near-duplicate left
+    by dedupe_codebase is only kept together with the file its diff is
+    against. Codebases that already fit are returned untouched.
+    """
+    if math.ceil(files_size(codebase) / chars_per_token) <= max_tokens:
+        return codebase
+
+    references = _count_references(codebase)
+    costs = [
+        math.ceil(file_size(path, content) / chars_per_token)
+        for path, content in codebase
+    ]
+    scores = [
+        score_file(path, cost, references[PurePosixPath(path).stem])
+        for (path, _), cost in zip(codebase, costs, strict=True)
+    ]
+    ranked = sorted(range(len(codebase)), key=lambda i: -scores[i])
+
+    indexes = {path: i for i, (path, _) in enumerate(codebase)}
+    originals = {}
+    for i, (_, content) in enumerate(codebase):
+        original = indexes.get(near_duplicate_original(content))
+        if original is not None and original != i:
+            originals[i] = original
+
+    remaining = max_tokens
+    selected = set()
+    for i in ranked:
+        if i in selected:
+            continue
+        # A diff means nothing without the file it was taken against
+        needed = [i]
+        if i in originals and originals[i] not in selected:
+            needed.append(originals[i])
+        cost = sum(costs[j] for j in needed)
+        if cost <= remaining:
+            selected.update(needed)
+            remaining -= cost
+    return [codebase[i] for i in sorted(selected)]
+
+
+def score_file(path: str, tokens: int, references: int = 0) -> float:
+    """Rank a file by how much it tells the model about the repository."""
+    # Paths are prefixed with the repo name by the zip extraction
+    parts = PurePosixPath(path.lower()).parts[1:] or (path.lower(),)
+    name = parts[-1]
+    directories = set(parts[:-1])
+    depth = len(parts) - 1
+    suffix = PurePosixPath(name).suffix
+
+    if suffix in SOURCE_EXTENSIONS:
+        score = 3.0
+    elif suffix in DOC_EXTENSIONS:
+        score = 2.0
+    elif suffix in CONFIG_EXTENSIONS:
+        score = 1.5
+    elif suffix in DATA_EXTENSIONS:
+        score = 0.5
+    else:
+        score = 1.0
+
+    if name.startswith("readme"):
+        score += 10.0 if depth == 0 else 2.0
+    if name in ENTRY_POINT_NAMES:
+        score += 5.0 if depth <= 2 else 2.0
+    if name in MANIFEST_NAMES:
+        score += 4.0 if depth == 0 else 1.0
+    if directories & TEST_DIRS or _TEST_FILE.search(name):
+        score -= 1.5
+    if directories & LOW_VALUE_DIRS or ".min." in name:
+        score -= 5.0
+
+    score -= 0.5 * depth
+    score += math.log2(1 + references)
+    # Among otherwise equal files, prefer the cheaper one
+    score -= 0.5 * math.log2(1 + tokens / 1000)
+    return score
+
+
+def _count_references(files: Files) -> Counter:
+    """Count, per file stem, how many other files mention it as an identifier."""
+    stems = {PurePosixPath(path).stem for path, _ in files}
+    references = Counter()
+    for path, content in files:
+        mentioned = stems.intersection(_IDENTIFIER.findall(content))
+        # Mentions of its own stem don't make a file more central
+        mentioned.discard(PurePosixPath(path).stem)
+        references.update(mentioned)
+    return references
@@ -0,0 +1,154 @@
+from collections import Counter
+from collections.abc import Iterable, Iterator
+
+MAX_ENTRIES = 200  # per directory, the rest are counted by extension
+MAX_DEPTH = None  # deeper directories are shown with their file count only
+TOP_EXTENSIONS = 10  # extensions listed in the summary line
+
+
+class _Directory:
+    __slots__ = ("directories", "files", "file_count")
+
+    def __init__(self):
+        self.directories: dict[str, _Directory] = {}
+        self.files: list[str] = []
+        # Files in the whole subtree, filled in once the tree is built
+        self.file_count = 0
+
+
+def render_tree(
+    entries: Iterable[tuple[str, bool]],
+    max_depth: int | None = MAX_DEPTH,
+    max_entries: int | None = MAX_ENTRIES,
+) -> str:
+    """Render (path, is_directory) entries as a tree-like listing.
+
+    The listing starts with a line counting files by extension. Directories
+    deeper than ``max_depth`` are shown with their file count instead of
+    their contents, and a directory with more than ``max_entries`` entries
+    shows the first ones and collapses the rest into lines like
+    "… 4,210 more .c files". Parent directories missing from ``entries``
+    are implied by the paths below them; no entries render as "".
+
+    The tree is built in one pass and rendered with an explicit stack, so
+    time and memory grow linearly with the number of entries, apart from
+    sorting each directory's entries, and deep trees can't hit the recursion
+    limit.
+    """
+    root = _Directory()
+    extensions = Counter()
+    directory_count = 0
+    for path, is_directory in entries:
+        parts = path.strip("/").split("/")
+        if not parts[0]:
+            continue
+        node = root
+        for name in parts if is_directory else parts[:-1]:
+            child = node.directories.get(name)
+            if child is None:
+                child = node.directories[name] = _Directory()
+                directory_count += 1
+            node = child
+        if not is_directory:
+            node.files.append(parts[-1])
+            extensions[_extension(parts[-1])] += 1
+
+    # Parents come before their children, so counting in reverse is bottom-up
+    nodes = [root]
+    for node in nodes:
+        nodes.extend(node.directories.values())
+    for node in reversed(nodes):
+        node.file_count += len(node.files)
+        for child in node.directories.values():
+            node.file_count += child.file_count
+
+    if not root.directories and not root.files:
+        return ""
+    lines = [_summary(root.file_count, directory_count, extensions)]
+    stack = [(_entries(root, max_entries), "", 1)]
+    while stack:
+        children, prefix, depth = stack[-1]
+        entry = next(children, None)
+        if entry is None:
+            stack.pop()
+            continue
+        name, child, is_last = entry
+        connector = "└── " if is_last else "├── "
+        if child is None:
+            lines.append(f"{prefix}{connector}{name}")
+        elif (
+            max_depth is not None
+            and depth >= max_depth
+            and (child.directories or child.files)
+        ):
+            lines.append(
+                f"{prefix}{connector}{name}/ ({child.file_count:,} "
+                f"{_plural(child.file_count, 'file')})"
+            )
+        else:
+            lines.append(f"{prefix}{connector}{name}/")
+            stack.append(
+                (
+                    _entries(child, max_entries),
+                    prefix + ("    " if is_last else "│   "),
+                    depth + 1,
+                )
+            )
+    return "\n".join(lines)
+
+
+def _entries(
+    node: _Directory, max_entries: int | None
+) -> Iterator[tuple[str, _Directory | None, bool]]:
+    """(name, directory or None for a file, is_last) of a directory's lines."""
+    entries: list[tuple[str, _Directory | None]] = [
+        *node.directories.items(),
+        *((name, None) for name in node.files),
+    ]
+    entries.sort(key=lambda entry: entry[0])
+    collapsed = []
+    if max_entries is not None and len(entries) > max_entries:
+        rest = entries[max_entries:]
+        entries = entries[:max_entries]
+        directories = [child for _, child in rest if child is not None]
+        if directories:
+            files = sum(child.file_count for child in directories)
+            collapsed.append(
+                f"… {len(directories):,} more "
+                f"{_plural(len(directories), 'directory', 'directories')} "
+                f"({files:,} {_plural(files, 'file')})"
+            )
+        extensions = Counter(_extension(name) for name, child in rest if child is None)
+        for extension, count in extensions.most_common():
+            kind = f"{extension} " if extension else ""
+            suffix = "" if extension else " without an extension"
+            collapsed.append(f"… {count:,} more {kind}{_plural(count, 'file')}{suffix}")
+
+    last = len(entries) + len(collapsed) - 1
+    for i, (name, child) in enumerate(entries):
+        yield name, child, i == last
+    for i, line in enumerate(collapsed, len(entries)):
+        yield line, None, i == last
+
+
+def _summary(files: int, directories: int, extensions: Counter) -> str:
+    top = extensions.most_common(TOP_EXTENSIONS)
+    counts = [f"{extension or '(none)'} {count:,}" for extension, count in top]
+    others = files - sum(count for _, count in top)
+    if others:
+        counts.append(f"other {others:,}")
+    summary = (
+        f"{files:,} {_plural(files, 'file')} in {directories:,} "
+        f"{_plural(directories, 'directory', 'directories')}"
+    )
+    return f"{summary}; by extension: {', '.join(counts)}" if counts else summary
+
+
+def _extension(name: str) -> str:
+    # Like PurePosixPath.suffix, a leading dot doesn't start an extension
+    dot = name.rfind(".")
+    return name[dot:].lower() if dot > 0 else ""
+
+
+def _plural(count: int, singular: str, plural: str | None = None) -> str:
+    return singular if count == 1 else plural or f"{singular}s"
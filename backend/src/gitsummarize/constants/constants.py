@@ -7,12 +7,12 @@ VALID_FILE_EXTENSIONS = (
     
     # Configuration
     ".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".conf", ".config", ".properties",
-    ".env", ".env.*", ".rc", ".rc.*", ".lock", ".lockb", ".lock.json", ".lock.yaml", ".lock.yml",
-    ".lock.toml", ".lock.lockb",
+    ".env", ".env.*", ".rc", ".rc.*", ".lock", ".lock.json", ".lock.yaml", ".lock.yml",
+    ".lock.toml",
     
     # Programming Languages
     # Python
-    ".py", ".pyi", ".pyw", ".pyx", ".pxd", ".pxi", ".pyd", ".so",
+    ".py", ".pyi", ".pyw", ".pyx", ".pxd", ".pxi",
     
     # Java & JVM
     ".java", ".kt", ".kts", ".scala", ".groovy", ".clj", ".cljs", ".cljc", ".edn",
@@ -27,7 +27,7 @@ VALID_FILE_EXTENSIONS = (
     ".go", ".mod", ".sum",
     
     # Rust
-    ".rs", ".rlib",
+    ".rs",
     
     # PHP
     ".php", ".phtml", ".php3", ".php4", ".php5", ".php7", ".phps",
@@ -36,7 +36,7 @@ VALID_FILE_EXTENSIONS = (
     ".rb", ".rbw", ".rake", ".gemspec", ".gemfile", ".gemfile.lock",
     
     # Swift
-    ".swift", ".swiftmodule", ".swiftinterface",
+    ".swift", ".swiftinterface",
     
     # Dart
     ".dart",
@@ -45,13 +45,13 @@ VALID_FILE_EXTENSIONS = (
     ".sh", ".bash", ".zsh", ".fish", ".csh", ".tcsh", ".ksh", ".mksh",
     
     # SQL
-    ".sql", ".psql", ".mysql", ".sqlite", ".db",
+    ".sql", ".psql", ".mysql",
     
     # R
-    ".r", ".rdata", ".rds", ".rda",
+    ".r",
     
     # MATLAB
-    ".m", ".mat",
+    ".m",
     
     # Julia
     ".jl",
@@ -102,7 +102,7 @@ VALID_FILE_EXTENSIONS = (
     ".asm", ".s", ".S", ".inc",
     
     # LaTeX
-    ".tex", ".ltx", ".sty", ".cls", ".bbl", ".aux", ".log",
+    ".tex", ".ltx", ".sty", ".cls", ".bbl", ".log",
     
     # Markup
     ".xml", ".svg", ".xhtml", ".xslt", ".xsl", ".xsd", ".dtd",
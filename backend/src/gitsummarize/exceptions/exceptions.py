@@ -20,3 +20,9 @@ class GitHubTreeError(GitHubAccessError):
     def __init__(self, owner: str, repo: str):
         self.message = f"Failed to get tree for repository {owner}/{repo}"
         super().__init__(owner, repo)
+
+
+class GitHubArchiveTooLargeError(GitHubAccessError):
+    def __init__(self, owner: str, repo: str, max_size: int):
+        self.message = f"Archive for repository {owner}/{repo} exceeds {max_size} bytes"
+        super().__init__(owner, repo)
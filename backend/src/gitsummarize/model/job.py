@@ -0,0 +1,33 @@
+from enum import StrEnum
+
+from pydantic import BaseModel
+
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobStage(StrEnum):
+    QUEUED = "queued"
+    DOWNLOADING = "downloading"
+    EXTRACTING = "extracting"
+    GENERATING = "generating"
+    STORING = "storing"
+    DONE = "done"
+
+
+class Job(BaseModel):
+    id: str
+    repo_url: str
+    priority: int
+    status: JobStatus
+    stage: JobStage
+    params: dict
+    result: dict | None
+    error: str | None
+    attempts: int
+    created_at: float
+    updated_at: float
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from gitsummarize.cache.summary_cache import RepoDocuments, SummaryCache
+from gitsummarize.clients.github import GithubClient, is_valid_file
+from gitsummarize.codebase.file_filter import RULE_FILES
+from gitsummarize.codebase.format import Files
+
+logger = logging.getLogger(__name__)
+
+
+async def summarize_incrementally(
+    gh: GithubClient,
+    cache: SummaryCache,
+    repo_url: str,
+    commit_sha: str,
+    summarize: Callable[[tuple[str, Files], bool], Awaitable[tuple[str, str]]],
+    on_stage: Callable[[str], Awaitable[None]] | None = None,
+    max_tokens: int | None = None,
+) -> tuple[str, str, dict]:
+    """Return (business_summary, technical_documentation, stats) at ``commit_sha``.
+
+    If the compare API shows that no file of the codebase changed since the
+    last documented commit, the previous documents are returned without
+    downloading anything. Otherwise the codebase is downloaded and passed
+    to ``summarize`` along with whether the repo was documented before. For
+    such a repo ``summarize`` should map-reduce with chunk notes from
+    ``cache`` whatever its size, so only chunks whose files changed are
+    sent to the model again.
+    """
+    changed_paths = None
+    previous = await asyncio.to_thread(cache.get_documents, repo_url)
+    if previous is not None and previous.commit_sha != commit_sha:
+        changed_paths = await gh.get_changed_paths_from_url(
+            repo_url, previous.commit_sha, commit_sha
+        )
+        if changed_paths is not None and not await _codebase_changed(
+            gh, repo_url, commit_sha, changed_paths
+        ):
+            logger.info(
+                f"No summarized files of {repo_url} changed since "
+                f"{previous.commit_sha}, reusing its documents"
+            )
+            await asyncio.to_thread(
+                cache.put_documents,
+                repo_url,
+                RepoDocuments(
+                    commit_sha,
+                    previous.business_summary,
+                    previous.technical_documentation,
+                ),
+            )
+            return (
+                previous.business_summary,
+                previous.technical_documentation,
+                {"changed_paths": len(changed_paths)},
+            )
+
+    codebase = await gh.get_codebase_from_url(
+        repo_url, commit_sha, on_stage, max_tokens=max_tokens
+    )
+    business_summary, technical_documentation = await summarize(
+        codebase, previous is not None
+    )
+    stats = {"changed_paths": None if changed_paths is None else len(changed_paths)}
+    await asyncio.to_thread(
+        cache.put_documents,
+        repo_url,
+        RepoDocuments(commit_sha, business_summary, technical_documentation),
+    )
+    return business_summary, technical_documentation, stats
+
+
+async def _codebase_changed(
+    gh: GithubClient, repo_url: str, commit_sha: str, changed_paths: list[str]
+) -> bool:
+    """Whether any of ``changed_paths`` is read into the codebase.
+
+    Paths are checked like archive extraction checks them, against the
+    repository's own rules at ``commit_sha``. A changed rule file can
+    bring back any file, so it counts as a change of the whole codebase.
+    """
+    if any(path.rpartition("/")[2] in RULE_FILES for path in changed_paths):
+        return True
+    paths = [path for path in changed_paths if is_valid_file(path)]
+    if not paths:
+        return False
+    rules = await gh.get_repo_rules_from_url(repo_url, commit_sha)
+    return rules is None or not all(rules.is_excluded(path) for path in paths)
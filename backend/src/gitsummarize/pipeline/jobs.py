@@ -0,0 +1,373 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from gitsummarize.cache.sqlite import open_database
+from gitsummarize.model.job import Job, JobStage, JobStatus
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 2
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 60
+POLL_INTERVAL = 5
+TIMEOUT_SECONDS = 30 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    repo_url TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_repo_url_idx ON jobs (repo_url, status);
+"""
+
+JobHandler = Callable[..., Awaitable[dict | None]]
+
+
+class JobStore:
+    """SQLite-backed job table.
+
+    Running jobs hold a lease that their worker keeps renewing. A job whose
+    lease has lapsed belonged to a worker that died, so it is handed out
+    again, which is how queued work survives restarts. Every method is one
+    short transaction, run by JobQueue through asyncio.to_thread.
+    """
+
+    def __init__(self, path: str | Path):
+        self._lock = threading.Lock()
+        self._conn = open_database(path, _SCHEMA)
+        self._conn.row_factory = sqlite3.Row
+
+    def enqueue(
+        self, repo_url: str, priority: int = 0, params: dict | None = None
+    ) -> tuple[Job, bool]:
+        """Queue a job for ``repo_url`` unless an active one already covers it.
+
+        A queued job for the repo absorbs the request: it takes the higher
+        priority, and params set by either side, e.g. ``force``, stay set. A
+        running job covers the request unless the request sets params the
+        job runs without, in which case a new job is queued. The lookup and
+        the write share one transaction, so concurrent calls, even from other
+        processes, can't queue the same repo twice. Returns (job, created).
+        """
+        params = params or {}
+        now = time.time()
+        with self._lock, self._conn:
+            # Take the write lock before reading, so no other writer can
+            # queue a job between the lookup and the insert
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE repo_url = ? AND status IN (?, ?) "
+                "ORDER BY created_at",
+                (repo_url, JobStatus.QUEUED, JobStatus.RUNNING),
+            ).fetchall()
+            queued = next(
+                (row for row in rows if row["status"] == JobStatus.QUEUED), None
+            )
+            if queued is not None:
+                row = self._conn.execute(
+                    "UPDATE jobs SET priority = MAX(priority, ?), params = ?, "
+                    "updated_at = ? WHERE id = ? RETURNING *",
+                    (
+                        priority,
+                        json.dumps(_merge_params(json.loads(queued["params"]), params)),
+                        now,
+                        queued["id"],
+                    ),
+                ).fetchone()
+                return self._to_job(row), False
+            for running in rows:
+                running_params = json.loads(running["params"])
+                if _merge_params(running_params, params) == running_params:
+                    return self._to_job(running), False
+
+            row = self._conn.execute(
+                "INSERT INTO jobs (id, repo_url, priority, status, stage, params, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) RETURNING *",
+                (
+                    uuid.uuid4().hex,
+                    repo_url,
+                    priority,
+                    JobStatus.QUEUED,
+                    JobStage.QUEUED,
+                    json.dumps(params),
+                    now,
+                    now,
+                ),
+            ).fetchone()
+        return self._to_job(row), True
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def claim(self, lease_seconds: float = LEASE_SECONDS) -> Job | None:
+        """Lease the highest-priority runnable job, or return None."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (
+                    JobStatus.FAILED,
+                    "Worker stopped too many times while running this job",
+                    now,
+                    JobStatus.RUNNING,
+                    now,
+                    MAX_ATTEMPTS,
+                ),
+            )
+            row = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, "
+                "lease_expires_at = ?, updated_at = ? WHERE id = ("
+                "  SELECT id FROM jobs"
+                "  WHERE status = ? OR (status = ? AND lease_expires_at < ?)"
+                "  ORDER BY priority DESC, created_at LIMIT 1"
+                ") RETURNING *",
+                (
+                    JobStatus.RUNNING,
+                    now + lease_seconds,
+                    now,
+                    JobStatus.QUEUED,
+                    JobStatus.RUNNING,
+                    now,
+                ),
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def renew(self, job: Job, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extend the lease of ``job``, returns False if it is no longer ours."""
+        return self._update_owned(job, lease_expires_at=time.time() + lease_seconds)
+
+    def set_stage(self, job: Job, stage: JobStage) -> bool:
+        return self._update_owned(job, stage=stage)
+
+    def complete(self, job: Job, result: dict | None) -> bool:
+        return self._update_owned(
+            job,
+            status=JobStatus.SUCCEEDED,
+            stage=JobStage.DONE,
+            result=json.dumps(result),
+            lease_expires_at=None,
+        )
+
+    def fail(self, job: Job, error: str) -> bool:
+        return self._update_owned(
+            job, status=JobStatus.FAILED, error=error, lease_expires_at=None
+        )
+
+    def release(self, job: Job) -> bool:
+        """Put a job back in the queue, e.g. when its worker shuts down."""
+        return self._update_owned(
+            job,
+            status=JobStatus.QUEUED,
+            stage=JobStage.QUEUED,
+            attempts=0,
+            lease_expires_at=None,
+        )
+
+    def count_by_status(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _update_owned(self, job: Job, **fields) -> bool:
+        """Update ``job`` if the worker that claimed it still holds the lease.
+
+        Every claim bumps ``attempts``, so it tells this worker's lease
+        apart from the one a later claim took after ours lapsed.
+        """
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (
+                    *fields.values(),
+                    time.time(),
+                    job.id,
+                    JobStatus.RUNNING,
+                    job.attempts,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def _to_job(self, row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            repo_url=row["repo_url"],
+            priority=row["priority"],
+            status=row["status"],
+            stage=row["stage"],
+            params=json.loads(row["params"]),
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+
+class JobQueue:
+    """A bounded pool of worker tasks draining a JobStore.
+
+    ``handler`` is called as ``handler(job, set_stage, **context)`` and its
+    return value is stored as the job result. ``context`` holds per-job values
+    that must not be persisted, such as user-supplied API keys; jobs resumed
+    after a restart run without it. A job still running after ``timeout``
+    seconds fails, and one whose lease was taken over by another worker is
+    stopped without touching the job.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: JobHandler,
+        concurrency: int = CONCURRENCY,
+        poll_interval: float = POLL_INTERVAL,
+        timeout: float | None = TIMEOUT_SECONDS,
+        lease_seconds: float = LEASE_SECONDS,
+    ):
+        self.store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.lease_seconds = lease_seconds
+        self._context: dict[str, dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self):
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await asyncio.to_thread(self.store.close)
+
+    async def enqueue(
+        self,
+        repo_url: str,
+        priority: int = 0,
+        params: dict | None = None,
+        context: dict[str, Any] | None = None,
+    ) -> Job:
+        """Queue a job, or return the active one that covers it, see JobStore.enqueue.
+
+        ``context`` is kept for a new job, and given to a queued one that
+        has none yet.
+        """
+        job, created = await asyncio.to_thread(
+            self.store.enqueue, repo_url, priority, params
+        )
+        if context and job.status == JobStatus.QUEUED:
+            self._context.setdefault(job.id, context)
+        if created:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Job | None:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def get_stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "jobs": await asyncio.to_thread(self.store.count_by_status),
+        }
+
+    async def _work(self):
+        while True:
+            # Clear before claiming so an enqueue racing the claim still wakes us
+            self._wakeup.clear()
+            job = await asyncio.to_thread(self.store.claim, self.lease_seconds)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        context = self._context.pop(job.id, {})
+        run = asyncio.create_task(self._call_handler(job, context))
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await asyncio.wait((run, heartbeat), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+            await asyncio.shield(asyncio.to_thread(self.store.release, job))
+            raise
+        finally:
+            heartbeat.cancel()
+            # Context given while the job was being claimed
+            self._context.pop(job.id, None)
+        if not run.done():
+            logger.warning(
+                f"Job {job.id} for {job.repo_url} lost its lease, stopping it"
+            )
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+
+    async def _call_handler(self, job: Job, context: dict[str, Any]):
+        async def set_stage(stage: JobStage):
+            await asyncio.to_thread(self.store.set_stage, job, stage)
+
+        try:
+            async with asyncio.timeout(self.timeout) as deadline:
+                result = await self.handler(job, set_stage, **context)
+        except Exception as e:
+            # Tell our deadline apart from timeouts raised inside the handler
+            error = (
+                f"Timed out after {self.timeout:g}s" if deadline.expired() else str(e)
+            )
+            logger.error(f"Job {job.id} for {job.repo_url} failed: {error}")
+            await asyncio.to_thread(self.store.fail, job, error)
+        else:
+            await asyncio.to_thread(self.store.complete, job, result)
+
+    async def _heartbeat(self, job: Job):
+        """Keep renewing the lease of ``job``, return once it is lost."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await asyncio.to_thread(self.store.renew, job, self.lease_seconds):
+                return
+
+
+def _merge_params(params: dict, other: dict) -> dict:
+    """Params of a job that also serves a request for ``other``."""
+    return {name: params.get(name) or other.get(name) for name in params.keys() | other}
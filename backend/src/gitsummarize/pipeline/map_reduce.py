@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+
+from gitsummarize.auth.key_manager import is_rate_limit_error
+from gitsummarize.cache.summary_cache import SummaryCache
+from gitsummarize.clients.ai_client_abc import AIBaseClient
+from gitsummarize.codebase.chunking import chunk_codebase
+from gitsummarize.codebase.format import Files
+from gitsummarize.codebase.packing import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+FAN_OUT = 16  # notes merged by each reduce call
+CONCURRENCY = 8  # model calls in flight
+REDUCE_TOKENS = 200_000  # notes the final documents are written from
+MAX_ATTEMPTS = 3
+RETRY_SECONDS = 5
+
+# Called for every model call, e.g. to spread them over a pool of keys
+ClientLease = Callable[[], AbstractAsyncContextManager[AIBaseClient]]
+
+
+async def summarize_codebase(
+    lease: ClientLease,
+    directory_structure: str,
+    codebase: Files,
+    cache: SummaryCache | None = None,
+    fan_out: int = FAN_OUT,
+    concurrency: int = CONCURRENCY,
+    reduce_tokens: int = REDUCE_TOKENS,
+) -> tuple[str, str, dict]:
+    """Return (business_summary, technical_documentation, stats) of any codebase.
+
+    Map: every directory-aligned chunk is summarized on its own, with the
+    client's cheaper map model, ``concurrency`` calls at a time. Reduce:
+    while the notes exceed ``reduce_tokens``, runs of ``fan_out`` neighbouring
+    notes are merged into one, so the number of levels grows with the log of
+    the repo size. The documents are then written from the remaining notes.
+
+    Each call leases its own client, so calls spread over every key of a
+    pool; rate limited calls are retried on another lease. Chunk notes are
+    read from and written to ``cache`` when one is given.
+    """
+    if fan_out < 2:
+        raise ValueError(f"fan_out must be at least 2, got {fan_out}")
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(method: str, *args):
+        async with semaphore:
+            return await _call_with_retries(lease, method, *args)
+
+    chunks = await asyncio.to_thread(chunk_codebase, codebase)
+    summaries = {}
+    if cache is not None:
+        summaries = await asyncio.to_thread(
+            cache.get_chunk_summaries, [chunk.key for chunk in chunks]
+        )
+    missing = [chunk for chunk in chunks if chunk.key not in summaries]
+    texts = await asyncio.gather(
+        *(call("summarize_chunk", chunk.path, chunk.content) for chunk in missing)
+    )
+    new_summaries = {
+        chunk.key: text for chunk, text in zip(missing, texts, strict=True)
+    }
+    if cache is not None:
+        await asyncio.to_thread(cache.put_chunk_summaries, new_summaries)
+    summaries.update(new_summaries)
+
+    # (first path, last path, notes) of each run of chunks, in path order
+    notes = [(chunk.path, chunk.path, summaries[chunk.key]) for chunk in chunks]
+    levels = 0
+    while (
+        len(notes) > 1
+        and sum(estimate_tokens(text) for *_, text in notes) > reduce_tokens
+    ):
+        notes = await asyncio.gather(
+            *(
+                _merge(call, notes[i : i + fan_out])
+                for i in range(0, len(notes), fan_out)
+            )
+        )
+        levels += 1
+
+    business_summary, technical_documentation = await call(
+        "get_documentation_from_summaries",
+        directory_structure,
+        {_label(first, last): text for first, last, text in notes},
+    )
+    stats = {
+        "chunks": len(chunks),
+        "resummarized": len(missing),
+        "reused": len(chunks) - len(missing),
+        "reduce_levels": levels,
+        "seconds": time.perf_counter() - started,
+    }
+    logger.info(
+        f"Map-reduced {len(chunks)} chunks ({len(missing)} summarized) over "
+        f"{levels} reduce levels in {stats['seconds']:.1f}s"
+    )
+    return business_summary, technical_documentation, stats
+
+
+async def _merge(
+    call: Callable, group: list[tuple[str, str, str]]
+) -> tuple[str, str, str]:
+    if len(group) == 1:
+        return group[0]
+    first, last = group[0][0], group[-1][1]
+    text = await call(
+        "merge_summaries",
+        _label(first, last),
+        {_label(a, b): text for a, b, text in group},
+    )
+    return first, last, text
+
+
+async def _call_with_retries(lease: ClientLease, method: str, *args):
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            async with lease() as client:
+                return await getattr(client, method)(*args)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = RETRY_SECONDS * 2**attempt
+            logger.warning(f"{method} was rate limited, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+
+
+def _label(first: str, last: str) -> str:
+    return first if first == last else f"{first} … {last}"
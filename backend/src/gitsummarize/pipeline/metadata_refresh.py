@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterable, AsyncIterator
+
+from gitsummarize.clients.github import GRAPHQL_BATCH_SIZE, GithubClient
+from gitsummarize.clients.supabase import AsyncSupabaseClient
+from gitsummarize.exceptions.exceptions import GitHubAccessError, GitHubRateLimitError
+from gitsummarize.model.repo_metadata import RepoMetadata
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 4  # batches in flight
+MAX_ATTEMPTS = 3  # GraphQL queries per batch while rate limited
+RETRY_SECONDS = 60
+
+
+async def refresh_repo_metadata(
+    gh: GithubClient,
+    supabase: AsyncSupabaseClient,
+    repo_urls: AsyncIterable[str],
+    batch_size: int = GRAPHQL_BATCH_SIZE,
+    concurrency: int = CONCURRENCY,
+) -> dict:
+    """Refresh stored repo metadata in batches and return throughput stats.
+
+    Each batch is one GraphQL query and one multi-row upsert of the repos
+    whose metadata changed. A rate limited query is retried after a backoff,
+    since per repo requests would only spend the same tokens 100 times
+    faster. Batches fall back to conditional REST requests per repo if the
+    query fails otherwise, or if no token of the pool can query.
+    ``repo_urls`` is consumed lazily, one batch at a time.
+    """
+    started = time.perf_counter()
+    stats = Counter()
+    # Shared by the workers, so each batch is taken by exactly one of them
+    batches = _batched(repo_urls, batch_size)
+    batches_lock = asyncio.Lock()
+
+    async def next_batch() -> tuple[str, ...] | None:
+        # Async generators can't be advanced by two tasks at once
+        async with batches_lock:
+            return await anext(batches, None)
+
+    async def refresh_batch(batch: tuple[str, ...]):
+        metadata = None
+        # GraphQL needs a token, any token of the pool will do
+        if any(gh.rate_limiter.tokens):
+            metadata = await _get_changed_metadata_batch(gh, batch)
+        if metadata is None:
+            metadata = await _get_changed_metadata_per_repo(gh, batch)
+
+        changed = {url: value for url, value in metadata.items() if value is not None}
+        await supabase.upsert_repo_metadata_batch(changed)
+        await gh.commit_repo_metadata(metadata)
+        stats["repos"] += len(batch)
+        stats["updated"] += len(changed)
+        stats["unchanged"] += len(metadata) - len(changed)
+        stats["failed"] += len(batch) - len(metadata)
+
+    async def work():
+        while (batch := await next_batch()) is not None:
+            try:
+                await refresh_batch(batch)
+            except Exception as e:
+                logger.error(f"Error refreshing metadata of {len(batch)} repos: {e}")
+                stats["repos"] += len(batch)
+                stats["failed"] += len(batch)
+
+    await asyncio.gather(*(work() for _ in range(concurrency)))
+
+    seconds = time.perf_counter() - started
+    result = {
+        **{key: stats[key] for key in ("repos", "updated", "unchanged", "failed")},
+        "seconds": seconds,
+        "repos_per_second": stats["repos"] / seconds if seconds else 0.0,
+    }
+    logger.info(
+        f"Refreshed metadata of {result['repos']} repos in {seconds:.1f}s "
+        f"({result['repos_per_second']:.1f} repos/s): {result['updated']} updated, "
+        f"{result['unchanged']} unchanged, {result['failed']} failed"
+    )
+    return result
+
+
+async def _batched(
+    items: AsyncIterable[str], size: int
+) -> AsyncIterator[tuple[str, ...]]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield tuple(batch)
+            batch = []
+    if batch:
+        yield tuple(batch)
+
+
+async def _get_changed_metadata_batch(
+    gh: GithubClient, repo_urls: tuple[str, ...]
+) -> dict[str, RepoMetadata | None] | None:
+    """Query a batch, or return None if it should be fetched per repo."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return await gh.get_changed_repo_metadata_batch_from_urls(list(repo_urls))
+        except GitHubRateLimitError:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = RETRY_SECONDS * 2**attempt
+            logger.warning(f"Metadata batch query rate limited, retrying in {delay}s")
+            await asyncio.sleep(delay)
+        except GitHubAccessError as e:
+            logger.warning(f"Metadata batch query failed, going per repo: {e}")
+            return None
+
+
+async def _get_changed_metadata_per_repo(
+    gh: GithubClient, repo_urls: tuple[str, ...]
+) -> dict[str, RepoMetadata | None]:
+    metadata = {}
+    for repo_url in repo_urls:
+        try:
+            metadata[repo_url] = await gh.get_changed_repo_metadata_from_url(repo_url)
+        except GitHubAccessError as e:
+            logger.error(f"Error updating repo metadata for {repo_url}: {e}")
+    return metadata
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    depends_on: tuple[str, ...] = ()
+
+
+class StageScheduler:
+    """Run a small graph of async stages, overlapping independent ones.
+
+    Each stage starts as soon as the stages it depends on have finished and
+    receives their results as positional arguments, in ``depends_on`` order.
+    Stages must be added after their dependencies, which keeps the graph
+    acyclic by construction. If any stage fails, the rest are cancelled and
+    the original exception is raised.
+    """
+
+    def __init__(self):
+        self._stages: dict[str, Stage] = {}
+        self.timings: dict[str, float] = {}
+
+    def add(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        depends_on: tuple[str, ...] = (),
+    ):
+        if name in self._stages:
+            raise ValueError(f"Stage {name} is already defined")
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+        self._stages[name] = Stage(name, func, depends_on)
+
+    async def run(self) -> dict[str, Any]:
+        """Run every stage and return their results keyed by stage name."""
+        started = time.perf_counter()
+        tasks: dict[str, asyncio.Task] = {}
+        for stage in self._stages.values():
+            dependencies = [tasks[name] for name in stage.depends_on]
+            tasks[stage.name] = asyncio.create_task(
+                self._run_stage(stage, dependencies), name=stage.name
+            )
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # Let cancelled stages unwind before the error propagates
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.timings["total"] = time.perf_counter() - started
+
+        timings = ", ".join(f"{k}={v:.2f}s" for k, v in self.timings.items())
+        logger.info(f"Stage timings: {timings}")
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def _run_stage(self, stage: Stage, dependencies: list[asyncio.Task]) -> Any:
+        results = [await task for task in dependencies]
+        started = time.perf_counter()
+        try:
+            return await stage.func(*results)
+        finally:
+            self.timings[stage.name] = time.perf_counter() - started
@@ -1,4 +1,6 @@
-BUSINESS_SUMMARY_PROMPT = """
+from gitsummarize.prompts.codebase_context import CODEBASE_CONTEXT_PROMPT
+
+BUSINESS_SUMMARY_INSTRUCTIONS = """
 You are a distinguished software architect reviewing the business logic layer of this codebase. Your goal is to produce a clear, structured, and high-level documentation of the business logic implemented in the provided files.
 
 Focus on **what the code does for the product or business**, not just how it works technically.
@@ -42,15 +44,6 @@ Please generate a structured design document with the following format:
 Use concise, structured language. Think like a staff engineer writing for a new team member trying to understand how this part of the app maps to real product behavior.
 IMPORTANT: Please use the ## heading accurately. I will use it to divide the documentation into high level component sections, these headings should be business specific behaviors only.
 IMPORTANT: Just output the documentation in markdown format, no other text.
+"""
 
----
-Here is the directory structure of the codebase:
-
-{directory_structure}
-
----
-
-Here is the codebase:
-
-{codebase}
-"""
\ No newline at end of file
+BUSINESS_SUMMARY_PROMPT = CODEBASE_CONTEXT_PROMPT + BUSINESS_SUMMARY_INSTRUCTIONS
@@ -0,0 +1,44 @@
+CHUNK_SUMMARY_PROMPT = """
+You are a distinguished software architect reading one part of a larger codebase. Your notes on it will later be combined with notes on every other part to write the business and technical documentation of the whole repository, without the code itself.
+
+The files below are from `{path}`. Write dense, factual notes covering:
+
+1. **Purpose** - what this part of the codebase is for and where it sits in the system.
+2. **Components** - the important modules, classes and functions, with one line on what each does. Use their exact names.
+3. **Business logic** - rules, workflows, constraints and domain concepts implemented here.
+4. **Interfaces** - public APIs, endpoints, CLI commands, events, data models and configuration it exposes or reads.
+5. **Dependencies** - other parts of the codebase, external services and libraries it relies on.
+6. **Notable details** - error handling, performance, security or concurrency concerns worth documenting.
+
+Only describe what is in the files. Prefer lists over prose and skip sections that don't apply.
+
+---
+
+{content}
+"""
+
+MERGE_SUMMARIES_PROMPT = """
+You are a distinguished software architect. Below are notes on several neighbouring parts of a larger codebase, written by engineers who read the code. Your merged notes will later be combined with notes on the rest of the codebase to write its business and technical documentation.
+
+Merge the notes below into a single set of notes covering all of `{path}`. Keep the same sections: purpose, components, business logic, interfaces, dependencies and notable details. Keep exact names of modules, classes, functions, endpoints and configuration, drop repetition, and note how the parts relate to each other. Be dense and factual, and only describe what is in the notes.
+
+---
+
+{summaries}
+"""
+
+# Takes the place of CODEBASE_CONTEXT_PROMPT when the documents are written
+# from per-directory notes instead of the code
+CODEBASE_SUMMARIES_CONTEXT_PROMPT = """
+Here is the directory structure of the codebase:
+
+{directory_structure}
+
+---
+
+Instead of the full code, here are notes on each of its directories, written by engineers who read the code:
+
+{summaries}
+
+---
+"""
@@ -0,0 +1,15 @@
+# Shared by every documentation prompt and placed first, so the two documents
+# generated for a repo start with an identical, cacheable prefix
+CODEBASE_CONTEXT_PROMPT = """
+Here is the directory structure of the codebase:
+
+{directory_structure}
+
+---
+
+Here is the codebase:
+
+{codebase}
+
+---
+"""
@@ -1,4 +1,6 @@
-TECHNICAL_DOCUMENTATION_PROMPT = """
+from gitsummarize.prompts.codebase_context import CODEBASE_CONTEXT_PROMPT
+
+TECHNICAL_DOCUMENTATION_INSTRUCTIONS = """
 You are a distinguished software architect and expert technical writer. You specialize in deeply understanding codebases and producing high-quality technical documentation that is both comprehensive and easy to follow.
 
 Your role is to analyze the given code or repository and generate clear, well-structured documentation. This may include:
@@ -23,16 +25,6 @@ Your output should be production-quality documentation suitable for internal eng
 
 IMPORTANT: Please use the ## heading accurately. I will use it to divide the documentation into high level component sections.
 IMPORTANT: Just output the documentation in markdown format, no other text.
+"""
 
----
-
-Here is the directory structure of the codebase:
-
-{directory_structure}
-
----
-
-Here is the codebase:
-
-{codebase}
-"""
\ No newline at end of file
+TECHNICAL_DOCUMENTATION_PROMPT = CODEBASE_CONTEXT_PROMPT + TECHNICAL_DOCUMENTATION_INSTRUCTIONS
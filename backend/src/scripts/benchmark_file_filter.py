@@ -0,0 +1,129 @@
+import random
+import time
+
+from gitsummarize.codebase.file_filter import FileMatcher, RepoRules
+from gitsummarize.constants.constants import VALID_FILE_EXTENSIONS
+
+NUM_PATHS = 500_000
+REPEATS = 5  # runs of each benchmark, the fastest is reported
+NUM_DIRECTORIES = 25_000
+EXTRA_PATTERNS = 2_000
+EXTENSIONS = [
+    ".py",
+    ".ts",
+    ".tsx",
+    ".go",
+    ".rs",
+    ".c",
+    ".h",
+    ".java",
+    ".md",
+    ".json",
+    ".yaml",
+    ".png",
+    ".jpg",
+    ".so",
+    ".o",
+    ".db",
+    ".lock",
+    ".min.js",
+    ".txt",
+    "",
+]
+DIRECTORIES = [
+    "src",
+    "lib",
+    "pkg",
+    "internal",
+    "docs",
+    "tests",
+    "vendor",
+    "third_party",
+    "node_modules",
+    "build",
+    "gen",
+    "api",
+    "cmd",
+    "tools",
+    "scripts",
+    ".github",
+]
+GITIGNORE = """
+build/
+dist/
+*.o
+*.log
+!important.log
+__pycache__/
+/coverage
+"""
+GITATTRIBUTES = """
+vendor/** linguist-vendored
+third_party/** linguist-vendored
+node_modules/** linguist-vendored
+gen/** linguist-generated
+*.pb.go linguist-generated
+"""
+
+
+def synthetic_paths(
+    num_paths: int, num_directories: int = NUM_DIRECTORIES, seed: int = 0
+) -> list[str]:
+    """Random file paths over a random tree, about 20 files per directory."""
+    rng = random.Random(seed)
+    directories = [""]
+    for i in range(num_directories):
+        parent = rng.choice(directories)
+        name = rng.choice(DIRECTORIES) if rng.random() < 0.3 else f"dir_{i}"
+        directories.append(f"{parent}/{name}" if parent else name)
+    return [
+        f"{rng.choice(directories)}/file_{i}{rng.choice(EXTENSIONS)}".lstrip("/")
+        for i in range(num_paths)
+    ]
+
+
+def benchmark(name: str, select, paths: list[str], repeats: int = REPEATS) -> float:
+    # A single run is at the mercy of the allocator and other processes
+    seconds = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        selected = sum(1 for path in paths if select(path))
+        seconds = min(seconds, time.perf_counter() - started)
+    print(
+        f"{name:<28} {seconds:6.2f}s  {len(paths) / seconds:>12,.0f} paths/s  "
+        f"{selected:>8,} selected"
+    )
+    return seconds
+
+
+def main():
+    paths = synthetic_paths(NUM_PATHS)
+    print(f"{len(paths):,} synthetic paths\n")
+
+    # The tuple scan grows with the pattern list, the compiled matcher doesn't
+    many_patterns = VALID_FILE_EXTENSIONS + tuple(
+        f".ext{i}" for i in range(EXTRA_PATTERNS)
+    )
+    for patterns in (VALID_FILE_EXTENSIONS, many_patterns):
+        print(f"{len(patterns):,} patterns")
+        baseline = benchmark(
+            "endswith(tuple)",
+            lambda path, patterns=patterns: path.endswith(patterns),
+            paths,
+        )
+        compiled = benchmark("FileMatcher", FileMatcher(patterns).matches, paths)
+        print(f"FileMatcher takes {compiled / baseline:.2f}x the time\n")
+
+    matcher = FileMatcher()
+    rules = RepoRules.from_files(
+        {".gitignore": GITIGNORE, ".gitattributes": GITATTRIBUTES}
+    )
+    benchmark(
+        "FileMatcher + RepoRules",
+        lambda path: matcher.matches(path) and not rules.is_excluded(path),
+        paths,
+    )
+
+
+if __name__ == "__main__":
+    main()
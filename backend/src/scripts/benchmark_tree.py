@@ -0,0 +1,67 @@
+import random
+import time
+
+from gitsummarize.codebase.tree import MAX_ENTRIES, render_tree
+
+SIZES = [100_000, 200_000, 400_000, 800_000]
+FILES_PER_DIRECTORY = 20
+EXTENSIONS = [".c", ".c", ".c", ".h", ".h", ".S", ".rst", ".yaml", ".py", ""]
+MAX_DEPTH = 4
+
+
+def synthetic_entries(
+    num_files: int, files_per_directory: int = FILES_PER_DIRECTORY, seed: int = 0
+) -> list[tuple[str, bool]]:
+    """(path, is_directory) of a random kernel-like tree, listed like the API.
+
+    Most directories hold a few files, a few hold thousands, like drivers/
+    or arch/ headers.
+    """
+    rng = random.Random(seed)
+    directories = [""]
+    for i in range(num_files // files_per_directory):
+        parent = rng.choice(directories)
+        directories.append(f"{parent}/dir_{i}" if parent else f"dir_{i}")
+    # A handful of huge homogeneous directories
+    weights = [1000 if i % 500 == 1 else 1 for i in range(len(directories))]
+    files = [
+        f"{directory}/file_{i}{rng.choice(EXTENSIONS)}".lstrip("/")
+        for i, directory in enumerate(
+            rng.choices(directories, weights=weights, k=num_files)
+        )
+    ]
+    return sorted(
+        [(directory, True) for directory in directories if directory]
+        + [(path, False) for path in files]
+    )
+
+
+def benchmark(name: str, entries: list[tuple[str, bool]], **limits) -> float:
+    started = time.perf_counter()
+    tree = render_tree(entries, **limits)
+    seconds = time.perf_counter() - started
+    print(
+        f"{name:<24} {seconds:6.2f}s  {len(entries) / seconds:>10,.0f} entries/s  "
+        f"{tree.count(chr(10)) + 1:>9,} lines  {len(tree):>12,} chars"
+    )
+    return seconds
+
+
+def main():
+    # Constant entries/s as the tree doubles shows the renderer is linear
+    for size in SIZES:
+        entries = synthetic_entries(size)
+        print(f"{size:,} files, {len(entries) - size:,} directories")
+        benchmark("unlimited", entries, max_depth=None, max_entries=None)
+        benchmark(f"max_entries={MAX_ENTRIES}", entries, max_entries=MAX_ENTRIES)
+        benchmark(
+            f"+ max_depth={MAX_DEPTH}",
+            entries,
+            max_depth=MAX_DEPTH,
+            max_entries=MAX_ENTRIES,
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,12 @@ openai_client = OpenAIClient(os.getenv("OPENAI_API_KEY"))
 
 
 async def main():
-    gh = GithubClient(os.getenv("GITHUB_TOKEN"))
-    # Get up to 500 popular repositories
-    repos = await gh.get_popular_repos(num_repos=1000)    
+    async with GithubClient(
+        os.getenv("GITHUB_TOKEN"),
+        extra_tokens=[t for t in os.getenv("GITHUB_EXTRA_TOKENS", "").split(",") if t],
+    ) as gh:
+        # Get up to 500 popular repositories
+        repos = await gh.get_popular_repos(num_repos=1000)
     non_resource_repos = await filter_resource_repos(repos)
     print(non_resource_repos)
 
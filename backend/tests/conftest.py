@@ -0,0 +1,68 @@
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+
+import pytest
+
+from gitsummarize.clients.github import GithubClient
+
+
+class FakeResponse:
+    """The parts of an aiohttp response that GithubClient reads."""
+
+    def __init__(
+        self,
+        status: int = 200,
+        data: dict | None = None,
+        headers: dict[str, str] | None = None,
+        chunks: list[bytes] | None = None,
+        content_length: int | None = None,
+    ):
+        self.status = status
+        self.headers = headers or {}
+        self.content_length = content_length
+        self.content = self
+        self._data = data
+        self._chunks = chunks or []
+
+    async def json(self):
+        return self._data
+
+    async def iter_chunked(self, size: int):
+        for chunk in self._chunks:
+            yield chunk
+
+
+@pytest.fixture
+async def fake_github():
+    """Make GithubClients that are closed after the test.
+
+    With ``responses``, GET requests are answered without the network, from
+    a list in order or by a function of the URL, and recorded as (url,
+    headers) in ``client.requests``. Other arguments go to GithubClient.
+    """
+    clients = []
+
+    def make(
+        responses: list[FakeResponse] | Callable[[str], FakeResponse] | None = None,
+        token: str | None = None,
+        **kwargs,
+    ) -> GithubClient:
+        client = GithubClient(token, **kwargs)
+        client.requests = []
+        if responses is not None:
+
+            @asynccontextmanager
+            async def get(url, headers=None, resource=None):
+                client.requests.append((url, headers))
+                if callable(responses):
+                    yield responses(url)
+                else:
+                    yield responses.pop(0)
+
+            client._get = get
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        await client.close()
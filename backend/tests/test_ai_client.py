@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from gitsummarize.clients.ai_client_abc import AIBaseClient
+
+
+class FakeClient(AIBaseClient):
+    async def get_business_summary(self, directory_structure, codebase):
+        return "business"
+
+    async def get_technical_documentation(self, directory_structure, codebase):
+        return "technical"
+
+    async def complete(self, prompt, model=None):
+        return prompt
+
+
+async def stream(*steps):
+    """Yield strings, waiting on events and raising exceptions along the way."""
+    for step in steps:
+        if isinstance(step, asyncio.Event):
+            await step.wait()
+        elif isinstance(step, Exception):
+            raise step
+        else:
+            yield step
+
+
+async def test_streams_are_interleaved_as_chunks_arrive():
+    business_started, technical_started = asyncio.Event(), asyncio.Event()
+    streams = {
+        "business_summary": stream("b1", technical_started, "b2"),
+        "technical_documentation": stream(business_started, "t1", "t2"),
+    }
+    chunks = []
+
+    async for name, chunk in FakeClient()._merge_streams(streams):
+        chunks.append((name, chunk))
+        business_started.set()
+        if chunk == "t1":
+            technical_started.set()
+
+    assert chunks[:2] == [("business_summary", "b1"), ("technical_documentation", "t1")]
+    assert sorted(chunks[2:]) == [
+        ("business_summary", "b2"),
+        ("technical_documentation", "t2"),
+    ]
+
+
+async def test_a_failing_stream_raises_after_earlier_chunks_and_stops_the_rest():
+    never = asyncio.Event()
+    streams = {
+        "business_summary": stream("b1", ValueError("quota exceeded")),
+        "technical_documentation": stream(never, "t1"),
+    }
+    chunks = []
+
+    with pytest.raises(ValueError, match="quota exceeded"):
+        async for name, chunk in FakeClient()._merge_streams(streams):
+            chunks.append((name, chunk))
+
+    assert chunks == [("business_summary", "b1")]
+    # The other stream's task was cancelled rather than left waiting
+    assert len(asyncio.all_tasks()) == 1
+
+
+async def test_clients_that_cannot_stream_yield_whole_documents():
+    documents = [
+        document async for document in FakeClient().stream_documentation("tree", [])
+    ]
+
+    assert documents == [
+        ("business_summary", "business"),
+        ("technical_documentation", "technical"),
+    ]
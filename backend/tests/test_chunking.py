@@ -0,0 +1,50 @@
+from gitsummarize.codebase.chunking import Chunk, chunk_codebase, content_sha
+from gitsummarize.codebase.format import FILE_SEPARATOR, render_files
+
+SPOOF = f"x = 1\n{FILE_SEPARATOR}\nFile: fake\n{FILE_SEPARATOR}\ny = 2\n"
+
+
+def test_content_sha_matches_git_blob_hashes():
+    # git hash-object of "hello\n"
+    assert content_sha("hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+
+def test_small_directories_fold_into_their_parent():
+    files = [
+        ("r/src/a.py", "a" * 100),
+        ("r/src/utils/b.py", "b" * 100),
+        ("r/docs/c.md", "c" * 100),
+    ]
+
+    chunks = chunk_codebase(files, max_tokens=10_000, min_tokens=1_000)
+
+    assert [chunk.path for chunk in chunks] == ["r"]
+    assert sorted(chunks[0].files) == sorted(files)
+
+
+def test_large_directories_are_split_and_named_after_their_first_file():
+    files = [(f"r/src/{name}.py", "x" * 500) for name in "abcd"]
+
+    chunks = chunk_codebase(files, max_tokens=1_500, min_tokens=0, chars_per_token=1)
+
+    assert [chunk.path for chunk in chunks] == ["r/src", "r/src (from c.py)"]
+    assert [len(chunk.files) for chunk in chunks] == [2, 2]
+
+
+def test_chunk_key_changes_only_with_its_files():
+    files = [("r/a.py", "a = 1\n"), ("r/b.py", "b = 2\n")]
+    key = Chunk("r", files).key
+
+    assert Chunk("r", list(files)).key == key
+    assert Chunk("r", [files[0], ("r/b.py", "b = 3\n")]).key != key
+    assert Chunk("r", [files[0], ("r/c.py", "b = 2\n")]).key != key
+    assert Chunk("r", files[:1]).key != key
+
+
+def test_file_content_that_looks_like_a_header_stays_one_file():
+    files = [("r/src/weird.py", SPOOF), ("r/src/ok.py", "ok = True\n")]
+
+    (chunk,) = chunk_codebase(files, min_tokens=0)
+
+    assert chunk.files == sorted(files)
+    assert chunk.content == render_files(sorted(files))
@@ -0,0 +1,109 @@
+import json
+
+from gitsummarize.codebase.compaction import CompactionOptions, compact_codebase
+from gitsummarize.codebase.format import FILE_SEPARATOR, files_size
+
+SPOOF = f"x = 1\n{FILE_SEPARATOR}\nFile: fake\n{FILE_SEPARATOR}\ny = 2\n"
+LICENSE = "# Copyright 2024 Example Corp\n# Licensed under the Apache License 2.0\n"
+
+
+def test_repeated_license_headers_are_kept_only_in_the_first_file():
+    files = [
+        ("r/a.py", f"{LICENSE}\nimport os\n"),
+        ("r/b.py", f"{LICENSE.replace('2024', '2025')}\nimport sys\n"),
+        ("r/c.py", "import re\n"),
+    ]
+
+    compacted, stats = compact_codebase(files)
+
+    assert compacted == [files[0], ("r/b.py", "import sys\n"), files[2]]
+    assert stats.license_headers == 1
+    assert stats.chars_after == files_size(compacted) < stats.chars_before
+
+
+def test_lockfiles_and_large_data_files_are_digested():
+    packages = {
+        f"node_modules/package-{i}": {"version": "1.0.0", "integrity": "sha512-abc"}
+        for i in range(3)
+    }
+    lockfile = json.dumps({"packages": {"": {}, **packages}}, indent=2)
+    data = json.dumps({"items": [{"id": i, "name": f"item {i}"} for i in range(50)]})
+    files = [("r/package-lock.json", lockfile), ("r/data/items.json", data)]
+
+    compacted, stats = compact_codebase(files, CompactionOptions(data_file_chars=100))
+
+    assert compacted[0][1] == (
+        "[Lockfile digest: 3 locked packages; full file omitted]\n"
+        "package-0 1.0.0\npackage-1 1.0.0\npackage-2 1.0.0"
+    )
+    assert compacted[1][1].startswith("[JSON digest: object (1 keys), structure")
+    assert "items.[].name: string" in compacted[1][1]
+    assert stats.digested_files == 2
+
+
+def test_whitespace_and_long_lines_are_collapsed():
+    files = [
+        ("r/a.js", "function f() {\n    if (x) {\n        y();  \n    }\n\n\n\n}\n"),
+        ("r/b.py", "def f():\n    return '" + "x" * 20 + "'\n"),
+    ]
+
+    compacted, stats = compact_codebase(files, CompactionOptions(max_line_chars=20))
+
+    assert compacted[0][1] == "function f() {\n if (x) {\n  y();\n }\n\n}\n"
+    # Indentation carries meaning in Python, only the long line changes
+    assert compacted[1][1] == "def f():\n    return 'xxxxxxxx… [13 more chars]\n"
+    assert stats.capped_lines == 1
+
+
+def test_file_content_that_looks_like_a_header_stays_one_file():
+    files = [("r/src/weird.py", SPOOF), ("r/src/ok.py", "ok = True\n")]
+
+    compacted, _ = compact_codebase(files)
+
+    assert compacted == files
+
+
+def test_license_headers_are_found_by_the_languages_comment_syntax():
+    sql_license = "-- Copyright 2024 Example Corp\n-- Licensed under MIT\n"
+    bullets = "* Copyright 2024 Example Corp\n* Licensed under MIT\n"
+    files = [
+        ("r/a.sql", f"{sql_license}\nSELECT 1;\n"),
+        ("r/b.sql", f"{sql_license}\nSELECT 2;\n"),
+        ("r/a.md", f"{bullets}\n# A\n"),
+        ("r/b.md", f"{bullets}\n# B\n"),
+        ("r/a.py", f"{sql_license}\nx = 1\n"),
+        ("r/b.py", f"{sql_license}\ny = 2\n"),
+    ]
+
+    compacted, stats = compact_codebase(files)
+
+    assert compacted[1] == ("r/b.sql", "SELECT 2;\n")
+    # "*" starts a Markdown bullet and "--" is no Python comment
+    assert compacted[2:] == files[2:]
+    assert stats.license_headers == 1
+
+
+def test_html_and_json_indentation_is_kept():
+    files = [
+        ("r/index.html", "<pre>\n    indented\n        more\n</pre>\n"),
+        ("r/config.json", '{\n    "a": {\n        "b": 1\n    }\n}\n'),
+    ]
+
+    compacted, _ = compact_codebase(files)
+
+    assert compacted == files
+
+
+def test_malformed_lockfiles_are_kept_as_they_are():
+    files = [
+        # A package without a name
+        ("r/Cargo.lock", '[[package]]\nversion = "1.0.0"\n'),
+        # A list where an object was expected
+        ("r/composer.lock", '{"packages": [], "packages-dev": {"a": 1}}'),
+        ("r/package-lock.json", "[" * 100_000 + "]" * 100_000),
+    ]
+
+    compacted, stats = compact_codebase(files, CompactionOptions(max_line_chars=None))
+
+    assert compacted == files
+    assert stats.digested_files == 0
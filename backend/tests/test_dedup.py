@@ -0,0 +1,78 @@
+from gitsummarize.codebase.dedup import _diff, dedupe_codebase
+from gitsummarize.codebase.format import FILE_SEPARATOR
+
+SPOOF = f"x = 1\n{FILE_SEPARATOR}\nFile: fake\n{FILE_SEPARATOR}\ny = 2\n"
+
+
+def module(name: str, lines: int = 60) -> str:
+    return "".join(
+        f"def {name}_{i}(value):\n    return value * {i}\n" for i in range(lines)
+    )
+
+
+def test_identical_copies_are_kept_once_at_their_first_path():
+    files = [("r/a.py", "x = 1\n"), ("r/b.py", "y = 2\n"), ("r/c.py", "x = 1\n")]
+
+    deduped, stats = dedupe_codebase(files)
+
+    assert deduped == [
+        ("r/a.py", "[Identical copies: r/c.py]\nx = 1\n"),
+        ("r/b.py", "y = 2\n"),
+    ]
+    assert stats.files == 3
+    assert stats.duplicate_files == 1
+    assert stats.bytes_saved > 0
+
+
+def test_near_duplicates_are_replaced_by_a_diff():
+    original = module("f")
+    edited = original.replace("return value * 7\n", "return value * 70\n")
+    files = [("r/a.py", original), ("r/b.py", edited), ("r/c.py", module("g", 5))]
+
+    deduped, stats = dedupe_codebase(files)
+
+    assert deduped[0] == files[0]
+    assert deduped[1] == (
+        "r/b.py",
+        "[Near-duplicate of r/a.py, differences:]\n"
+        "@@ -16 +16 @@\n-    return value * 7\n+    return value * 70\n",
+    )
+    assert deduped[2] == files[2]
+    assert stats.near_duplicate_files == 1
+
+
+def test_near_duplicates_can_be_turned_off():
+    original = module("f")
+    files = [("r/a.py", original), ("r/b.py", original + "# end\n")]
+
+    deduped, stats = dedupe_codebase(files, near_duplicates=False)
+
+    assert deduped == files
+    assert stats.near_duplicate_files == 0
+
+
+def test_diff_marks_a_missing_newline_at_the_end():
+    diff = _diff("x = 1\nreturn 200\n", "x = 1\nreturn 299")
+
+    assert diff == (
+        "@@ -2 +2 @@\n-return 200\n+return 299\n\\ No newline at end of file\n"
+    )
+    # Both sides end without a newline: each removed or added line still
+    # ends up on its own line
+    assert _diff("return 200", "return 299") == (
+        "@@ -1 +1 @@\n"
+        "-return 200\n"
+        "\\ No newline at end of file\n"
+        "+return 299\n"
+        "\\ No newline at end of file\n"
+    )
+
+
+def test_file_content_that_looks_like_a_header_stays_one_file():
+    files = [("r/src/weird.py", SPOOF), ("r/src/copy.py", SPOOF)]
+
+    deduped, _ = dedupe_codebase(files)
+
+    assert deduped == [
+        ("r/src/weird.py", f"[Identical copies: r/src/copy.py]\n{SPOOF}")
+    ]
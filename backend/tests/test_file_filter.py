@@ -0,0 +1,89 @@
+import pytest
+
+from gitsummarize.codebase.file_filter import FileMatcher, RepoRules, is_binary
+
+PATTERNS = (
+    ".py",
+    ".lock.json",
+    "*.md",
+    "Dockerfile",
+    ".env.*",
+    "docs/*",
+    ".circleci/config.yml",
+)
+
+
+@pytest.mark.parametrize(
+    "path, selected",
+    [
+        ("src/app.py", True),
+        ("src/APP.PY", True),
+        ("src/app.pyc", False),
+        ("deps.lock.json", True),
+        ("deps.json", False),
+        ("docs/guide.MD", True),
+        ("build/Dockerfile", True),
+        ("Dockerfile.dev", False),
+        ("config/.env.local", True),
+        ("src.py/binary", False),
+        # Directory globs only add files without an extension
+        ("docs/Makefile", True),
+        ("docs/api/.nojekyll", True),
+        ("docs/logo.png", False),
+        ("src/docs/Makefile", False),
+        (".circleci/config.yml", True),
+        ("other/.circleci/config.yml", False),
+    ],
+)
+def test_file_matcher(path, selected):
+    assert FileMatcher(PATTERNS).matches(path) is selected
+
+
+def test_default_patterns_leave_binaries_in_globbed_directories_out():
+    matcher = FileMatcher()
+
+    assert matcher.matches("docs/index.rst")
+    assert not matcher.matches("docs/diagram.png")
+    assert not matcher.matches(".vscode/ipch/cache.db")
+    assert not matcher.matches(".idea/icon.so")
+
+
+def test_gitignore_rules():
+    rules = RepoRules()
+    rules.add_gitignore("build/\n*.log\n!keep.log\n/coverage\n# comment\n")
+    rules.add_gitignore("*.tmp\n", "pkg")
+
+    assert rules.is_excluded("build/out.py")
+    assert rules.is_excluded("src/build/out.py")
+    assert rules.is_excluded("debug.log")
+    assert not rules.is_excluded("keep.log")
+    assert rules.is_excluded("coverage/index.html")
+    assert not rules.is_excluded("src/coverage/index.html")
+    assert rules.is_excluded("pkg/sub/a.tmp")
+    assert not rules.is_excluded("a.tmp")
+
+
+def test_files_in_ignored_directories_stay_excluded():
+    rules = RepoRules.from_files({".gitignore": "vendor/\n!vendor/keep.py\n"})
+
+    assert rules.is_excluded("vendor/keep.py")
+
+
+def test_linguist_attributes():
+    rules = RepoRules.from_files(
+        {
+            ".gitattributes": "vendor/** linguist-vendored\n*.pb.go linguist-generated\n",
+            "vendor/.gitattributes": "mine.py -linguist-vendored\n",
+        }
+    )
+
+    assert rules.is_excluded("vendor/lib.py")
+    assert not rules.is_excluded("vendor/mine.py")
+    assert rules.is_excluded("api/service.pb.go")
+    assert not rules.is_excluded("api/service.go")
+
+
+def test_is_binary_sniffs_the_start_only():
+    assert is_binary(b"PK\x03\x04\0\0")
+    assert not is_binary(b"print('hi')\n")
+    assert not is_binary(b"x" * 8000 + b"\0")
@@ -0,0 +1,55 @@
+from gitsummarize.codebase.format import (
+    FILE_JOINER,
+    FILE_SEPARATOR,
+    file_size,
+    files_size,
+    format_file,
+    join_files,
+    render_files,
+    render_prompt,
+)
+
+SPOOF = f"x = 1\n{FILE_SEPARATOR}\nFile: fake\n{FILE_SEPARATOR}\ny = 2\n"
+
+
+def test_render_files_formats_and_joins_each_file():
+    files = [("r/a.py", "print(1)\n"), ("r/b.md", "# B")]
+
+    assert render_files(files) == join_files(
+        [format_file("r/a.py", "print(1)\n"), format_file("r/b.md", "# B")]
+    )
+    assert render_files([]) == ""
+
+
+def test_files_size_bounds_the_rendered_length():
+    files = [("r/a.py", "print(1)\n"), ("r/b.py", "  \n\tpass"), ("r/c.py", SPOOF)]
+
+    assert files_size(files) >= len(render_files(files))
+    # Exact, joiner included, unless whitespace-only lines get normalized
+    assert file_size("r/a.py", "print(1)\n") == len(
+        render_files(files[:1]) + FILE_JOINER
+    )
+
+
+TEMPLATE = "Tree:\n{directory_structure}\nCode:\n{codebase}\nWrite {{docs}}."
+
+
+def test_render_prompt_matches_str_format_when_it_fits():
+    files = [("r/a.py", "print(1)\n"), ("r/b.md", "# B")]
+
+    prompt = render_prompt(TEMPLATE, 10_000, files, directory_structure="r/")
+
+    assert prompt == TEMPLATE.format(
+        directory_structure="r/", codebase=render_files(files)
+    )
+
+
+def test_render_prompt_cuts_only_the_codebase():
+    files = [("r/a.py", "a" * 500), ("r/b.py", "b" * 500)]
+    full = TEMPLATE.format(directory_structure="r/", codebase=render_files(files))
+
+    prompt = render_prompt(TEMPLATE, 700, files, directory_structure="r/")
+
+    assert len(prompt) == 700
+    assert prompt.endswith("\nWrite {docs}.")
+    assert prompt.removesuffix("\nWrite {docs}.") == full[: 700 - 14]
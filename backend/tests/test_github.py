@@ -0,0 +1,136 @@
+import base64
+import tempfile
+import zipfile
+
+import pytest
+
+from gitsummarize.codebase.format import FILE_SEPARATOR
+from gitsummarize.exceptions.exceptions import (
+    GitHubArchiveTooLargeError,
+    GitHubNotFoundError,
+)
+from tests.conftest import FakeResponse
+
+SPOOF = f"x = 1\n{FILE_SEPARATOR}\nFile: fake\n{FILE_SEPARATOR}\ny = 2\n"
+
+
+def make_zipball(path, files: dict[str, str]):
+    with zipfile.ZipFile(path, "w") as zip_ref:
+        for name, content in files.items():
+            zip_ref.writestr(f"o-r-abc123/{name}", content)
+    return path
+
+
+async def test_content_that_looks_like_a_header_stays_one_file(tmp_path, fake_github):
+    zip_path = make_zipball(
+        tmp_path / "r.zip", {"src/weird.py": SPOOF, "src/ok.py": "ok = True\n"}
+    )
+
+    codebase = await fake_github().get_all_content_from_zip(zip_path)
+
+    assert codebase == [("r/src/weird.py", SPOOF), ("r/src/ok.py", "ok = True\n")]
+
+
+async def test_extraction_within_a_budget_keeps_the_most_useful_files(
+    tmp_path, fake_github
+):
+    zip_path = make_zipball(
+        tmp_path / "r.zip",
+        {
+            "README.md": "# Project\n",
+            "tests/test_big.py": "assert True\n" * 200,
+            "main.py": "print('hi')\n",
+        },
+    )
+
+    codebase = await fake_github().get_all_content_from_zip(zip_path, max_tokens=200)
+
+    assert codebase == [("r/README.md", "# Project\n"), ("r/main.py", "print('hi')\n")]
+
+
+async def test_directory_structure_is_read_from_the_archive(tmp_path, fake_github):
+    zip_path = make_zipball(
+        tmp_path / "r.zip", {"src/app.py": "app = 1\n", "README.md": "# r\n"}
+    )
+
+    structure = await fake_github().get_directory_structure_from_zip(zip_path)
+
+    # Like the trees API, the tree starts below the zipball's root directory
+    assert structure.splitlines() == [
+        "2 files in 1 directory; by extension: .py 1, .md 1",
+        "├── README.md",
+        "└── src/",
+        "    └── app.py",
+    ]
+
+
+async def test_repo_rules_are_read_from_the_tree(fake_github):
+    blobs = {"root": "dist/\n", "docs": "*.md linguist-generated\n"}
+
+    def respond(url: str) -> FakeResponse:
+        if "/commits/" in url:
+            return FakeResponse(data={"commit": {"tree": {"sha": "tree"}}})
+        if "/git/trees/" in url:
+            return FakeResponse(
+                data={
+                    "tree": [
+                        {"path": ".gitignore", "type": "blob", "sha": "root"},
+                        {"path": "docs", "type": "tree", "sha": "d"},
+                        {"path": "docs/.gitattributes", "type": "blob", "sha": "docs"},
+                        {"path": "main.py", "type": "blob", "sha": "main"},
+                    ],
+                    "truncated": False,
+                }
+            )
+        content = blobs[url.rpartition("/")[2]].encode()
+        return FakeResponse(data={"content": base64.b64encode(content).decode()})
+
+    client = fake_github(respond)
+    rules = await client.get_repo_rules_from_url("https://github.com/o/r", "abc123")
+
+    assert rules.is_excluded("dist/app.js")
+    assert rules.is_excluded("docs/api.md")
+    assert not rules.is_excluded("README.md")
+    assert not rules.is_excluded("main.py")
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+async def test_archive_is_streamed_to_a_temp_file(temp_dir, fake_github):
+    client = fake_github([FakeResponse(chunks=[b"PK", b"data"])])
+
+    path = await client.download_repository_zip("o", "r", "abc123")
+
+    assert path.parent == temp_dir
+    assert path.read_bytes() == b"PKdata"
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        # Known too large from the headers, before any byte is read
+        FakeResponse(chunks=[b"x" * 4], content_length=100),
+        # Only found out while streaming
+        FakeResponse(chunks=[b"x" * 4, b"x" * 4]),
+    ],
+)
+async def test_archives_over_the_size_cap_are_removed(temp_dir, fake_github, response):
+    client = fake_github([response], max_archive_size=6)
+
+    with pytest.raises(GitHubArchiveTooLargeError):
+        await client.download_repository_zip("o", "r")
+
+    assert list(temp_dir.iterdir()) == []
+
+
+async def test_failed_downloads_leave_no_temp_file(temp_dir, fake_github):
+    client = fake_github([FakeResponse(status=404)])
+
+    with pytest.raises(GitHubNotFoundError):
+        await client.download_repository_zip("o", "r")
+
+    assert list(temp_dir.iterdir()) == []
@@ -0,0 +1,104 @@
+import pytest
+
+from gitsummarize.clients import github_rate_limiter
+from gitsummarize.clients.github_rate_limiter import (
+    SECONDARY_BACKOFF,
+    GithubRateLimiter,
+    GithubResource,
+)
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake wall clock; asyncio.sleep advances it instead of waiting."""
+    now = [NOW]
+
+    async def sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(github_rate_limiter.time, "time", lambda: now[0])
+    monkeypatch.setattr(github_rate_limiter.asyncio, "sleep", sleep)
+    return now
+
+
+def rate_headers(limit: int, remaining: int, reset_in: float, resource="core") -> dict:
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(NOW + reset_in),
+        "X-RateLimit-Resource": resource,
+    }
+
+
+async def test_prefers_the_token_with_the_most_requests_left(clock):
+    limiter = GithubRateLimiter(["a", "b"])
+    limiter.record("a", GithubResource.CORE, rate_headers(5000, 100, 3600))
+    limiter.record("b", GithubResource.CORE, rate_headers(5000, 4000, 3600))
+
+    assert await limiter.acquire() == "b"
+    assert limiter.get_stats()["requests"] == 1
+
+
+async def test_waits_for_the_reset_when_every_token_is_exhausted(clock):
+    limiter = GithubRateLimiter(["a"])
+    limiter.record("a", GithubResource.CORE, rate_headers(5000, 0, 120))
+
+    assert await limiter.acquire() == "a"
+
+    assert clock[0] == NOW + 120
+    assert limiter.get_stats()["waits"] == 1
+
+
+async def test_paces_requests_once_a_bucket_runs_low(clock):
+    limiter = GithubRateLimiter(["a"])
+    # 10 of 5000 left is under the 10% threshold: spread them over the window
+    limiter.record("a", GithubResource.CORE, rate_headers(5000, 10, 100))
+
+    await limiter.acquire()
+    await limiter.acquire()
+
+    # The first request leaves 9, to last the 100s until the reset
+    assert clock[0] - NOW == pytest.approx(100 / 9)
+
+
+async def test_search_is_paced_from_the_first_request(clock):
+    limiter = GithubRateLimiter([None])
+    limiter.record(None, GithubResource.SEARCH, rate_headers(30, 30, 60, "search"))
+
+    await limiter.acquire(GithubResource.SEARCH)
+    await limiter.acquire(GithubResource.SEARCH)
+
+    assert clock[0] - NOW == pytest.approx(60 / 29)
+
+
+def test_out_of_order_responses_keep_the_lowest_remaining(clock):
+    limiter = GithubRateLimiter(["a"])
+    limiter.record("a", GithubResource.CORE, rate_headers(5000, 90, 3600))
+    limiter.record("a", GithubResource.CORE, rate_headers(5000, 95, 3600))
+
+    (token,) = limiter.get_stats()["tokens"]
+    assert token["resources"][GithubResource.CORE]["remaining"] == 90
+
+
+async def test_secondary_limit_puts_the_token_on_cooldown(clock):
+    limiter = GithubRateLimiter(["a", "b"])
+
+    assert limiter.back_off("a", GithubResource.CORE, {"Retry-After": "30"}) == 30
+    assert limiter.back_off("b", GithubResource.CORE, {}, attempt=1) == (
+        2 * SECONDARY_BACKOFF
+    )
+    assert await limiter.acquire() == "a"
+
+    assert clock[0] == NOW + 30
+    assert limiter.get_stats()["secondary_limits"] == 2
+
+
+def test_primary_limit_rests_until_the_reset(clock):
+    limiter = GithubRateLimiter(["a"])
+
+    delay = limiter.back_off("a", GithubResource.CORE, rate_headers(5000, 0, 45))
+
+    assert delay == 45
+    assert limiter.get_stats()["primary_limits"] == 1
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from gitsummarize.clients.google_genai import MODEL, GoogleGenAI
+from gitsummarize.clients.token_estimator import TokenEstimator
+
+BIG_CODEBASE = [("main.py", "x = 1\n" * 10_000)]
+SMALL_CODEBASE = [("main.py", "x = 1\n")]
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = []
+
+    async def generate_content(self, model, contents, config):
+        self.calls.append((contents, config.cached_content))
+        return SimpleNamespace(text="document", usage_metadata=None)
+
+
+class FakeCaches:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.created = []
+        self.deleted = []
+
+    async def create(self, model, config):
+        if self.fail:
+            raise RuntimeError("caching unavailable")
+        self.created.append(config.contents)
+        return SimpleNamespace(name="cachedContents/1")
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+def fake_gemini(caches: FakeCaches) -> tuple[GoogleGenAI, FakeModels]:
+    estimator = TokenEstimator()
+    # Calibrated already, so no count_tokens call is made
+    estimator.record(MODEL, 37, 10)
+    gemini = GoogleGenAI("key", token_estimator=estimator)
+    models = FakeModels()
+    gemini.client = SimpleNamespace(aio=SimpleNamespace(models=models, caches=caches))
+    return gemini, models
+
+
+async def test_large_context_is_cached_once_for_both_documents():
+    caches = FakeCaches()
+    gemini, models = fake_gemini(caches)
+
+    documents = await gemini.get_documentation("tree", BIG_CODEBASE)
+
+    assert documents == ("document", "document")
+    assert len(caches.created) == 1
+    # Only the instructions are sent, the codebase comes from the cache
+    assert [cache_name for _, cache_name in models.calls] == ["cachedContents/1"] * 2
+    assert all(isinstance(contents, str) for contents, _ in models.calls)
+    assert caches.deleted == ["cachedContents/1"]
+
+
+async def test_small_context_is_sent_inline():
+    caches = FakeCaches()
+    gemini, models = fake_gemini(caches)
+
+    await gemini.get_documentation("tree", SMALL_CODEBASE)
+
+    assert caches.created == []
+    assert [cache_name for _, cache_name in models.calls] == [None, None]
+    assert all(len(contents) == 2 for contents, _ in models.calls)
+
+
+async def test_context_is_sent_inline_when_caching_fails():
+    caches = FakeCaches(fail=True)
+    gemini, models = fake_gemini(caches)
+
+    documents = await gemini.get_documentation("tree", BIG_CODEBASE)
+
+    assert documents == ("document", "document")
+    assert [cache_name for _, cache_name in models.calls] == [None, None]
+    assert caches.deleted == []
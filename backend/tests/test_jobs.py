@@ -0,0 +1,167 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gitsummarize.model.job import JobStage, JobStatus
+from gitsummarize.pipeline.jobs import JobQueue, JobStore
+
+URL = "https://github.com/o/r"
+
+
+def test_claims_by_priority_then_age(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    low, _ = store.enqueue("https://github.com/o/low")
+    high, _ = store.enqueue("https://github.com/o/high", priority=5)
+
+    assert store.claim().id == high.id
+    assert store.claim().id == low.id
+    assert store.claim() is None
+
+
+def test_duplicate_request_merges_into_the_queued_job(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job, created = store.enqueue(URL, params={"force": False})
+
+    merged, merged_created = store.enqueue(URL, priority=3, params={"force": True})
+
+    assert created and not merged_created
+    assert merged.id == job.id
+    assert merged.priority == 3
+    assert merged.params == {"force": True}
+    # A lower priority never downgrades the job
+    assert store.enqueue(URL, priority=1)[0].priority == 3
+
+
+def test_forced_request_queues_behind_an_unforced_running_job(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    running, _ = store.enqueue(URL, params={"force": False})
+    store.claim()
+
+    same, created = store.enqueue(URL, params={"force": False})
+    forced, forced_created = store.enqueue(URL, params={"force": True})
+
+    assert same.id == running.id and not created
+    assert forced.id != running.id and forced_created
+    assert forced.status == JobStatus.QUEUED
+
+
+def test_concurrent_enqueues_from_separate_connections_queue_one_job(tmp_path):
+    # One store per thread, like separate worker processes sharing the file
+    path = tmp_path / "jobs.sqlite3"
+    stores = [JobStore(path) for _ in range(8)]
+    barrier = threading.Barrier(len(stores))
+
+    def enqueue(store: JobStore):
+        barrier.wait()
+        return store.enqueue(URL)
+
+    with ThreadPoolExecutor(len(stores)) as executor:
+        results = list(executor.map(enqueue, stores))
+
+    assert len({job.id for job, _ in results}) == 1
+    assert sum(created for _, created in results) == 1
+    assert stores[0].count_by_status() == {JobStatus.QUEUED: 1}
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    job, _ = store.enqueue(URL)
+    store.claim(lease_seconds=-1)
+
+    reclaimed = store.claim()
+
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+
+async def test_queue_runs_jobs_and_records_results_and_errors(tmp_path):
+    calls = []
+
+    async def handler(job, set_stage, gemini_key=None):
+        calls.append((job.repo_url, gemini_key))
+        await set_stage(JobStage.GENERATING)
+        if job.repo_url.endswith("/broken"):
+            raise ValueError("no documents")
+        return {"ok": True}
+
+    queue = JobQueue(JobStore(tmp_path / "jobs.sqlite3"), handler, poll_interval=0.01)
+    await queue.start()
+    ok = await queue.enqueue(URL, context={"gemini_key": "key"})
+    broken = await queue.enqueue("https://github.com/o/broken")
+    for _ in range(200):
+        jobs = [await queue.get(ok.id), await queue.get(broken.id)]
+        if all(job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED) for job in jobs):
+            break
+        await asyncio.sleep(0.01)
+    await queue.stop()
+
+    assert jobs[0].status == JobStatus.SUCCEEDED
+    assert jobs[0].result == {"ok": True}
+    assert jobs[1].status == JobStatus.FAILED
+    assert jobs[1].error == "no documents"
+    assert sorted(calls) == [("https://github.com/o/broken", None), (URL, "key")]
+
+
+def test_worker_that_lost_its_lease_cannot_touch_the_job(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    store.enqueue(URL)
+    stale = store.claim(lease_seconds=-1)
+    current = store.claim()
+
+    assert not store.renew(stale)
+    assert not store.complete(stale, {"ok": True})
+    assert store.renew(current)
+    assert store.get(current.id).status == JobStatus.RUNNING
+
+
+async def wait_until_finished(queue, job_id):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    return job
+
+
+async def test_queue_fails_jobs_that_run_past_the_timeout(tmp_path):
+    async def handler(job, set_stage):
+        await asyncio.sleep(10)
+
+    queue = JobQueue(
+        JobStore(tmp_path / "jobs.sqlite3"), handler, poll_interval=0.01, timeout=0.05
+    )
+    await queue.start()
+    job = await wait_until_finished(queue, (await queue.enqueue(URL)).id)
+    await queue.stop()
+
+    assert job.status == JobStatus.FAILED
+    assert job.error == "Timed out after 0.05s"
+
+
+async def test_queue_stops_jobs_whose_lease_was_taken_over(tmp_path):
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def handler(job, set_stage):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    path = tmp_path / "jobs.sqlite3"
+    queue = JobQueue(JobStore(path), handler, poll_interval=0.01, lease_seconds=0.3)
+    await queue.start()
+    job = await queue.enqueue(URL)
+    await started.wait()
+    # Another process claims the job, as it would once our lease lapsed
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE jobs SET attempts = attempts + 1")
+    await asyncio.wait_for(cancelled.wait(), 1)
+    running = await queue.get(job.id)
+    await queue.stop()
+
+    assert running.status == JobStatus.RUNNING
+    assert running.attempts == 2
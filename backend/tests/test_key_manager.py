@@ -0,0 +1,100 @@
+import pytest
+
+from gitsummarize.auth import key_manager
+from gitsummarize.auth.key_manager import (
+    COOLDOWN_SECONDS,
+    KeyGroup,
+    KeyManager,
+    is_rate_limit_error,
+)
+
+
+class RateLimited(Exception):
+    def __init__(self, **status):
+        super().__init__("429")
+        for name, value in status.items():
+            setattr(self, name, value)
+
+
+def make_manager(*keys: str, tokens_per_minute: int | None = None) -> KeyManager:
+    manager = KeyManager()
+    for key in keys:
+        manager.add_key(
+            KeyGroup.GEMINI, key, f"client-{key}", tokens_per_minute=tokens_per_minute
+        )
+    return manager
+
+
+async def test_leases_go_to_the_least_loaded_key():
+    manager = make_manager("key-a", "key-b")
+
+    async with manager.lease(KeyGroup.GEMINI) as first:
+        async with manager.lease(KeyGroup.GEMINI) as second:
+            assert {first.key, second.key} == {"key-a", "key-b"}
+            assert second.client == f"client-{second.key}"
+
+    stats = manager.get_stats()[KeyGroup.GEMINI]
+    assert [state["in_flight"] for state in stats] == [0, 0]
+    assert [state["requests"] for state in stats] == [1, 1]
+
+
+async def test_repeated_rate_limits_double_the_cooldown(monkeypatch):
+    now = 1_000.0
+    monkeypatch.setattr(key_manager.time, "monotonic", lambda: now)
+    manager = make_manager("key-a")
+
+    cooldowns = []
+    for _ in range(3):
+        with pytest.raises(RateLimited):
+            async with manager.lease(KeyGroup.GEMINI):
+                raise RateLimited(code=429)
+        (stats,) = manager.get_stats()[KeyGroup.GEMINI]
+        cooldowns.append(stats["cooldown_remaining"])
+        now += stats["cooldown_remaining"]
+
+    assert cooldowns == [COOLDOWN_SECONDS, 2 * COOLDOWN_SECONDS, 4 * COOLDOWN_SECONDS]
+    assert stats["rate_limited"] == 3
+
+    # A successful call resets the backoff
+    async with manager.lease(KeyGroup.GEMINI):
+        pass
+    with pytest.raises(RateLimited):
+        async with manager.lease(KeyGroup.GEMINI):
+            raise RateLimited(code=429)
+    (stats,) = manager.get_stats()[KeyGroup.GEMINI]
+    assert stats["cooldown_remaining"] == COOLDOWN_SECONDS
+
+
+async def test_cooling_key_is_skipped_while_another_is_healthy():
+    manager = make_manager("key-a", "key-b")
+    with pytest.raises(RateLimited):
+        async with manager.lease(KeyGroup.GEMINI) as limited:
+            raise RateLimited(status_code=429)
+
+    for _ in range(3):
+        async with manager.lease(KeyGroup.GEMINI) as lease:
+            assert lease.key != limited.key
+
+
+async def test_key_over_its_token_quota_is_skipped():
+    manager = make_manager("key-a", "key-b", tokens_per_minute=1_000)
+    manager.record_usage(KeyGroup.GEMINI, "key-a", 1_000)
+
+    async with manager.lease(KeyGroup.GEMINI) as lease:
+        assert lease.key == "key-b"
+    stats = manager.get_stats()[KeyGroup.GEMINI]
+    assert stats[0]["utilization"] == 1.0
+
+
+async def test_lease_without_keys_fails():
+    with pytest.raises(ValueError):
+        async with KeyManager().lease(KeyGroup.GEMINI):
+            pass
+
+
+def test_is_rate_limit_error_reads_every_client_status_attribute():
+    assert is_rate_limit_error(RateLimited(code=429))
+    assert is_rate_limit_error(RateLimited(status_code=429))
+    assert is_rate_limit_error(RateLimited(status=429))
+    assert not is_rate_limit_error(RateLimited(status=500))
+    assert not is_rate_limit_error(ValueError("429"))
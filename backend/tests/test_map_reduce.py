@@ -0,0 +1,115 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from gitsummarize.cache.summary_cache import SummaryCache
+from gitsummarize.pipeline import map_reduce
+from gitsummarize.pipeline.map_reduce import summarize_codebase
+
+CODEBASE = [("a/x.py", "x = 1\n"), ("b/y.py", "y = 2\n"), ("c/z.py", "z = 3\n")]
+
+
+class RateLimitError(Exception):
+    code = 429
+
+
+class FakeClient:
+    def __init__(self, failures: int = 0, error: type[Exception] = RateLimitError):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+
+    async def summarize_chunk(self, path, content):
+        self.calls.append(("summarize_chunk", path))
+        if self.failures:
+            self.failures -= 1
+            raise self.error("try again")
+        return f"notes on {path}"
+
+    async def merge_summaries(self, label, summaries):
+        self.calls.append(("merge_summaries", label, list(summaries)))
+        return f"merged {label}"
+
+    async def get_documentation_from_summaries(self, directory_structure, summaries):
+        self.calls.append(("get_documentation_from_summaries", list(summaries)))
+        return "business", "technical"
+
+
+def lease_of(client: FakeClient):
+    @asynccontextmanager
+    async def lease():
+        yield client
+
+    return lease
+
+
+async def test_notes_are_reduced_level_by_level():
+    client = FakeClient()
+
+    business, technical, stats = await summarize_codebase(
+        lease_of(client), "tree", CODEBASE, fan_out=2, reduce_tokens=1
+    )
+
+    assert (business, technical) == ("business", "technical")
+    assert stats["chunks"] == 3
+    assert stats["reduce_levels"] == 2
+    assert [call for call in client.calls if call[0] != "summarize_chunk"] == [
+        ("merge_summaries", "a … b", ["a", "b"]),
+        ("merge_summaries", "a … c", ["a … b", "c"]),
+        ("get_documentation_from_summaries", ["a … c"]),
+    ]
+
+
+async def test_notes_that_fit_are_not_reduced():
+    client = FakeClient()
+
+    _, _, stats = await summarize_codebase(lease_of(client), "tree", CODEBASE)
+
+    assert stats["reduce_levels"] == 0
+    assert client.calls[-1] == ("get_documentation_from_summaries", ["a", "b", "c"])
+
+
+async def test_cached_chunk_notes_are_reused(tmp_path):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    await summarize_codebase(lease_of(FakeClient()), "tree", CODEBASE, cache)
+    changed = [*CODEBASE[:2], ("c/z.py", "z = 4\n")]
+    client = FakeClient()
+
+    _, _, stats = await summarize_codebase(lease_of(client), "tree", changed, cache)
+
+    assert (stats["resummarized"], stats["reused"]) == (1, 2)
+    assert ("summarize_chunk", "c") in client.calls
+
+
+async def test_rate_limited_chunks_are_retried(monkeypatch):
+    monkeypatch.setattr(map_reduce, "RETRY_SECONDS", 0)
+    client = FakeClient(failures=2)
+
+    _, _, stats = await summarize_codebase(
+        lease_of(client), "tree", CODEBASE, concurrency=1
+    )
+
+    assert stats["resummarized"] == 3
+    assert client.calls.count(("summarize_chunk", "a")) == 3
+
+
+async def test_chunks_fail_after_the_last_attempt(monkeypatch):
+    monkeypatch.setattr(map_reduce, "RETRY_SECONDS", 0)
+    client = FakeClient(failures=map_reduce.MAX_ATTEMPTS, error=RateLimitError)
+
+    with pytest.raises(RateLimitError):
+        await summarize_codebase(lease_of(client), "tree", CODEBASE, concurrency=1)
+
+
+async def test_other_errors_are_not_retried():
+    client = FakeClient(failures=1, error=ValueError)
+
+    with pytest.raises(ValueError):
+        await summarize_codebase(lease_of(client), "tree", CODEBASE, concurrency=1)
+
+    assert client.calls.count(("summarize_chunk", "a")) == 1
+
+
+async def test_fan_out_must_merge_at_least_two_notes():
+    with pytest.raises(ValueError):
+        await summarize_codebase(lease_of(FakeClient()), "tree", CODEBASE, fan_out=1)
@@ -0,0 +1,79 @@
+from gitsummarize.cache.metadata_cache import RepoMetadataCache
+from gitsummarize.model.repo_metadata import RepoMetadata
+from tests.conftest import FakeResponse
+
+URL = "https://github.com/Owner/Repo"
+
+
+def metadata(stars: int) -> RepoMetadata:
+    return RepoMetadata(
+        num_stars=stars, num_forks=1, language="Python", description=None
+    )
+
+
+def repo_response(
+    status: int, stars: int | None = None, etag: str | None = None
+) -> FakeResponse:
+    return FakeResponse(
+        status,
+        data={
+            "stargazers_count": stars,
+            "forks_count": 1,
+            "language": "Python",
+            "description": None,
+        },
+        headers={"ETag": etag} if etag else None,
+    )
+
+
+def test_round_trip_is_case_insensitive(tmp_path):
+    cache = RepoMetadataCache(tmp_path / "metadata.sqlite3")
+
+    assert cache.get("owner", "repo") is None
+    cache.put("Owner", "Repo", '"v1"', metadata(10))
+
+    assert cache.get("owner", "repo") == ('"v1"', metadata(10))
+    assert cache.get_stats() == {"hits": 1, "misses": 1, "not_modified": 0}
+
+
+def test_put_many_keeps_stored_etags(tmp_path):
+    cache = RepoMetadataCache(tmp_path / "metadata.sqlite3")
+    cache.put("o", "a", '"v1"', metadata(1))
+
+    cache.put_many({("o", "a"): metadata(2), ("o", "b"): metadata(3)})
+
+    assert cache.get_many([("o", "a"), ("o", "b"), ("o", "c")]) == {
+        ("o", "a"): ('"v1"', metadata(2)),
+        ("o", "b"): ("", metadata(3)),
+    }
+
+
+async def test_etag_is_cached_only_once_the_metadata_is_committed(
+    tmp_path, fake_github
+):
+    cache = RepoMetadataCache(tmp_path / "metadata.sqlite3")
+    client = fake_github(
+        [
+            repo_response(200, 10, '"v1"'),
+            # The caller failed to store the first answer, so this one
+            # must still count as changed
+            repo_response(200, 10, '"v1"'),
+            repo_response(304),
+        ],
+        metadata_cache=cache,
+    )
+
+    assert await client.get_changed_repo_metadata_from_url(URL) == metadata(10)
+    assert cache.get("owner", "repo") is None
+
+    assert await client.get_changed_repo_metadata_from_url(URL) == metadata(10)
+    await client.commit_repo_metadata([URL])
+    assert cache.get("owner", "repo") == ('"v1"', metadata(10))
+
+    assert await client.get_changed_repo_metadata_from_url(URL) is None
+    assert [headers for _, headers in client.requests] == [
+        None,
+        None,
+        {"If-None-Match": '"v1"'},
+    ]
+    assert cache.get_stats()["not_modified"] == 1
@@ -0,0 +1,78 @@
+from gitsummarize.cache.metadata_cache import RepoMetadataCache
+from gitsummarize.exceptions.exceptions import GitHubRateLimitError
+from gitsummarize.model.repo_metadata import RepoMetadata
+from gitsummarize.pipeline import metadata_refresh
+from gitsummarize.pipeline.metadata_refresh import refresh_repo_metadata
+
+URLS = ["https://github.com/o/a", "https://github.com/o/b"]
+METADATA = RepoMetadata(num_stars=1, num_forks=1, language=None, description=None)
+
+
+class FakeSupabase:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.upserts = []
+
+    async def upsert_repo_metadata_batch(self, metadata: dict):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("supabase is down")
+        self.upserts.append(metadata)
+
+
+async def repo_urls():
+    for url in URLS:
+        yield url
+
+
+async def test_failed_upsert_leaves_the_cache_alone(tmp_path, fake_github):
+    cache = RepoMetadataCache(tmp_path / "metadata.sqlite3")
+    gh = fake_github(token="token", metadata_cache=cache)
+
+    async def get_repo_metadata_batch(repos):
+        return dict.fromkeys(repos, METADATA)
+
+    gh.get_repo_metadata_batch = get_repo_metadata_batch
+    supabase = FakeSupabase(failures=1)
+
+    stats = await refresh_repo_metadata(gh, supabase, repo_urls())
+
+    assert stats["failed"] == 2
+    assert cache.get_many([("o", "a"), ("o", "b")]) == {}
+
+    # The retry still sees the metadata as changed, and caches it once stored
+    stats = await refresh_repo_metadata(gh, supabase, repo_urls())
+
+    assert stats["updated"] == 2
+    assert supabase.upserts == [dict.fromkeys(URLS, METADATA)]
+    assert cache.get_many([("o", "a")]) == {("o", "a"): ("", METADATA)}
+
+    stats = await refresh_repo_metadata(gh, supabase, repo_urls())
+
+    assert stats["unchanged"] == 2
+    assert len(supabase.upserts) == 2
+
+
+async def test_batches_use_extra_tokens_and_retry_rate_limits(monkeypatch, fake_github):
+    monkeypatch.setattr(metadata_refresh, "RETRY_SECONDS", 0)
+    gh = fake_github(extra_tokens=["pool-token"])
+    queries = []
+
+    async def get_repo_metadata_batch(repos):
+        queries.append(repos)
+        if len(queries) == 1:
+            raise GitHubRateLimitError("graphql", "batch")
+        return dict.fromkeys(repos, METADATA)
+
+    async def get_changed_repo_metadata_from_url(gh_url):
+        raise AssertionError("rate limited batches must not go per repo")
+
+    gh.get_repo_metadata_batch = get_repo_metadata_batch
+    gh.get_changed_repo_metadata_from_url = get_changed_repo_metadata_from_url
+    supabase = FakeSupabase()
+
+    stats = await refresh_repo_metadata(gh, supabase, repo_urls())
+
+    assert len(queries) == 2
+    assert stats["updated"] == 2
+    assert supabase.upserts == [dict.fromkeys(URLS, METADATA)]
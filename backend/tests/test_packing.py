@@ -0,0 +1,61 @@
+from gitsummarize.codebase.format import (
+    FILE_SEPARATOR,
+    files_size,
+    near_duplicate_note,
+)
+from gitsummarize.codebase.packing import pack_codebase, score_file
+
+SPOOF = f"x = 1\n{FILE_SEPARATOR}\nFile: fake\n{FILE_SEPARATOR}\ny = 2\n"
+
+
+def test_codebase_that_fits_is_returned_untouched():
+    files = [("r/a.py", "a = 1\n"), ("r/b.py", "b = 2\n")]
+
+    assert pack_codebase(files, files_size(files)) is files
+
+
+def test_keeps_the_most_useful_files_in_their_original_order():
+    files = [
+        ("r/node_modules/lib/index.js", "x" * 400),
+        ("r/README.md", "# Project\n"),
+        ("r/src/util.py", "def helper(): pass\n"),
+        ("r/main.py", "from util import helper\n"),
+    ]
+    budget = files_size(files) - 100
+
+    packed = pack_codebase(files, budget, chars_per_token=1)
+
+    assert packed == files[1:]
+    assert files_size(packed) <= budget
+
+
+def test_file_content_that_looks_like_a_header_stays_one_file():
+    files = [("r/src/weird.py", SPOOF), ("r/tests/test_weird.py", "y" * 1_000)]
+
+    packed = pack_codebase(files, files_size(files[:1]), chars_per_token=1)
+
+    assert packed == [("r/src/weird.py", SPOOF)]
+
+
+def test_score_file_prefers_top_level_readme_over_vendored_code():
+    assert score_file("r/README.md", 100) > score_file("r/src/app.py", 100)
+    assert score_file("r/src/app.py", 100) > score_file("r/vendor/app.py", 100)
+    assert score_file("r/tests/test_app.py", 100) < score_file("r/src/app.py", 100)
+
+
+def test_near_duplicates_are_kept_only_with_their_original():
+    original = ("r/vendor/big.py", "x = 1\n" * 100)
+    near_duplicate = ("r/main.py", f"{near_duplicate_note('r/vendor/big.py')}+y\n")
+    other = ("r/util.py", "z = 1\n")
+    files = [original, near_duplicate, other]
+
+    # Room for both files of the pair: the original comes along
+    budget = files_size([original, near_duplicate])
+    assert pack_codebase(files, budget, chars_per_token=1) == [
+        original,
+        near_duplicate,
+    ]
+
+    # No room for the original: the diff is left out too
+    budget = files_size([near_duplicate, other])
+    assert pack_codebase(files, budget, chars_per_token=1) == [other]
@@ -0,0 +1,102 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from gitsummarize.cache.repo_cache import CacheTier, RepoCache
+
+
+def make_archive(directory: Path, name: str, size: int) -> Path:
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_text_round_trip_and_stats(tmp_path):
+    cache = RepoCache(tmp_path / "cache")
+
+    assert cache.get_text("o", "r", "sha", CacheTier.CONTENT) is None
+    cache.put_text("o", "r", "sha", CacheTier.CONTENT, "hello")
+
+    assert cache.get_text("o", "r", "sha", CacheTier.CONTENT) == "hello"
+    stats = cache.get_stats()
+    assert stats["tiers"][CacheTier.CONTENT] == {"hits": 1, "misses": 1}
+    assert stats["entries"] == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = RepoCache(tmp_path / "cache", max_bytes=250)
+    for sha in ("a", "b"):
+        cache.put_archive("o", "r", sha, make_archive(tmp_path, sha, 100))
+    # Reading "a" makes "b" the least recently used
+    assert cache.get_archive("o", "r", "a") is not None
+
+    cache.put_archive("o", "r", "c", make_archive(tmp_path, "c", 100))
+
+    assert cache.get_archive("o", "r", "b") is None
+    assert cache.get_archive("o", "r", "a") is not None
+    assert cache.get_archive("o", "r", "c") is not None
+
+
+def test_pinned_archive_survives_eviction_until_released(tmp_path):
+    cache = RepoCache(tmp_path / "cache", max_bytes=150)
+    cache.put_archive("o", "r", "a", make_archive(tmp_path, "a", 100))
+    path = cache.get_archive("o", "r", "a", pin=True)
+
+    cache.put_archive("o", "r", "b", make_archive(tmp_path, "b", 100))
+
+    # A reader still holds "a", so the cache runs over budget instead
+    assert path.exists()
+    assert cache.get_stats()["bytes"] == 200
+
+    cache.release_archive(path)
+
+    assert not path.exists()
+    assert cache.get_stats()["bytes"] == 100
+
+
+def test_index_survives_restart_and_drops_partial_files(tmp_path):
+    cache_dir = tmp_path / "cache"
+    RepoCache(cache_dir).put_text("o", "r", "sha", CacheTier.CONTENT, "hello")
+    (cache_dir / "left.over.partial").write_text("x")
+
+    cache = RepoCache(cache_dir)
+
+    assert cache.get_text("o", "r", "sha", CacheTier.CONTENT) == "hello"
+    assert not (cache_dir / "left.over.partial").exists()
+
+
+async def test_open_archive_holds_the_archive_while_it_is_read(tmp_path, fake_github):
+    cache = RepoCache(tmp_path / "cache", max_bytes=150)
+    client = fake_github(cache=cache)
+    cache.put_archive("o", "r", "a", make_archive(tmp_path, "a", 100))
+
+    async with client._open_archive("o", "r", "a") as path:
+        cache.put_archive("o", "r", "b", make_archive(tmp_path, "b", 100))
+        assert path.exists()
+
+    assert not path.exists()
+
+
+async def test_open_archive_removes_the_download_when_caching_fails(
+    tmp_path, monkeypatch, fake_github
+):
+    cache = RepoCache(tmp_path / "cache")
+    client = fake_github(cache=cache)
+    downloaded = make_archive(tmp_path, "download.zip", 10)
+
+    async def download(owner, repo, ref=None):
+        return downloaded
+
+    def put_archive(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(client, "download_repository_zip", download)
+    monkeypatch.setattr(cache, "put_archive", put_archive)
+
+    with pytest.raises(OSError):
+        async with client._open_archive("o", "r", "sha"):
+            pass
+
+    assert not downloaded.exists()
+    assert os.listdir(tmp_path / "cache") == []
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from gitsummarize.pipeline.scheduler import StageScheduler
+
+
+async def test_stages_get_their_dependencies_results():
+    scheduler = StageScheduler()
+
+    async def codebase():
+        return "code"
+
+    async def summary(code):
+        return f"summary of {code}"
+
+    async def store(code, text):
+        return (code, text)
+
+    scheduler.add("codebase", codebase)
+    scheduler.add("summary", summary, ("codebase",))
+    scheduler.add("store", store, ("codebase", "summary"))
+
+    results = await scheduler.run()
+
+    assert results["store"] == ("code", "summary of code")
+    assert set(scheduler.timings) == {"codebase", "summary", "store", "total"}
+
+
+async def test_independent_stages_overlap():
+    scheduler = StageScheduler()
+    started = asyncio.Event()
+
+    async def waiter():
+        # Only finishes if the other stage runs at the same time
+        await asyncio.wait_for(started.wait(), 1)
+
+    async def starter():
+        started.set()
+
+    scheduler.add("waiter", waiter)
+    scheduler.add("starter", starter)
+
+    await scheduler.run()
+
+
+async def test_a_failure_cancels_the_other_stages():
+    scheduler = StageScheduler()
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def fail():
+        raise ValueError("boom")
+
+    async def after(_):
+        cancelled.append("after ran")
+
+    scheduler.add("slow", slow)
+    scheduler.add("fail", fail)
+    scheduler.add("after", after, ("fail",))
+
+    with pytest.raises(ValueError, match="boom"):
+        await scheduler.run()
+    assert cancelled == ["slow"]
+    assert "total" in scheduler.timings
+
+
+def test_stages_must_be_added_after_their_dependencies():
+    scheduler = StageScheduler()
+
+    async def stage():
+        pass
+
+    scheduler.add("a", stage)
+    with pytest.raises(ValueError):
+        scheduler.add("b", stage, ("c",))
+    with pytest.raises(ValueError):
+        scheduler.add("a", stage)
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from gitsummarize.pipeline.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    release = asyncio.Event()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await release.wait()
+        return "result"
+
+    calls = [asyncio.create_task(flights.do("key", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*calls) == ["result"] * 3
+    assert runs == [1]
+    assert flights.get_stats() == {
+        "calls": 3,
+        "executions": 1,
+        "shared": 2,
+        "in_flight": 0,
+    }
+
+
+async def test_finished_calls_are_run_again():
+    flights = SingleFlight()
+    results = iter(["first", "second"])
+
+    async def work():
+        return next(results)
+
+    assert await flights.do("key", work) == "first"
+    assert await flights.do("key", work) == "second"
+
+
+async def test_errors_reach_every_caller():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        raise ValueError("boom")
+
+    calls = [asyncio.create_task(flights.do("key", work)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+
+    for call in calls:
+        with pytest.raises(ValueError, match="boom"):
+            await call
+
+
+async def test_a_cancelled_caller_doesnt_cancel_the_others():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(flights.do("key", work))
+    second = asyncio.create_task(flights.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "result"
+    assert first.cancelled()
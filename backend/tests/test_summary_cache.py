@@ -0,0 +1,131 @@
+import pytest
+
+from gitsummarize.cache.summary_cache import RepoDocuments, SummaryCache
+from gitsummarize.codebase.file_filter import RepoRules
+from gitsummarize.pipeline.incremental import summarize_incrementally
+
+URL = "https://github.com/o/r"
+CODEBASE = ("tree", [("r/a.py", "print('a')\n")])
+
+
+@pytest.fixture
+def changed_github(fake_github):
+    """Make a client reporting ``changed_paths``, returns it and its downloads."""
+
+    def make(changed_paths: list[str] | None, rules: RepoRules | None = None):
+        gh = fake_github()
+        downloads = []
+
+        async def get_changed_paths_from_url(gh_url, base_sha, head_sha):
+            return changed_paths
+
+        async def get_repo_rules_from_url(gh_url, commit_sha):
+            return rules or RepoRules()
+
+        async def get_codebase_from_url(gh_url, commit_sha, on_stage, max_tokens=None):
+            downloads.append(commit_sha)
+            return CODEBASE
+
+        gh.get_changed_paths_from_url = get_changed_paths_from_url
+        gh.get_repo_rules_from_url = get_repo_rules_from_url
+        gh.get_codebase_from_url = get_codebase_from_url
+        return gh, downloads
+
+    return make
+
+
+async def summarize(codebase, reuse_notes):
+    assert codebase == CODEBASE
+    assert reuse_notes
+    return "business", "technical"
+
+
+def test_chunk_summaries_and_stats(tmp_path):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    cache.put_chunk_summaries({"a": "notes on a", "b": "notes on b"})
+
+    assert cache.get_chunk_summaries(["a", "c"]) == {"a": "notes on a"}
+    assert cache.get_stats() == {"hits": 1, "misses": 1, "chunks": 2}
+
+
+def test_documents_are_replaced(tmp_path):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    assert cache.get_documents(URL) is None
+
+    cache.put_documents(URL, RepoDocuments("v1", "old", "old"))
+    cache.put_documents(URL, RepoDocuments("v2", "new", "new"))
+
+    assert cache.get_documents(URL) == RepoDocuments("v2", "new", "new")
+
+
+async def test_unchanged_files_reuse_the_previous_documents(tmp_path, changed_github):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    cache.put_documents(URL, RepoDocuments("v1", "old business", "old technical"))
+    gh, downloads = changed_github(["logo.png", "build/main.o"])
+
+    business, technical, stats = await summarize_incrementally(
+        gh, cache, URL, "v2", summarize
+    )
+
+    assert (business, technical) == ("old business", "old technical")
+    assert downloads == []
+    assert cache.get_documents(URL).commit_sha == "v2"
+
+
+async def test_changed_files_are_summarized_and_stored(tmp_path, changed_github):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    cache.put_documents(URL, RepoDocuments("v1", "old business", "old technical"))
+    gh, downloads = changed_github(["r/a.py"])
+
+    business, technical, stats = await summarize_incrementally(
+        gh, cache, URL, "v2", summarize
+    )
+
+    assert (business, technical) == ("business", "technical")
+    assert downloads == ["v2"]
+    assert stats == {"changed_paths": 1}
+    assert cache.get_documents(URL) == RepoDocuments("v2", "business", "technical")
+
+
+async def test_changes_the_repo_excludes_reuse_the_previous_documents(
+    tmp_path, changed_github
+):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    cache.put_documents(URL, RepoDocuments("v1", "old business", "old technical"))
+    rules = RepoRules.from_files({".gitignore": "dist/\n"})
+    gh, downloads = changed_github(["dist/app.js"], rules)
+
+    business, technical, _ = await summarize_incrementally(
+        gh, cache, URL, "v2", summarize
+    )
+
+    assert (business, technical) == ("old business", "old technical")
+    assert downloads == []
+
+
+async def test_changed_rule_files_are_summarized(tmp_path, changed_github):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    cache.put_documents(URL, RepoDocuments("v1", "old business", "old technical"))
+    gh, downloads = changed_github(["src/.gitignore"])
+
+    business, technical, _ = await summarize_incrementally(
+        gh, cache, URL, "v2", summarize
+    )
+
+    assert (business, technical) == ("business", "technical")
+    assert downloads == ["v2"]
+
+
+async def test_first_summary_does_not_reuse_notes(tmp_path, changed_github):
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    gh, _ = changed_github(None)
+    calls = []
+
+    async def summarize_once(codebase, reuse_notes):
+        calls.append(reuse_notes)
+        return "business", "technical"
+
+    await summarize_incrementally(gh, cache, URL, "v1", summarize_once)
+
+    assert calls == [False]
+    assert cache.get_documents(URL) == RepoDocuments("v1", "business", "technical")
@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+
+from gitsummarize.clients import supabase as supabase_module
+from gitsummarize.clients.supabase import AsyncSupabaseClient
+from gitsummarize.model.repo_metadata import RepoMetadata
+
+# One row per summary, so repos summarized more than once repeat
+REPO_URLS = ["a", "a", "b", "c", "c", "c", "d"]
+
+
+class FakeQuery:
+    """The select/order/limit/gt subset of a PostgREST query."""
+
+    def __init__(self, rows: list[str], pages: list, max_rows: int):
+        self._rows = sorted(rows)
+        self._pages = pages
+        self._max_rows = max_rows
+        self._limit = None
+        self._after = None
+
+    def select(self, column):
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def gt(self, column, value):
+        self._after = value
+        return self
+
+    async def execute(self):
+        rows = [url for url in self._rows if self._after is None or url > self._after]
+        # PostgREST caps pages at max-rows whatever the limit asks for
+        rows = rows[: min(self._limit, self._max_rows)]
+        self._pages.append(rows)
+        return SimpleNamespace(data=[{"repo_url": url} for url in rows])
+
+
+def fake_supabase(max_rows: int = 1000) -> tuple[AsyncSupabaseClient, list]:
+    supabase = AsyncSupabaseClient("https://example.supabase.co", "key")
+    pages = []
+    supabase._client = SimpleNamespace(
+        table=lambda name: FakeQuery(REPO_URLS, pages, max_rows)
+    )
+    return supabase, pages
+
+
+async def test_repo_urls_are_paged_without_repeats():
+    supabase, pages = fake_supabase()
+
+    urls = [url async for url in supabase.iter_repo_urls(page_size=2)]
+
+    assert urls == ["a", "b", "c", "d"]
+    # Pages start after the last URL seen, so a repo's rows never split
+    assert pages == [["a", "a"], ["b", "c"], ["d"], []]
+    assert supabase.get_stats()["iter_repo_urls"]["count"] == 4
+
+
+async def test_pages_capped_by_the_server_do_not_end_the_walk():
+    supabase, pages = fake_supabase(max_rows=1)
+
+    urls = [url async for url in supabase.iter_repo_urls(page_size=3)]
+
+    assert urls == ["a", "b", "c", "d"]
+    assert pages[-1] == []
+
+
+class FakeUpsert:
+    def __init__(self, requests: list, rows, on_conflict):
+        requests.append((rows, on_conflict))
+
+    async def execute(self):
+        return SimpleNamespace(data=[])
+
+
+async def test_one_native_client_serves_every_query(monkeypatch):
+    created, requests = [], []
+
+    async def acreate_client(url, key):
+        await asyncio.sleep(0)
+        created.append(url)
+        return SimpleNamespace(
+            table=lambda name: SimpleNamespace(
+                upsert=lambda rows, on_conflict: FakeUpsert(requests, rows, on_conflict)
+            )
+        )
+
+    monkeypatch.setattr(supabase_module, "acreate_client", acreate_client)
+    supabase = AsyncSupabaseClient("https://example.supabase.co", "key")
+    metadata = RepoMetadata(num_stars=1, num_forks=2, language="Go", description=None)
+
+    await asyncio.gather(
+        supabase.upsert_repo_metadata_batch({"https://github.com/o/a": metadata}),
+        supabase.upsert_repo_metadata_batch({"https://github.com/o/b": metadata}),
+        # Nothing changed, so nothing is sent
+        supabase.upsert_repo_metadata_batch({}),
+    )
+
+    assert created == ["https://example.supabase.co"]
+    assert len(requests) == 2
+    assert requests[0] == (
+        [
+            {
+                "repo_url": "https://github.com/o/a",
+                "num_stars": 1,
+                "num_forks": 2,
+                "language": "Go",
+                "description": None,
+            }
+        ],
+        "repo_url",
+    )
+    assert supabase.get_stats()["upsert_repo_metadata_batch"]["count"] == 2
@@ -0,0 +1,50 @@
+import pytest
+
+from gitsummarize.clients.token_estimator import TokenEstimator
+
+
+def test_uncalibrated_models_use_the_padded_default():
+    estimator = TokenEstimator(safety_margin=0.25)
+
+    assert not estimator.is_calibrated("model")
+    assert estimator.chars_per_token("model", 5.0) == 4.0
+    assert estimator.estimate("model", "x" * 10, 5.0) == 3
+
+
+def test_recorded_counts_replace_the_default_and_are_smoothed():
+    estimator = TokenEstimator(smoothing=0.5, safety_margin=0.0)
+
+    estimator.record("model", chars=300, tokens=100)
+    assert estimator.is_calibrated("model")
+    assert estimator.chars_per_token("model", 5.0) == 3.0
+
+    estimator.record("model", chars=500, tokens=100)
+    assert estimator.chars_per_token("model", 5.0) == 4.0
+    # Other models keep their own ratio
+    assert estimator.chars_per_token("other", 5.0) == 5.0
+
+
+def test_empty_counts_are_ignored():
+    estimator = TokenEstimator()
+
+    estimator.record("model", chars=100, tokens=0)
+    estimator.record("model", chars=0, tokens=10)
+
+    assert not estimator.is_calibrated("model")
+
+
+def test_stats_report_the_fallback_rate():
+    estimator = TokenEstimator()
+    estimator.record_request("model")
+    estimator.record_request("model", fallback=True)
+    estimator.record("model", chars=400, tokens=100)
+
+    assert estimator.get_stats() == {
+        "model": {
+            "requests": 2,
+            "fallbacks": 1,
+            "samples": 1,
+            "chars_per_token": pytest.approx(4.0),
+            "fallback_rate": 0.5,
+        }
+    }
@@ -0,0 +1,71 @@
+import sys
+
+from gitsummarize.codebase.tree import render_tree
+
+
+def test_renders_sorted_tree_with_summary():
+    entries = [
+        ("src/b.py", False),
+        ("src", True),
+        ("src/a.py", False),
+        ("README", False),
+        ("src/empty", True),
+    ]
+
+    assert render_tree(entries).splitlines() == [
+        "3 files in 2 directories; by extension: .py 2, (none) 1",
+        "├── README",
+        "└── src/",
+        "    ├── a.py",
+        "    ├── b.py",
+        "    └── empty/",
+    ]
+
+
+def test_implies_missing_parent_directories():
+    assert render_tree([("a/b/c.txt", False)]).splitlines() == [
+        "1 file in 2 directories; by extension: .txt 1",
+        "└── a/",
+        "    └── b/",
+        "        └── c.txt",
+    ]
+
+
+def test_collapses_entries_over_the_limit_by_extension():
+    entries = [(f"lib/{i:02}.c", False) for i in range(5)]
+    entries += [("lib/x.h", False), ("lib/y.h", False), ("lib/sub/z.c", False)]
+
+    tree = render_tree(entries, max_entries=2)
+
+    assert tree.splitlines()[1:] == [
+        "└── lib/",
+        "    ├── 00.c",
+        "    ├── 01.c",
+        "    ├── … 1 more directory (1 file)",
+        "    ├── … 3 more .c files",
+        "    └── … 2 more .h files",
+    ]
+
+
+def test_directories_below_max_depth_show_their_file_count():
+    entries = [("a/b/c/d.py", False), ("a/e.py", False), ("f.py", False)]
+
+    assert render_tree(entries, max_depth=1).splitlines()[1:] == [
+        "├── a/ (2 files)",
+        "└── f.py",
+    ]
+
+
+def test_deep_trees_dont_hit_the_recursion_limit():
+    depth = sys.getrecursionlimit() + 100
+    path = "/".join(["d"] * depth) + "/leaf.py"
+
+    tree = render_tree([(path, False)], max_entries=None)
+
+    assert tree.count("\n") == depth + 1
+    assert tree.endswith("└── leaf.py")
+
+
+def test_no_entries_render_empty():
+    assert render_tree([]) == ""
+    assert render_tree([("", True), ("/", False)]) == ""
@@ -18,6 +18,7 @@ import { Playwrite_HU } from 'next/font/google';
 import { CodeBlock, dracula } from 'react-code-blocks';
 import ReactDOM from 'react-dom';
 import { getRepoSummary, type FeaturedRepo } from '~/lib/supabase';
+import { waitForSummarizeJob } from '~/lib/summarizeJob';
 
 // Initialize mermaid with dark theme
 let mermaidInitialized = false;
@@ -935,6 +936,9 @@ export default function DocsPage() {
       });
 
       if (response.ok) {
+        // The summary is generated in the background, wait for it to finish
+        const { job_id } = await response.json() as { job_id: string };
+        await waitForSummarizeJob(job_id);
         return true;
       } else {
         const errorData: { error?: string; message?: string } = await response.json().catch(() => ({ message: 'Unknown error' }));
@@ -1000,16 +1004,8 @@ export default function DocsPage() {
         setLoadingText('Fetching Codebase');
 
         try {
-          // Set up timeout for the entire process
-          const timeoutPromise = new Promise<boolean>((_, reject) => {
-            setTimeout(() => reject(new Error('Request timed out after 4 minutes')), 240000); // 4 minutes timeout
-          });
-
-          // Race between API call and timeout
-          const success = await Promise.race([
-            generateDocumentation(),
-            timeoutPromise
-          ]);
+          // waitForSummarizeJob gives up on the job after its own deadline
+          const success = await generateDocumentation();
 
           if (success) {
             // Reload the page to show the generated documentation
@@ -0,0 +1,63 @@
+import { NextResponse } from 'next/server';
+
+interface JobStatusResponse {
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  stage: string;
+  error: string | null;
+}
+
+const JOB_STATUSES = ['queued', 'running', 'succeeded', 'failed'];
+const REQUEST_TIMEOUT_MS = 10000;
+
+export async function GET(
+  _request: Request,
+  { params }: { params: Promise<{ jobId: string }> }
+) {
+  const { jobId } = await params;
+  const backendJobUrl = `${process.env.BACKEND_URL}/summarize/jobs/${encodeURIComponent(jobId)}`;
+
+  try {
+    const response = await fetch(backendJobUrl, {
+      headers: {
+        'Authorization': `Bearer ${process.env.RENDER_API_KEY ?? ''}`
+      },
+      cache: 'no-store',
+      signal: AbortSignal.timeout(REQUEST_TIMEOUT_MS),
+    });
+
+    if (!response.ok) {
+      console.error(`Error fetching summarize job ${jobId}: ${response.status}`);
+      return NextResponse.json(
+        { error: response.status === 404 ? 'Summarize job not found.' : 'Failed to check on the summarize job.' },
+        { status: response.status }
+      );
+    }
+
+    const job = await response.json() as JobStatusResponse;
+    if (!JOB_STATUSES.includes(job.status)) {
+      console.error(`Unknown status for summarize job ${jobId}:`, job.status);
+      return NextResponse.json({ error: 'Failed to check on the summarize job.' }, { status: 502 });
+    }
+
+    if (job.status === 'failed') {
+      console.error(`Summarize job ${jobId} failed:`, job.error);
+      return NextResponse.json({
+        status: job.status,
+        stage: job.stage,
+        error: 'Failed to process codebase. Please try again later or try adding your own Gemini API key.',
+      });
+    }
+    return NextResponse.json({ status: job.status, stage: job.stage, error: null });
+  } catch (error) {
+    // A slow check is reported like other failed checks, the browser polls again
+    if (error instanceof Error && error.name === 'TimeoutError') {
+      console.error(`Checking summarize job ${jobId} timed out after ${REQUEST_TIMEOUT_MS / 1000} seconds`);
+      return NextResponse.json({ error: 'Checking on the summarize job timed out.' }, { status: 504 });
+    }
+    console.error('External API request failed:', error);
+    return NextResponse.json(
+      { error: 'Failed to connect to external API service. The service might be unavailable. Try again later or try adding your own Gemini API key.' },
+      { status: 503 }
+    );
+  }
+}
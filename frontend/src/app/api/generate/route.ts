@@ -1,8 +1,5 @@
 import { NextResponse } from 'next/server';
 
-// Set a longer timeout for the Next.js API route
-export const maxDuration = 240; // seconds (4 minutes)
-
 interface RequestBody {
   repo_url: string;
 }
@@ -11,6 +8,15 @@ interface ErrorResponse {
   message: string;
 }
 
+interface SummarizeJob {
+  job_id: string;
+  status: string;
+}
+
+const REQUEST_TIMEOUT_MS = 30000;
+
+// Queues the summary and returns its job id right away; the browser polls
+// /api/generate/[jobId] until the job finishes
 export async function POST(request: Request) {
   try {
     const { repo_url } = await request.json() as RequestBody;
@@ -21,9 +27,8 @@ export async function POST(request: Request) {
 
     const backendSummarizeUrl = `${process.env.BACKEND_URL}/summarize`; // Use env var
 
-    // Call the external API with the bearer token and extended timeout
     const controller = new AbortController();
-    const timeoutId = setTimeout(() => controller.abort(), 240000); // 240 second timeout
+    const timeoutId = setTimeout(() => controller.abort(), REQUEST_TIMEOUT_MS);
 
     try {
       console.log(`Making request to external API for: ${repo_url}`);
@@ -37,8 +42,7 @@ export async function POST(request: Request) {
         body: JSON.stringify({ repo_url }),
         signal: controller.signal,
       });
-
-      clearTimeout(timeoutId); // Clear the timeout if request completes
+      clearTimeout(timeoutId);
 
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({ message: 'Unknown error' })) as ErrorResponse;
@@ -49,14 +53,14 @@ export async function POST(request: Request) {
         );
       }
 
-      // Return success response
-      return NextResponse.json({ success: true });
+      const { job_id } = await response.json() as SummarizeJob;
+      return NextResponse.json({ job_id }, { status: 202 });
     } catch (fetchError) {
       clearTimeout(timeoutId);
 
       // Handle timeout specifically
       if (fetchError instanceof Error && fetchError.name === 'AbortError') {
-        console.error('External API request timed out after 60 seconds');
+        console.error(`External API request timed out after ${REQUEST_TIMEOUT_MS / 1000} seconds`);
         return NextResponse.json(
           { error: 'External API request timed out. Try again later or try adding your own Gemini API key.' },
           { status: 504 }
@@ -6,6 +6,7 @@ import MainCard from "~/components/main-card";
 import Hero from "~/components/hero";
 import Link from "next/link";
 import { getFeaturedRepos, type FeaturedRepo, getRepoSummary } from "~/lib/supabase";
+import { waitForSummarizeJob } from "~/lib/summarizeJob";
 import { FaCodeFork } from "react-icons/fa6";
 
 // Function to get color for programming languages
@@ -191,6 +192,9 @@ export default function HomePage() {
       });
 
       if (response.ok) {
+        // The summary is generated in the background, wait for it to finish
+        const { job_id } = await response.json() as { job_id: string };
+        await waitForSummarizeJob(job_id);
         return true;
       } else {
         const errorData: { error?: string; message?: string } = await response.json().catch(() => ({ message: 'Unknown error' }));
@@ -239,17 +243,9 @@ export default function HomePage() {
         // If repo doesn't exist, call the backend API
         const repoUrl = `https://github.com/${username}/${repo}`;
 
-        // Set up timeout for the entire process
-        const timeoutPromise = new Promise<boolean>((_, reject) => {
-          setTimeout(() => reject(new Error('Request timed out after 4 minutes')), 240000); // 4 minutes timeout
-        });
-
-        // Race between API call and timeout
+        // waitForSummarizeJob gives up on the job after its own deadline
         try {
-          const success = await Promise.race([
-            generateDocumentation(repoUrl),
-            timeoutPromise
-          ]);
+          const success = await generateDocumentation(repoUrl);
 
           if (success) {
             // If successful, redirect to the page
@@ -0,0 +1,75 @@
+const POLL_INTERVAL_MS = 3000;
+// How long to wait for a job, queued time included, before showing an error
+const JOB_DEADLINE_MS = 10 * 60 * 1000;
+// Consecutive failed status checks before giving up on a job
+const MAX_POLL_ERRORS = 3;
+
+type JobStatus = 'queued' | 'running' | 'succeeded' | 'failed';
+
+interface JobStatusResponse {
+  status?: JobStatus;
+  stage?: string;
+  error?: string | null;
+}
+
+/**
+ * Polls a summarize job queued by /api/generate until it finishes
+ * @param jobId Job id returned by /api/generate
+ * @param deadlineMs How long to wait before giving up
+ * @throws Error with a message for the UI when the job fails, can't be found,
+ * its status can't be read or it isn't done before the deadline
+ */
+export async function waitForSummarizeJob(
+  jobId: string,
+  deadlineMs: number = JOB_DEADLINE_MS
+): Promise<void> {
+  const deadline = Date.now() + deadlineMs;
+  let errors = 0;
+  for (;;) {
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+    if (Date.now() >= deadline) throw deadlineError(deadlineMs);
+
+    let response: Response;
+    try {
+      response = await fetch(`/api/generate/${encodeURIComponent(jobId)}`, {
+        cache: 'no-store',
+        signal: AbortSignal.timeout(deadline - Date.now()),
+      });
+    } catch (error) {
+      if (error instanceof Error && error.name === 'TimeoutError') throw deadlineError(deadlineMs);
+      if (++errors >= MAX_POLL_ERRORS) throw error;
+      continue;
+    }
+    const job = await response.json().catch(() => ({})) as JobStatusResponse;
+
+    // Not found won't fix itself, other errors might be transient
+    if (response.status === 404) {
+      throw new Error(job.error ?? 'Summarize job not found.');
+    }
+    if (!response.ok) {
+      if (++errors >= MAX_POLL_ERRORS) {
+        throw new Error(job.error ?? 'Failed to check on the summarize job.');
+      }
+      continue;
+    }
+    errors = 0;
+
+    switch (job.status) {
+      case 'succeeded':
+        return;
+      case 'failed':
+        throw new Error(job.error ?? 'Failed to process codebase.');
+      case 'queued':
+      case 'running':
+        continue;
+      default:
+        throw new Error('Failed to check on the summarize job.');
+    }
+  }
+}
+
+function deadlineError(deadlineMs: number): Error {
+  return new Error(
+    `The summary is still being generated after ${deadlineMs / 60000} minutes. Please check back later.`
+  );
+}